@@ -1,21 +1,22 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional
-from openai import OpenAI
-from google import genai
 from dotenv import load_dotenv
+import anyio
 from app.services.web_search import web_search
-from langchain_openai import OpenAIEmbeddings
-from app.embeddings.geminiai import GeminiEmbeddingService
-from app.vector_store.quadrant_reader import get_qdrant_reader
+from app.embeddings.cache import embedding_cache
+from app.embeddings.registry import client_registry
+from app.embeddings.query_cache import query_cache
+from app.embeddings.dimensions import resolve_dimension
+from app.vector_store.mmr import MMR_ENABLED, MMR_FETCH_K, MMR_LAMBDA, MMR_MAX_FETCH_K
+from app.vector_store.backends import vector_reader
+from app.vector_store.quadrant_reader import RETRIEVAL_MODES
 from app.database import ChatLogService
 import uuid
 
 load_dotenv()
 
 router = APIRouter(tags=["llm"])
-openai_client = OpenAI()
-client = genai.Client()
 
 
 class LLMRequest(BaseModel):
@@ -27,6 +28,26 @@ class LLMRequest(BaseModel):
     custom_prompt: Optional[str] = None
     temperature: Optional[float] = 0.7  # Controls randomness (0.0-1.0): 0=deterministic, 1=creative
     enable_web_search: Optional[bool] = False  # Fallback to web search if no KB results
+    embedding_dimension: Optional[int] = None  # Defaults to the size the document was indexed with
+    search_all_documents: Optional[bool] = False  # Search the whole collection, not just document_id
+    retrieval: Optional[str] = None  # "hybrid" (dense + BM25, fused) or "dense"; defaults to RETRIEVAL_MODE
+    mmr: Optional[bool] = None  # Re-rank for diverse chunks; defaults to MMR_ENABLED
+    mmr_fetch_k: Optional[int] = None  # Candidates fetched before re-ranking; defaults to MMR_FETCH_K
+    mmr_lambda: Optional[float] = None  # 1 = relevance only, 0 = diversity only; defaults to MMR_LAMBDA
+
+
+def query_dimension(body: LLMRequest) -> int:
+    """Vector size to embed the query with: requested, else the document's index, else the default"""
+    if body.embedding_dimension is not None:
+        return client_registry.resolve_dimension(body.provider, body.model, body.embedding_dimension)
+    try:
+        from app.database import DocumentService
+        index = DocumentService.get_index(body.document_id, body.provider.lower(), body.model)
+        if index is not None:
+            return index.embedding_dimension or 0
+    except Exception as e:
+        print(f"[LLM] ℹ️ Database not available, using the default embedding dimension: {str(e)}")
+    return resolve_dimension()
 
 @router.post("/llm/process")
 async def process_rag(body: LLMRequest):
@@ -42,9 +63,14 @@ async def process_rag(body: LLMRequest):
     
     Parameters:
     - query: User question to process
-    - provider: 'openai' or 'gemini'
+    - provider: 'openai', 'gemini' or 'local' (offline stand-in for tests and benchmarks)
     - model: Embedding model name
+    - embedding_dimension: Vector size the document was indexed with (looked up when omitted)
     - document_id: Document UUID for filtering search results
+    - search_all_documents: Search every document indexed with this model instead
+    - retrieval: 'hybrid' (dense + BM25 keyword search, RRF-fused) or 'dense'
+    - mmr, mmr_fetch_k, mmr_lambda: Maximal marginal relevance re-ranking of
+      mmr_fetch_k candidates, to avoid near-duplicate chunks in the context
     - llmModel: LLM model to use (gpt-4, gpt-4-turbo, gemini-pro, etc.)
     - custom_prompt: Optional system prompt override
     - temperature: Control response randomness (0.0=deterministic, 1.0=creative)
@@ -59,24 +85,45 @@ async def process_rag(body: LLMRequest):
     print("Request body:", body)
     print(f"Temperature: {body.temperature}, Web Search Enabled: {body.enable_web_search}")
 
-    if body.provider.lower() == "openai":
-        embedding_model = OpenAIEmbeddings(model=body.model)
-
-    elif body.provider.lower() == "gemini":
-        service = GeminiEmbeddingService(model=body.model)
-        embedding_model = await service.get_embedding_model()
-
-    else:
+    if body.provider.lower() not in ("openai", "gemini", "local"):
         raise HTTPException(status_code=400, detail="Unsupported embedding provider")
 
-    vector_db = get_qdrant_reader(embedding_model)
-    print("Vector store loaded.")
+    if body.retrieval is not None and body.retrieval.lower() not in RETRIEVAL_MODES:
+        raise HTTPException(status_code=400, detail=f"retrieval must be one of {', '.join(RETRIEVAL_MODES)}")
 
-        # Fallback: search without filter
-    search_results = vector_db.similarity_search(
-            query=body.query,
-            k=5
-        )
+    use_mmr = MMR_ENABLED if body.mmr is None else body.mmr
+    mmr_fetch_k = (body.mmr_fetch_k or MMR_FETCH_K) if use_mmr else 0
+    mmr_lambda = MMR_LAMBDA if body.mmr_lambda is None else body.mmr_lambda
+    if use_mmr and not (0 <= mmr_lambda <= 1 and 0 < mmr_fetch_k <= MMR_MAX_FETCH_K):
+        raise HTTPException(status_code=400,
+                            detail=f"mmr_lambda must be in [0, 1] and mmr_fetch_k in [1, {MMR_MAX_FETCH_K}]")
+
+    try:
+        # Database lookup: keep it off the event loop
+        dimension = await anyio.to_thread.run_sync(query_dimension, body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Reused across requests; repeated queries are answered from the embedding cache
+    embedding_model = client_registry.embeddings(body.provider, body.model, dimension)
+
+    # Repeated questions skip the embedding round trip
+    query_vector = await query_cache.embed_query(body.provider, body.model, body.query, embedding_model,
+                                                 dimension=dimension)
+
+    # Only this document's chunks; the metadata.document_id payload index keeps
+    # the cost proportional to the document, not to the whole collection.
+    # Awaited on the shared async client, so the event loop is not blocked
+    search_results = await vector_reader.search(
+        embedding_model,
+        query_vector,
+        k=5,
+        document_ids=None if body.search_all_documents else [body.document_id],
+        query_text=body.query,
+        mode=body.retrieval,
+        mmr_fetch_k=mmr_fetch_k,
+        mmr_lambda=mmr_lambda,
+    )
     
     print(f"Found {len(search_results)} relevant chunks.")
 
@@ -117,16 +164,17 @@ async def process_rag(body: LLMRequest):
         """    
 
     # 6️⃣ Call LLM with temperature control
-    if body.provider.lower() == "openai":
-        print(f"Calling OpenAI {body.llmModel} with temperature={body.temperature}")
-        response = openai_client.chat.completions.create(
+    if body.provider.lower() in ("openai", "local"):
+        print(f"Calling {body.provider} {body.llmModel} with temperature={body.temperature}")
+        # Blocking SDK call: run it in a thread so other queries keep being served
+        response = await anyio.to_thread.run_sync(lambda: client_registry.llm(body.provider).chat.completions.create(
             model=body.llmModel,
             temperature=body.temperature,  # Control randomness (0.0-1.0)
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": body.query},
             ],
-        )
+        ))
         answer = response.choices[0].message.content
     elif body.provider.lower() == "gemini":
         print(f"Calling Google Gemini {body.llmModel} with temperature={body.temperature}")
@@ -136,13 +184,13 @@ async def process_rag(body: LLMRequest):
             User Question:
             {body.query}
             """
-        gemini_response = client.models.generate_content(
+        gemini_response = await anyio.to_thread.run_sync(lambda: client_registry.llm("gemini").models.generate_content(
             model=body.llmModel,
             contents=final_prompt,
             generation_config={
                 "temperature": body.temperature,  # Control randomness (0.0-1.0)
             }
-        )
+        ))
         answer = gemini_response.text
     else:
         raise HTTPException(status_code=400, detail="Unsupported LLM provider")
@@ -151,7 +199,7 @@ async def process_rag(body: LLMRequest):
     # 7️⃣ Log chat to PostgreSQL
     chat_id = str(uuid.uuid4())
     try:
-        ChatLogService.create_chat_log(
+        await anyio.to_thread.run_sync(lambda: ChatLogService.create_chat_log(
             chat_id=chat_id,
             document_id=body.document_id,
             query=body.query,
@@ -162,7 +210,7 @@ async def process_rag(body: LLMRequest):
             provider=body.provider,
             embedding_model=body.model,
             workflow_id=None  # Optional: workflow context if available
-        )
+        ))
         print(f"[LLM]Chat logged to PostgreSQL: {chat_id}")
     except Exception as e:
         print(f"[LLM] ⚠️ Warning: Could not log chat: {str(e)}")
@@ -178,3 +226,21 @@ async def process_rag(body: LLMRequest):
         "provider": body.provider,
         "chat_id": chat_id
     }
+
+
+@router.get("/llm/embedding-cache/stats")
+def embedding_cache_stats():
+    """Hit/miss counters and size of the persistent embedding cache (all processes)"""
+    return embedding_cache.stats()
+
+
+@router.get("/llm/clients/stats")
+def client_stats():
+    """Live embedding/LLM clients of this API process and their connection reuse"""
+    return client_registry.stats()
+
+
+@router.get("/llm/query-cache/stats")
+async def query_cache_stats():
+    """Hit ratio and saved latency of the in-memory query embedding cache"""
+    return query_cache.stats()
@@ -1,7 +1,10 @@
 import json
+import anyio
 from pathlib import Path
 from app.queue.valkey import queue
+from app.services.chunk_store import chunk_store
 from app.worker.index_document import process_rag
+from app.embeddings.registry import client_registry
 
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
@@ -15,7 +18,13 @@ router = APIRouter(tags=["knowledge"])
 class IndexRequest(BaseModel):
     embedding_provider: str
     embedding_model: str
-    chunks: List = []
+    # Output size of the vectors; EMBEDDING_DIMENSION when omitted, 0 = native size
+    embedding_dimension: Optional[int] = None
+    # "incremental": embed only chunks whose text is not in the collection yet
+    # "full": re-embed all chunks and replace the document's points
+    mode: str = "incremental"
+    # Earlier version of this document whose vectors may be reused
+    previous_document_id: Optional[str] = None
     
 @router.post('/knowledge/process/{document_id}')
 async def process_document(document_id: str, body: IndexRequest):
@@ -24,12 +33,58 @@ async def process_document(document_id: str, body: IndexRequest):
     
     Returns job_id for status tracking.
     """
+    if body.mode not in ("incremental", "full"):
+        raise HTTPException(status_code=400, detail=f"Unsupported indexing mode: {body.mode}")
     try:
+        # May probe the model's native size: keep it off the event loop
+        dimension = await anyio.to_thread.run_sync(
+            client_registry.resolve_dimension, body.embedding_provider, body.embedding_model,
+            body.embedding_dimension,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        # ── Skip embedding entirely if these vectors already exist ────────────
+        existing_index = None
+        try:
+            from app.database import DocumentService
+            existing_index = DocumentService.get_index(
+                document_id, body.embedding_provider.lower(), body.embedding_model
+            )
+        except Exception as db_error:
+            print(f"[QUEUE] ℹ️ Database not available, skipping index lookup: {str(db_error)}")
+
+        if (existing_index and existing_index.status == "indexed" and body.mode != "full"
+                and (existing_index.embedding_dimension or 0) == dimension):
+            print(f"[QUEUE] Document already indexed, skipping job: {existing_index.index_id}")
+            return {
+                "message": "Document already indexed",
+                "job_id": None,
+                "status": "indexed",
+                "document_id": document_id,
+                "result": {
+                    "document_id": document_id,
+                    "chunks_indexed": existing_index.chunks_count,
+                    "embedding_provider": existing_index.embedding_provider,
+                    "embedding_model": existing_index.embedding_model,
+                    "embedding_dimension": dimension,
+                    "status": "indexed",
+                    "message": "Reused existing vectors",
+                },
+            }
+
+        if not chunk_store.exists(document_id):
+            raise HTTPException(status_code=404, detail=f"No chunks stored for document {document_id}")
+
+        # The worker loads chunks from the chunk store; the job only carries the reference
         payload = {
             "document_id": document_id,
             "embedding_provider": body.embedding_provider,
             "embedding_model": body.embedding_model,
-            "chunks": body.chunks,
+            "embedding_dimension": dimension,
+            "mode": body.mode,
+            "previous_document_id": body.previous_document_id,
         }
 
         job = queue.enqueue(
@@ -49,6 +104,8 @@ async def process_document(document_id: str, body: IndexRequest):
             "status": "queued",
             "document_id": document_id,
         }
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"[ERROR] Failed to enqueue job: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to enqueue job: {str(e)}")
@@ -101,6 +158,9 @@ def job_status(job_id: str):
         # Job still processing
         elif status in ["queued", "started"]:
             response["message"] = f"Document indexing in progress ({status})"
+            # Streaming ingestion jobs publish pages/chunks/vectors done so far
+            if job.meta.get("progress"):
+                response["progress"] = job.meta["progress"]
         
         return response
         
@@ -111,4 +171,59 @@ def job_status(job_id: str):
         raise HTTPException(
             status_code=500,
             detail=f"Failed to fetch job status: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@router.get("/knowledge/collections")
+def list_collections():
+    """Collections of the vector backend, one per (provider, model, dimension)"""
+    from app.vector_store.backends import VECTOR_BACKEND, vector_backend
+    try:
+        return {"backend": VECTOR_BACKEND, "collections": vector_backend.list_collections()}
+    except Exception as e:
+        print(f"[ERROR] Failed to list collections: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to list collections: {str(e)}")
+
+
+@router.post("/knowledge/collections/refresh")
+async def refresh_collections():
+    """Health-check the cached collection metadata now (e.g. after scripts/reset_qdrant.py)"""
+    from app.vector_store.collections import collection_registry
+    try:
+        report = await anyio.to_thread.run_sync(collection_registry.refresh)
+        return {**report, "cache": collection_registry.stats()}
+    except Exception as e:
+        print(f"[ERROR] Failed to refresh collections: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to refresh collections: {str(e)}")
+
+
+@router.delete("/knowledge/{document_id}")
+async def delete_document(document_id: str):
+    """
+    Delete a document everywhere: its vectors in every collection, the
+    uploaded file, the stored chunks and its metadata/index records.
+    """
+    from app.services.document_gc import delete_document as delete_everywhere
+    try:
+        result = await anyio.to_thread.run_sync(delete_everywhere, document_id)
+    except Exception as e:
+        print(f"[ERROR] Failed to delete document {document_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to delete document: {str(e)}")
+
+    if not (result["vectors"] or result["file"] or result["chunks"] or result["records"]):
+        raise HTTPException(status_code=404, detail=f"Document {document_id} not found")
+    return {"message": "Document deleted", **result}
+
+
+@router.post("/knowledge/gc")
+async def collect_garbage(dry_run: bool = True):
+    """
+    Run one garbage collection pass now: expire documents by the retention
+    policy and reclaim vectors, chunk files and uploads without a metadata
+    record. Reports only, unless dry_run=false.
+    """
+    from app.services.document_gc import gc_sweeper
+    try:
+        return await anyio.to_thread.run_sync(lambda: gc_sweeper.sweep(dry_run=dry_run))
+    except Exception as e:
+        print(f"[ERROR] Garbage collection failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Garbage collection failed: {str(e)}")
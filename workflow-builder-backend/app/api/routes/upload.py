@@ -1,31 +1,93 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile,File
-import json
-from pathlib import Path
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from app.services.file_loader import file_loader
-from app.services.text_extractor import text_extractor
+from fastapi import APIRouter, Depends, HTTPException, UploadFile,File, Form, Query
+import anyio
+from typing import Optional
+from app.services.file_loader import file_loader, FileTooLargeError, UPLOAD_DIR
+from app.services.chunk_store import chunk_store
 from app.services.text_chunker import text_chunker
+from app.services.extraction_pool import (
+    extraction_pool,
+    ExtractionQueueFullError,
+    ExtractionTimeoutError,
+)
+from app.queue.valkey import queue
+from app.worker.index_document import ingest_document, process_rag
+from app.embeddings.registry import client_registry
 from dotenv import load_dotenv
 load_dotenv()
 
 router = APIRouter(tags=["upload"])
 
-CHUNKS_DIR = Path("app/storage/chunks")
-CHUNKS_DIR.mkdir(parents=True, exist_ok=True)
+def find_duplicate(content_hash: str, chunking_key: str):
+    """
+    Look up an earlier upload with the same content and chunking parameters.
+
+    Returns (document, chunks_count) or None. Deduplication is skipped when the
+    database is not available.
+    """
+    try:
+        from app.database import DocumentService
+        existing = DocumentService.find_by_content(content_hash, chunking_key)
+    except Exception as e:
+        print(f"[UPLOAD] ℹ️ Database not available, skipping deduplication: {str(e)}")
+        return None
+
+    if not existing:
+        return None
+
+    if not chunk_store.exists(existing.document_id):
+        print(f"[UPLOAD] Duplicate {existing.document_id} has no stored chunks, re-extracting")
+        return None
+
+    return existing, chunk_store.count(existing.document_id)
 
 
 @router.post('/knowledge/upload')
 async def upload_document(file: UploadFile = File(...)):
     try:
-        filename = await file_loader.save(file)
-        docs = text_extractor.extract(filename)
-        text_splitter =  RecursiveCharacterTextSplitter( chunk_size=1000,chunk_overlap=600 )
-        chunks_docs = text_splitter.split_documents(documents=docs)   
+        saved = await file_loader.save(file)
+        filename = saved["file_id"]
+        # May load the tokenizer (token mode): keep it off the event loop
+        chunking_key = await anyio.to_thread.run_sync(lambda: text_chunker.key)
+
+        # ── Deduplicate by content hash ───────────────────────────────────────
+        duplicate = find_duplicate(saved["sha256"], chunking_key)
+        if duplicate:
+            existing, chunks_count = duplicate
+            (UPLOAD_DIR / filename).unlink(missing_ok=True)
+            from app.database import DocumentService
+            indexes = DocumentService.list_indexes(existing.document_id)
+            print(f"[UPLOAD] Duplicate upload of {existing.document_id}, reusing chunks")
+            return {
+                "document_id": existing.document_id,
+                "sha256": saved["sha256"],
+                "file_size": saved["size"],
+                "duplicate": True,
+                "status": existing.status,
+                "indexes": [
+                    {
+                        "embedding_provider": i.embedding_provider,
+                        "embedding_model": i.embedding_model,
+                        "embedding_dimension": i.embedding_dimension or 0,
+                        "status": i.status,
+                    }
+                    for i in indexes
+                ],
+                "chunks_count": chunks_count,
+            }
+
+        # CPU-bound parsing runs in the extraction pool so the event loop stays free
+        try:
+            chunks_docs = await extraction_pool.extract_document(filename)
+        except BaseException:
+            (UPLOAD_DIR / filename).unlink(missing_ok=True)
+            raise
 
         # ── Optionally create document record in database ──────────────────────
         # This is optional - the system will work without it
         # but it's needed for follow-up queries to find the document
         document_id = filename
+        # Chunks stay on the server; clients reference them by document_id
+        await anyio.to_thread.run_sync(chunk_store.save, document_id, chunks_docs)
         try:
             # Try to import and create document record
             # If PostgreSQL is not available, this will fail silently
@@ -36,7 +98,10 @@ async def upload_document(file: UploadFile = File(...)):
                     filename=filename,
                     embedding_provider="openai",  # Default, will be updated when embedding is done
                     embedding_model="text-embedding-3-small",  # Default, will be updated
-                    file_size=file.size if file.size else None
+                    file_size=saved["size"],
+                    content_hash=saved["sha256"],
+                    chunking_key=chunking_key,
+                    chunks_count=len(chunks_docs),
                 )
                 print(f"[UPLOAD]Document record created in database: {document_id}")
             except Exception as import_error:
@@ -44,10 +109,152 @@ async def upload_document(file: UploadFile = File(...)):
                 # Continue without database - document still uploaded successfully
         except Exception as e:
             print(f"[UPLOAD]  Warning: {str(e)}")
-        
-        return { "document_id": filename, "chunks_count": len(chunks_docs), "chunks": chunks_docs }
-    
+
+        return {
+            "document_id": filename,
+            "sha256": saved["sha256"],
+            "file_size": saved["size"],
+            "duplicate": False,
+            "status": "uploaded",
+            "indexes": [],
+            "chunks_count": len(chunks_docs),
+        }
+
+    except FileTooLargeError as e:
+        print(f"[UPLOAD]  Rejected upload: {str(e)}")
+        raise HTTPException(status_code=413, detail=str(e))
+    except ExtractionQueueFullError as e:
+        print(f"[UPLOAD]  Extraction pool busy: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except ExtractionTimeoutError as e:
+        print(f"[UPLOAD]  Extraction timed out: {str(e)}")
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         print(f"[UPLOAD]  Error uploading document: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error uploading document: {str(e)}")
 
+
+@router.post('/knowledge/ingest')
+async def ingest_document_stream(
+    file: UploadFile = File(...),
+    embedding_provider: str = Form(...),
+    embedding_model: str = Form(...),
+    embedding_dimension: Optional[int] = Form(None),
+):
+    """
+    Upload a PDF and index it in one streaming background job.
+
+    Unlike /knowledge/upload + /knowledge/process, no chunks are built in the
+    API process or sent back to the client: the worker streams pages through
+    chunking, embedding and Qdrant upserts. Poll /knowledge/status/{job_id}
+    for progress.
+    """
+    try:
+        # May probe the model's native size: keep it off the event loop
+        dimension = await anyio.to_thread.run_sync(
+            client_registry.resolve_dimension, embedding_provider, embedding_model, embedding_dimension,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        saved = await file_loader.save(file)
+        document_id = saved["file_id"]
+        provider = embedding_provider.lower()
+        duplicate = False
+        job_function = ingest_document
+        # May load the tokenizer (token mode): keep it off the event loop
+        chunking_key = await anyio.to_thread.run_sync(lambda: text_chunker.key)
+
+        try:
+            from app.database import DocumentService
+            existing = DocumentService.find_by_content(saved["sha256"], chunking_key)
+            if existing:
+                # Same content: stream the stored copy instead of the new one
+                duplicate = True
+                (UPLOAD_DIR / document_id).unlink(missing_ok=True)
+                document_id = existing.document_id
+                index = DocumentService.get_index(document_id, provider, embedding_model)
+                if index and index.status == "indexed" and (index.embedding_dimension or 0) == dimension:
+                    print(f"[INGEST] Duplicate of {document_id}, already indexed")
+                    return {
+                        "message": "Document already indexed",
+                        "job_id": None,
+                        "status": "indexed",
+                        "document_id": document_id,
+                        "duplicate": True,
+                        "chunks_count": index.chunks_count,
+                    }
+                if chunk_store.exists(document_id):
+                    # Chunks already stored: only embed them (another model or size)
+                    print(f"[INGEST] Duplicate of {document_id}, indexing its stored chunks")
+                    job_function = process_rag
+            else:
+                DocumentService.create_document(
+                    document_id=document_id,
+                    filename=document_id,
+                    embedding_provider=provider,
+                    embedding_model=embedding_model,
+                    embedding_dimension=dimension,
+                    file_size=saved["size"],
+                    content_hash=saved["sha256"],
+                    chunking_key=chunking_key,
+                )
+        except Exception as db_error:
+            print(f"[INGEST] ℹ️ Database not available, skipping document record: {str(db_error)}")
+
+        job = queue.enqueue(
+            job_function,
+            {
+                "document_id": document_id,
+                "embedding_provider": provider,
+                "embedding_model": embedding_model,
+                "embedding_dimension": dimension,
+            },
+            job_timeout="30m",
+            result_ttl=3600,
+            failure_ttl=300,
+        )
+        print(f"[INGEST] Job enqueued: {job.id} ({job_function.__name__})")
+
+        return {
+            "message": "Document ingestion started",
+            "job_id": job.id,
+            "status": "queued",
+            "document_id": document_id,
+            "duplicate": duplicate,
+        }
+
+    except FileTooLargeError as e:
+        print(f"[INGEST]  Rejected upload: {str(e)}")
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        print(f"[INGEST]  Error ingesting document: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error ingesting document: {str(e)}")
+
+
+@router.get('/knowledge/{document_id}/chunks')
+def list_chunks(
+    document_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+):
+    """Paginated preview of a document's stored chunks"""
+    result = chunk_store.page(document_id, offset, limit)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"No chunks stored for document {document_id}")
+
+    total, chunks = result
+    return {
+        "document_id": document_id,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "chunks": [{"page_content": c.page_content, "metadata": c.metadata} for c in chunks],
+    }
+
+
+@router.get('/knowledge/extraction/stats')
+def extraction_stats():
+    """Utilization metrics of the PDF extraction pool"""
+    return extraction_pool.stats()
@@ -9,7 +9,7 @@ This module provides:
 Uses SQLAlchemy ORM with PostgreSQL
 """
 
-from sqlalchemy import create_engine, Column, String, Text, DateTime, JSON, Integer, Boolean
+from sqlalchemy import create_engine, inspect, text, Column, String, Text, DateTime, JSON, Integer, Boolean
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
@@ -53,7 +53,10 @@ class DocumentMetadata(Base):
     - chunks_count: Number of chunks extracted
     - embedding_provider: "openai" or "gemini"
     - embedding_model: Model name used for embeddings
-    - status: "uploaded", "processing", "indexed", "failed"
+    - embedding_dimension: Output size of the vectors, 0 = the model's native size
+    - status: "uploaded", "processing", "indexed", "failed", "deleting"
+    - content_hash: SHA-256 of the uploaded file (used for deduplication)
+    - chunking_key: Chunking parameters the stored chunks were built with
     - created_at: Timestamp
     - updated_at: Timestamp
     - metadata: JSON field for extra data
@@ -66,7 +69,10 @@ class DocumentMetadata(Base):
     chunks_count = Column(Integer, default=0)
     embedding_provider = Column(String(50), nullable=False)  # "openai" or "gemini"
     embedding_model = Column(String(100), nullable=False)  # e.g., "text-embedding-3-small"
-    status = Column(String(50), default="uploaded")  # uploaded, processing, indexed, failed
+    embedding_dimension = Column(Integer, default=0)  # e.g. 512, 0 = native size
+    status = Column(String(50), default="uploaded")  # uploaded, processing, indexed, failed, deleting
+    content_hash = Column(String(64), nullable=True, index=True)  # sha256 hex digest
+    chunking_key = Column(String(100), nullable=True)  # e.g. "recursive:1000:600"
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     extra_metadata = Column(JSON, default={})  # Extra data: upload_path, error_msg, etc.
@@ -75,6 +81,41 @@ class DocumentMetadata(Base):
         return f"<DocumentMetadata(doc_id={self.document_id}, status={self.status})>"
 
 
+class DocumentIndex(Base):
+    """
+    Track which embedding models a document has been indexed with
+    
+    Together with DocumentMetadata.content_hash/chunking_key this maps
+    (file content, chunking parameters, embedding model) to existing vectors,
+    so duplicate uploads can skip re-embedding.
+    
+    Fields:
+    - index_id: "<document_id>|<provider>|<model>"
+    - document_id: Document the vectors belong to
+    - embedding_provider: "openai" or "gemini"
+    - embedding_model: Model name used for embeddings
+    - embedding_dimension: Output size of the vectors, 0 = the model's native size
+    - status: "processing", "indexed", "failed", "evicted"
+    - chunks_count: Number of chunks indexed
+    - created_at: Timestamp
+    - updated_at: Timestamp
+    """
+    __tablename__ = "document_indexes"
+    
+    index_id = Column(String(512), primary_key=True)
+    document_id = Column(String(255), nullable=False, index=True)
+    embedding_provider = Column(String(50), nullable=False)
+    embedding_model = Column(String(100), nullable=False)
+    embedding_dimension = Column(Integer, default=0)
+    status = Column(String(50), default="processing")  # processing, indexed, failed, evicted
+    chunks_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<DocumentIndex(index_id={self.index_id}, status={self.status})>"
+
+
 class WorkflowDefinition(Base):
     """
     Store workflow definitions (optional)
@@ -147,10 +188,45 @@ class ChatLog(Base):
 
 # ===== DATABASE FUNCTIONS =====
 
+def upgrade_schema():
+    """
+    Add columns (and their indexes) that the models define but existing tables lack.
+
+    create_all() only creates missing tables, so deployments created by an
+    older version would miss e.g. document_metadata.content_hash and every
+    query selecting the full row would fail. Added columns are nullable;
+    existing rows read as NULL. Safe to run repeatedly and concurrently.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                if_not_exists = "IF NOT EXISTS " if engine.dialect.name == "postgresql" else ""
+                connection.execute(text(
+                    f'ALTER TABLE {table.name} ADD COLUMN {if_not_exists}{column.name} {column_type}'
+                ))
+                added.append(f"{table.name}.{column.name}")
+            for index in table.indexes:
+                if any(f"{table.name}.{column.name}" in added for column in index.columns):
+                    index.create(connection, checkfirst=True)
+    if added:
+        print(f"[DB] Added columns: {', '.join(added)}")
+    return added
+
+
 def init_db():
-    """Initialize database - create all tables"""
+    """Initialize database - create all tables and add columns missing from older versions"""
     try:
         Base.metadata.create_all(engine)
+        upgrade_schema()
         print("[DB]Database tables created/verified")
     except Exception as e:
         print(f"[DB]  Error initializing database: {str(e)}")
@@ -175,7 +251,9 @@ class DocumentService:
     
     @staticmethod
     def create_document(document_id: str, filename: str, embedding_provider: str, 
-                       embedding_model: str, file_size: int = None) -> DocumentMetadata:
+                       embedding_model: str, file_size: int = None, content_hash: str = None,
+                       chunking_key: str = None, chunks_count: int = 0,
+                       embedding_dimension: int = 0) -> DocumentMetadata:
         """Create new document record"""
         session = get_db_session()
         try:
@@ -184,7 +262,11 @@ class DocumentService:
                 filename=filename,
                 embedding_provider=embedding_provider,
                 embedding_model=embedding_model,
+                embedding_dimension=embedding_dimension,
                 file_size=file_size,
+                content_hash=content_hash,
+                chunking_key=chunking_key,
+                chunks_count=chunks_count,
                 status="uploaded"
             )
             session.add(doc)
@@ -209,8 +291,10 @@ class DocumentService:
             close_db_session(session)
     
     @staticmethod
-    def update_document_status(document_id: str, status: str, chunks_count: int = None):
-        """Update document status"""
+    def update_document_status(document_id: str, status: str, chunks_count: int = None,
+                               embedding_provider: str = None, embedding_model: str = None,
+                               embedding_dimension: int = None):
+        """Update document status (and the embedding it was indexed with)"""
         session = get_db_session()
         try:
             doc = session.query(DocumentMetadata).filter_by(document_id=document_id).first()
@@ -218,6 +302,12 @@ class DocumentService:
                 doc.status = status
                 if chunks_count is not None:
                     doc.chunks_count = chunks_count
+                if embedding_provider is not None:
+                    doc.embedding_provider = embedding_provider
+                if embedding_model is not None:
+                    doc.embedding_model = embedding_model
+                if embedding_dimension is not None:
+                    doc.embedding_dimension = embedding_dimension
                 doc.updated_at = datetime.utcnow()
                 session.commit()
                 print(f"[DB]Document updated: {document_id} → {status}")
@@ -229,6 +319,138 @@ class DocumentService:
         finally:
             close_db_session(session)
     
+    @staticmethod
+    def find_by_content(content_hash: str, chunking_key: str) -> DocumentMetadata:
+        """Find an earlier upload of the same file chunked with the same parameters"""
+        session = get_db_session()
+        try:
+            return session.query(DocumentMetadata).filter(
+                DocumentMetadata.content_hash == content_hash,
+                DocumentMetadata.chunking_key == chunking_key,
+                DocumentMetadata.status != "failed",
+            ).order_by(DocumentMetadata.created_at.asc()).first()
+        finally:
+            close_db_session(session)
+    
+    @staticmethod
+    def get_index(document_id: str, embedding_provider: str, embedding_model: str) -> DocumentIndex:
+        """Get the index record of a document for one embedding model"""
+        session = get_db_session()
+        try:
+            index_id = f"{document_id}|{embedding_provider}|{embedding_model}"
+            return session.query(DocumentIndex).filter_by(index_id=index_id).first()
+        finally:
+            close_db_session(session)
+    
+    @staticmethod
+    def list_indexes(document_id: str) -> list:
+        """List index records of a document (one per embedding model)"""
+        session = get_db_session()
+        try:
+            return session.query(DocumentIndex).filter_by(document_id=document_id).all()
+        finally:
+            close_db_session(session)
+    
+    @staticmethod
+    def upsert_index(document_id: str, embedding_provider: str, embedding_model: str,
+                     status: str, chunks_count: int = None,
+                     embedding_dimension: int = None) -> DocumentIndex:
+        """Create or update the index record of a document for one embedding model"""
+        session = get_db_session()
+        try:
+            index_id = f"{document_id}|{embedding_provider}|{embedding_model}"
+            index = session.query(DocumentIndex).filter_by(index_id=index_id).first()
+            if index is None:
+                index = DocumentIndex(
+                    index_id=index_id,
+                    document_id=document_id,
+                    embedding_provider=embedding_provider,
+                    embedding_model=embedding_model,
+                )
+                session.add(index)
+            index.status = status
+            if chunks_count is not None:
+                index.chunks_count = chunks_count
+            if embedding_dimension is not None:
+                index.embedding_dimension = embedding_dimension
+            index.updated_at = datetime.utcnow()
+            session.commit()
+            print(f"[DB]Index updated: {index_id} → {status}")
+            return index
+        except Exception as e:
+            session.rollback()
+            print(f"[DB]  Error updating index: {str(e)}")
+            raise
+        finally:
+            close_db_session(session)
+    
+    @staticmethod
+    def delete_document(document_id: str) -> bool:
+        """Delete a document's metadata and index records; True if it had any"""
+        session = get_db_session()
+        try:
+            indexes = session.query(DocumentIndex).filter_by(document_id=document_id).delete(
+                synchronize_session=False
+            )
+            documents = session.query(DocumentMetadata).filter_by(document_id=document_id).delete(
+                synchronize_session=False
+            )
+            session.commit()
+            print(f"[DB]Document deleted: {document_id} ({indexes} indexes)")
+            return bool(indexes or documents)
+        except Exception as e:
+            session.rollback()
+            print(f"[DB]  Error deleting document: {str(e)}")
+            raise
+        finally:
+            close_db_session(session)
+    
+    @staticmethod
+    def list_document_ids() -> set:
+        """IDs of every document with a metadata record"""
+        session = get_db_session()
+        try:
+            return {row[0] for row in session.query(DocumentMetadata.document_id).all()}
+        finally:
+            close_db_session(session)
+    
+    @staticmethod
+    def list_indexed_document_ids() -> set:
+        """IDs of every document with at least one index record"""
+        session = get_db_session()
+        try:
+            return {row[0] for row in session.query(DocumentIndex.document_id).distinct().all()}
+        finally:
+            close_db_session(session)
+    
+    @staticmethod
+    def find_orphan_indexes(updated_before: datetime, limit: int = 100) -> list:
+        """IDs of documents with index records but no metadata record, not updated since updated_before"""
+        session = get_db_session()
+        try:
+            documents = session.query(DocumentMetadata.document_id)
+            query = session.query(DocumentIndex.document_id).filter(
+                DocumentIndex.updated_at < updated_before,
+                ~DocumentIndex.document_id.in_(documents),
+            )
+            return [row[0] for row in query.distinct().limit(limit).all()]
+        finally:
+            close_db_session(session)
+    
+    @staticmethod
+    def find_expired(updated_before: datetime, statuses: list = None, limit: int = 100) -> list:
+        """IDs of documents not updated since updated_before (optionally only in some statuses)"""
+        session = get_db_session()
+        try:
+            query = session.query(DocumentMetadata.document_id).filter(
+                DocumentMetadata.updated_at < updated_before
+            )
+            if statuses:
+                query = query.filter(DocumentMetadata.status.in_(statuses))
+            return [row[0] for row in query.order_by(DocumentMetadata.updated_at.asc()).limit(limit).all()]
+        finally:
+            close_db_session(session)
+    
     @staticmethod
     def list_documents(status: str = None) -> list:
         """List documents (optionally filtered by status)"""
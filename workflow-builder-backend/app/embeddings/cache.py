@@ -0,0 +1,299 @@
+"""
+Persistent embedding cache
+
+Embeddings are deterministic for a given (provider, model, dimension, text),
+so they are stored locally and reused: re-indexing a document, duplicate
+chunks inside a document and repeated queries no longer call the provider.
+
+Storage is a single SQLite file (WAL mode) shared by the API process and the
+RQ workers. Each row holds one vector as a packed float32 or float16 blob.
+The file is bounded by size: when it grows past EMBEDDING_CACHE_MAX_MB the
+least recently used rows are evicted. Hit/miss counters are kept in the same
+database, so stats cover every process using the cache.
+
+Lookups only read. The last-used times of hits and the hit/miss counts are
+buffered in memory and written in one transaction by flush(), which runs
+before every insert, before stats, every EMBEDDING_CACHE_FLUSH_SECONDS in the
+background and at the end of each indexing job.
+
+Queries and documents are cached separately because some providers (Gemini)
+embed them with different task types.
+
+Configuration (environment):
+- EMBEDDING_CACHE_PATH: SQLite file (default app/storage/embedding_cache.sqlite3)
+- EMBEDDING_CACHE_MAX_MB: size bound, 0 disables the cache (default 512)
+- EMBEDDING_CACHE_DTYPE: "float32" or "float16" (default float32)
+- EMBEDDING_CACHE_FLUSH_SECONDS: interval of the background flush (default 30)
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+STORAGE_DIR = Path(__file__).resolve().parents[1] / "storage"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", str(STORAGE_DIR / "embedding_cache.sqlite3"))
+EMBEDDING_CACHE_MAX_MB = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "512"))
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float32")
+EMBEDDING_CACHE_FLUSH_SECONDS = float(os.getenv("EMBEDDING_CACHE_FLUSH_SECONDS", "30"))
+
+# Evict down to this fraction of the bound, so eviction doesn't run on every insert
+_EVICT_TO = 0.9
+# SQLite's default limit on host parameters per statement is 999
+_MAX_PARAMS = 900
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    provider   TEXT    NOT NULL,
+    model      TEXT    NOT NULL,
+    dimension  INTEGER NOT NULL,
+    kind       TEXT    NOT NULL,
+    text_hash  TEXT    NOT NULL,
+    dtype      TEXT    NOT NULL,
+    vector     BLOB    NOT NULL,
+    last_used  REAL    NOT NULL,
+    PRIMARY KEY (provider, model, dimension, kind, text_hash)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used);
+CREATE TABLE IF NOT EXISTS counters (
+    name  TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO counters VALUES ('hits', 0), ('misses', 0), ('evictions', 0);
+"""
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_mb: int = EMBEDDING_CACHE_MAX_MB,
+                 dtype: str = EMBEDDING_CACHE_DTYPE):
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"Unsupported embedding cache dtype: {dtype}")
+        self.path = path
+        self.max_bytes = max_mb * 1024 * 1024
+        self.dtype = dtype
+        self.enabled = max_mb > 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        # Buffered writes of lookups: {(provider, model, dimension, kind, hash): last_used}
+        self._touched = {}
+        self._counts = {"hits": 0, "misses": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        # Opened lazily and per process: RQ forks work horses, and SQLite
+        # connections must not be used across a fork
+        if self._conn is None or self._pid != os.getpid():
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            conn.commit()
+            self._conn = conn
+            self._pid = os.getpid()
+            # Buffered lookups belong to the parent process, which flushes them
+            self._touched = {}
+            self._counts = {"hits": 0, "misses": 0}
+            if EMBEDDING_CACHE_FLUSH_SECONDS > 0:
+                threading.Thread(target=self._flush_loop, args=(self._pid,), daemon=True).start()
+            print(f"[EMBED-CACHE] Opened {self.path} ({self.dtype}, max {self.max_bytes // (1024 * 1024)} MB)")
+        return self._conn
+
+    def get_many(self, provider: str, model: str, dimension: int, kind: str, hashes: List[str]) -> dict:
+        """Cached vectors for the given text hashes: {hash: list[float]}"""
+        if not self.enabled or not hashes:
+            return {}
+
+        unique = list(dict.fromkeys(hashes))
+        found = {}
+        with self._lock:
+            conn = self._connect()
+            for start in range(0, len(unique), _MAX_PARAMS):
+                part = unique[start:start + _MAX_PARAMS]
+                rows = conn.execute(
+                    f"SELECT text_hash, dtype, vector FROM embeddings "
+                    f"WHERE provider=? AND model=? AND dimension=? AND kind=? "
+                    f"AND text_hash IN ({','.join('?' * len(part))})",
+                    (provider, model, dimension, kind, *part),
+                ).fetchall()
+                for digest, dtype, blob in rows:
+                    found[digest] = np.frombuffer(blob, dtype=dtype).astype(np.float32).tolist()
+
+            # Read-only: recency and counters are written by flush()
+            now = time.time()
+            for digest in found:
+                self._touched[(provider, model, dimension, kind, digest)] = now
+            hits = sum(1 for digest in hashes if digest in found)
+            self._counts["hits"] += hits
+            self._counts["misses"] += len(hashes) - hits
+        return found
+
+    def put_many(self, provider: str, model: str, dimension: int, kind: str, items: dict):
+        """Store vectors: {hash: vector}"""
+        if not self.enabled or not items:
+            return
+
+        now = time.time()
+        rows = [
+            (provider, model, dimension, kind, digest, self.dtype,
+             np.asarray(vector, dtype=self.dtype).tobytes(), now)
+            for digest, vector in items.items()
+        ]
+        with self._lock:
+            conn = self._connect()
+            # Recency first, so eviction below sees the latest hits
+            self._flush(conn)
+            conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.commit()
+            self._evict(conn)
+
+    def flush(self):
+        """Write buffered last-used times and hit/miss counts"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._conn is None or self._pid != os.getpid():
+                return
+            self._flush(self._conn)
+            self._conn.commit()
+
+    def _flush(self, conn):
+        touched, self._touched = self._touched, {}
+        counts, self._counts = self._counts, {"hits": 0, "misses": 0}
+        if touched:
+            conn.executemany(
+                "UPDATE embeddings SET last_used=? "
+                "WHERE provider=? AND model=? AND dimension=? AND kind=? AND text_hash=?",
+                [(used, *key) for key, used in touched.items()],
+            )
+        self._count(conn, **counts)
+
+    def _flush_loop(self, pid: int):
+        while self._pid == pid:
+            time.sleep(EMBEDDING_CACHE_FLUSH_SECONDS)
+            if self._pid != pid:
+                return
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"[EMBED-CACHE] Flush failed: {e}")
+
+    def _count(self, conn, **deltas):
+        conn.executemany(
+            "UPDATE counters SET value = value + ? WHERE name = ?",
+            [(delta, name) for name, delta in deltas.items() if delta],
+        )
+
+    def _size(self, conn) -> int:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        pages = conn.execute("PRAGMA page_count").fetchone()[0] - conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return page_size * pages
+
+    def _evict(self, conn):
+        """Drop least recently used rows until the file fits in the size bound"""
+        size = self._size(conn)
+        if size <= self.max_bytes:
+            return
+
+        total = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if not total:
+            return
+        # Estimate rows to drop from the average on-disk cost of a row
+        per_row = max(size // total, 1)
+        excess = size - int(self.max_bytes * _EVICT_TO)
+        evict = min(total, excess // per_row + 1)
+        # Exactly `evict` rows: a batch shares one last_used, so a cutoff on it
+        # could take a whole indexing job's vectors (WITHOUT ROWID: match the key)
+        evicted = conn.execute(
+            "DELETE FROM embeddings WHERE (provider, model, dimension, kind, text_hash) IN ("
+            "SELECT provider, model, dimension, kind, text_hash FROM embeddings "
+            "ORDER BY last_used, provider, model, dimension, kind, text_hash LIMIT ?)",
+            (evict,),
+        ).rowcount
+        self._count(conn, evictions=evicted)
+        conn.commit()
+        print(f"[EMBED-CACHE] Evicted {evicted} least recently used vectors ({size // (1024 * 1024)} MB)")
+
+    def stats(self) -> dict:
+        if not self.enabled:
+            return {"enabled": False}
+
+        with self._lock:
+            conn = self._connect()
+            self._flush(conn)
+            conn.commit()
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+            entries = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            size = self._size(conn)
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "enabled": True,
+            "path": self.path,
+            "dtype": self.dtype,
+            "entries": entries,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": counters["hits"],
+            "misses": counters["misses"],
+            "evictions": counters["evictions"],
+            "hit_rate": round(counters["hits"] / lookups, 4) if lookups else 0.0,
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    LangChain Embeddings wrapper that consults the embedding cache first.
+
+    Only texts missing from the cache are sent to the wrapped client, each
+    distinct text once per call.
+    """
+
+    def __init__(self, embeddings: Embeddings, provider: str, model: str,
+                 dimension: int = 0, cache: EmbeddingCache = None):
+        self.embeddings = embeddings
+        self.provider = provider
+        self.model = model
+        self.dimension = dimension  # 0 = the model's native size
+        self.cache = cache or embedding_cache
+
+    def _embed(self, texts: List[str], kind: str, embed_fn) -> List[List[float]]:
+        hashes = [text_hash(text) for text in texts]
+        found = self.cache.get_many(self.provider, self.model, self.dimension, kind, hashes)
+
+        missing = {}
+        for digest, text in zip(hashes, texts):
+            if digest not in found and digest not in missing:
+                missing[digest] = text
+        if missing:
+            vectors = embed_fn(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(self.provider, self.model, self.dimension, kind, computed)
+            found.update(computed)
+
+        return [found[digest] for digest in hashes]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, "document", self.embeddings.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], "query", lambda texts: [self.embeddings.embed_query(texts[0])])[0]
+
+
+def cached(embeddings: Embeddings, provider: str, model: str, dimension: int = 0) -> Embeddings:
+    """Wrap a provider client with the shared embedding cache (no-op when disabled)"""
+    if not embedding_cache.enabled:
+        return embeddings
+    return CachedEmbeddings(embeddings, provider, model, dimension)
+
+
+embedding_cache = EmbeddingCache()
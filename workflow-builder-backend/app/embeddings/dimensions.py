@@ -0,0 +1,91 @@
+"""
+Reduced output dimensions for embedding models
+
+Smaller vectors cut Qdrant RAM and search latency roughly in proportion:
+text-embedding-3-large emits 3072 floats (12 KB per chunk), 512 of them are
+enough for per-document RAG. Models that support it natively get the size as
+a request parameter (OpenAI text-embedding-3-*: `dimensions`). Other models
+are truncated to the first n coordinates and L2-renormalized, which is how
+the text-embedding-3 models shorten vectors themselves (Matryoshka training);
+for models not trained that way recall drops faster, so measure first with
+scripts/benchmark_dimensions.py.
+
+The dimension is part of an index's identity: it is stored on the document
+and index records, sizes the Qdrant collection and keys the embedding
+caches, and queries must use the size the document was indexed with.
+Requests are checked against the model's native size (NATIVE_SIZES, else
+probed once per process by the client registry) before anything is queued.
+
+Configuration (environment):
+- EMBEDDING_DIMENSION: default output size for new indexes, 0 = the model's
+  native size (default 0)
+"""
+
+import os
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", "0"))
+
+# Models that accept the output size as a request parameter
+_NATIVE_PREFIXES = {
+    "openai": ("text-embedding-3-",),
+    "local": ("",),
+}
+
+# Output sizes of known models; others are probed
+NATIVE_SIZES = {
+    ("openai", "text-embedding-3-small"): 1536,
+    ("openai", "text-embedding-3-large"): 3072,
+    ("openai", "text-embedding-ada-002"): 1536,
+    ("gemini", "models/embedding-001"): 768,
+    ("gemini", "models/text-embedding-004"): 768,
+}
+
+
+def supports_native_dimensions(provider: str, model: str) -> bool:
+    return any(model.startswith(prefix) for prefix in _NATIVE_PREFIXES.get(provider, ()))
+
+
+def resolve_dimension(dimension: int = None) -> int:
+    """Requested output size, EMBEDDING_DIMENSION when not given (0 = native)"""
+    dimension = EMBEDDING_DIMENSION if dimension is None else int(dimension)
+    if dimension < 0:
+        raise ValueError(f"Embedding dimension must be non-negative (0 = native size), got {dimension}")
+    return dimension
+
+
+def check_dimension(dimension: int, native: int, model: str) -> int:
+    """Reject sizes a model cannot produce: vectors can only be shortened"""
+    if dimension > native:
+        raise ValueError(f"Embedding dimension {dimension} exceeds the {native} dimensions of {model}")
+    return dimension
+
+
+def truncate(vectors: List[List[float]], dimension: int) -> List[List[float]]:
+    """First `dimension` coordinates of each vector, rescaled to unit length"""
+    if not vectors:
+        return []
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.shape[1] < dimension:
+        raise ValueError(f"Cannot reduce {matrix.shape[1]}-dimensional vectors to {dimension}")
+    matrix = matrix[:, :dimension]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).tolist()
+
+
+class TruncatedEmbeddings(Embeddings):
+    """Wraps a client whose model has no native size parameter"""
+
+    def __init__(self, embeddings: Embeddings, dimension: int):
+        self.embeddings = embeddings
+        self.dimension = dimension
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return truncate(self.embeddings.embed_documents(texts), self.dimension)
+
+    def embed_query(self, text: str) -> List[float]:
+        return truncate([self.embeddings.embed_query(text)], self.dimension)[0]
@@ -0,0 +1,253 @@
+"""
+Batched, concurrent, rate-limit-aware embedding executor
+
+Texts are grouped into requests by token count (not by a fixed number of
+texts), up to EMBED_CONCURRENCY requests run at once, and every request first
+takes its share from a token bucket per (provider, model), limiting both
+requests and tokens per minute. Requests that fail with a rate limit or a
+transient error are retried with exponential backoff and full jitter, so
+parallel batches don't retry in lockstep.
+
+Limits are per process; with several RQ workers, divide the provider quota
+between them.
+
+Configuration (environment):
+- EMBED_BATCH_TOKENS: max tokens per embedding request (default 8000)
+- EMBED_BATCH_MAX_TEXTS: max texts per embedding request (default 256)
+- EMBED_CONCURRENCY: requests in flight per call (default 4)
+- EMBED_RPM / EMBED_TPM: requests / tokens per minute per model, 0 = no
+  limit (default 3000 / 1000000). EMBED_RPM_<PROVIDER> and
+  EMBED_TPM_<PROVIDER> override them for one provider.
+- EMBED_MAX_RETRIES: retries per request (default 5)
+- EMBED_RETRY_BASE / EMBED_RETRY_MAX: backoff base and cap in seconds
+  (default 1 / 30)
+"""
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from app.services.tokenizer import count_tokens
+
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "8000"))
+EMBED_BATCH_MAX_TEXTS = int(os.getenv("EMBED_BATCH_MAX_TEXTS", "256"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+EMBED_RETRY_BASE = float(os.getenv("EMBED_RETRY_BASE", "1"))
+EMBED_RETRY_MAX = float(os.getenv("EMBED_RETRY_MAX", "30"))
+
+_RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+_RETRY_NAMES = ("RateLimit", "Timeout", "Connection", "ResourceExhausted", "ServiceUnavailable", "InternalServer")
+
+
+def _limit(name: str, provider: str, default: str) -> float:
+    return float(os.getenv(f"{name}_{provider.upper()}", os.getenv(name, default)))
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, timeouts and 5xx responses are worth retrying; bad requests are not"""
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if isinstance(status, int) and status in _RETRY_STATUS:
+        return True
+    return any(name in type(error).__name__ for name in _RETRY_NAMES)
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` units per second, bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._level = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1) -> float:
+        """Block until `amount` units are available; returns seconds waited"""
+        if self.rate <= 0:
+            return 0.0
+        # A single request larger than the bucket waits for a full bucket
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._level >= amount:
+                    self._level -= amount
+                    return waited
+                delay = (amount - self._level) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute buckets of one (provider, model)"""
+
+    def __init__(self, rpm: float, tpm: float):
+        self.requests = TokenBucket(rpm / 60, rpm)
+        self.tokens = TokenBucket(tpm / 60, tpm)
+
+    def acquire(self, tokens: int) -> float:
+        return self.requests.acquire(1) + self.tokens.acquire(tokens)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str, model: str) -> RateLimiter:
+    """Process-wide limiter per (provider, model)"""
+    with _limiters_lock:
+        key = (provider, model)
+        if key not in _limiters:
+            _limiters[key] = RateLimiter(
+                rpm=_limit("EMBED_RPM", provider, "3000"),
+                tpm=_limit("EMBED_TPM", provider, "1000000"),
+            )
+        return _limiters[key]
+
+
+def token_batches(counts: List[int], max_tokens: int, max_texts: int) -> list:
+    """Split text indices into consecutive batches bounded by tokens and by count"""
+    batches, batch, batch_tokens = [], [], 0
+    for i, tokens in enumerate(counts):
+        if batch and (batch_tokens + tokens > max_tokens or len(batch) >= max_texts):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(i)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class EmbeddingExecutor:
+    def __init__(self, provider: str, model: str,
+                 batch_tokens: int = EMBED_BATCH_TOKENS,
+                 batch_max_texts: int = EMBED_BATCH_MAX_TEXTS,
+                 concurrency: int = EMBED_CONCURRENCY,
+                 max_retries: int = EMBED_MAX_RETRIES):
+        self.provider = provider
+        self.model = model
+        self.batch_tokens = batch_tokens
+        self.batch_max_texts = batch_max_texts
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.limiter = get_rate_limiter(provider, model)
+
+    def _call(self, embed_fn, texts: List[str], tokens: int, stats: dict, lock: threading.Lock):
+        attempt = 0
+        while True:
+            waited = self.limiter.acquire(tokens)
+            try:
+                vectors = embed_fn(texts)
+                with lock:
+                    stats["throttled_seconds"] += waited
+                return vectors
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = random.uniform(0, min(EMBED_RETRY_MAX, EMBED_RETRY_BASE * 2 ** attempt))
+                attempt += 1
+                with lock:
+                    stats["retries"] += 1
+                    stats["throttled_seconds"] += waited
+                print(f"[EMBED] {self.provider}/{self.model} {type(e).__name__}, "
+                      f"retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def run(self, embed_fn, texts: List[str]):
+        """
+        Embed texts with embed_fn(list[str]) -> list[vector].
+
+        Returns (vectors in input order, stats dict).
+        """
+        started = time.perf_counter()
+        counts = [count_tokens(text, self.model) for text in texts]
+        batches = token_batches(counts, self.batch_tokens, self.batch_max_texts)
+        stats = {
+            "chunks": len(texts),
+            "tokens": sum(counts),
+            "batches": len(batches),
+            "retries": 0,
+            "throttled_seconds": 0.0,
+        }
+        lock = threading.Lock()
+        vectors = [None] * len(texts)
+
+        def run_batch(indices):
+            batch_vectors = self._call(
+                embed_fn,
+                [texts[i] for i in indices],
+                sum(counts[i] for i in indices),
+                stats,
+                lock,
+            )
+            for i, vector in zip(indices, batch_vectors):
+                vectors[i] = vector
+
+        if len(batches) <= 1 or self.concurrency <= 1:
+            for indices in batches:
+                run_batch(indices)
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches))) as pool:
+                # list() re-raises the first failed batch
+                list(pool.map(run_batch, batches))
+
+        elapsed = time.perf_counter() - started
+        stats["seconds"] = round(elapsed, 3)
+        stats["throttled_seconds"] = round(stats["throttled_seconds"], 3)
+        stats["chunks_per_sec"] = round(len(texts) / elapsed, 1) if elapsed else 0.0
+        return vectors, stats
+
+
+class ExecutorEmbeddings(Embeddings):
+    """LangChain Embeddings wrapper that sends embed_documents through an EmbeddingExecutor"""
+
+    def __init__(self, embeddings: Embeddings, provider: str, model: str):
+        self.embeddings = embeddings
+        self.executor = EmbeddingExecutor(provider, model)
+        self._totals = {"chunks": 0, "tokens": 0, "batches": 0, "retries": 0,
+                        "throttled_seconds": 0.0, "seconds": 0.0}
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        vectors, stats = self.executor.run(self.embeddings.embed_documents, texts)
+        with self._lock:
+            for key in self._totals:
+                self._totals[key] += stats[key]
+        print(f"[EMBED] {stats['chunks']} chunks in {stats['batches']} batches, "
+              f"{stats['chunks_per_sec']} chunks/sec ({stats['retries']} retries)")
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        tokens = count_tokens(text, self.executor.model)
+        return self.executor._call(
+            lambda texts: [self.embeddings.embed_query(texts[0])], [text], tokens,
+            {"retries": 0, "throttled_seconds": 0.0}, threading.Lock(),
+        )[0]
+
+    def stats(self) -> dict:
+        """Totals over every embed_documents call on this client"""
+        with self._lock:
+            totals = dict(self._totals)
+        totals["seconds"] = round(totals["seconds"], 3)
+        totals["throttled_seconds"] = round(totals["throttled_seconds"], 3)
+        totals["chunks_per_sec"] = round(totals["chunks"] / totals["seconds"], 1) if totals["seconds"] else 0.0
+        return totals
+
+
+def embedding_stats(embeddings) -> dict:
+    """Executor totals of an embeddings stack, looking through wrappers such as the cache"""
+    while embeddings is not None and not isinstance(embeddings, ExecutorEmbeddings):
+        embeddings = getattr(embeddings, "embeddings", None)
+    return embeddings.stats() if embeddings is not None else {}
@@ -2,20 +2,23 @@
 from pathlib import Path
 import os
 from dotenv import load_dotenv
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from app.embeddings.registry import client_registry
 
 ENV_PATH = Path(__file__).resolve().parents[2] / ".env"
 load_dotenv(dotenv_path=ENV_PATH)
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-if not GEMINI_API_KEY:
-    raise RuntimeError("GEMINI_API_KEY not found in environment")
-
 
 class GeminiEmbeddingService:
     def __init__(self, model: str = "models/embedding-001"):
-        self.embedding_model = GoogleGenerativeAIEmbeddings(
-            model=model,
-            google_api_key=GEMINI_API_KEY
-        )
+        self.model = model
+
+    @property
+    def embedding_model(self):
+        # Created on first use and shared per (provider, model), see app/embeddings/registry.py.
+        # A missing GEMINI_API_KEY is reported then, not when this module is imported.
+        return client_registry.embeddings("gemini", self.model)
+
+    async def get_embedding_model(self):
+        return self.embedding_model
@@ -0,0 +1,140 @@
+"""
+Offline stand-in provider ("local") for embeddings and chat completions
+
+Lets the whole upload → index → query path run without network access or
+API keys, for load tests, CI and benchmarks on a laptop.
+
+Embeddings are deterministic feature-hashed bag-of-words vectors: every word
+is hashed to a coordinate and a sign, counts are summed and the vector is L2
+normalized. Texts that share words get similar vectors, so retrieval results
+are meaningful enough to exercise ranking, not just random.
+
+Chat completions are canned: the answer echoes the question and quotes the
+start of the retrieved context. The client mimics the part of the OpenAI SDK
+that /llm/process uses (client.chat.completions.create).
+
+Both simulate provider behaviour: a per-request latency with jitter and a
+random error rate. Errors are raised as LocalRateLimitError (status 429), so
+the embedding executor's retry path is exercised as well.
+
+Configuration (environment):
+- LOCAL_EMBEDDING_DIM: vector size (default 256); a model name ending in
+  "-<n>" (e.g. "local-hash-512") overrides it
+- LOCAL_LATENCY_MS / LOCAL_LATENCY_JITTER_MS: embedding request latency
+  (default 0 / 0)
+- LOCAL_LLM_LATENCY_MS: chat completion latency (default 0)
+- LOCAL_ERROR_RATE: probability that a request fails (default 0)
+- LOCAL_SEED: seed for latency jitter and errors (default: unseeded)
+"""
+
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+LOCAL_EMBEDDING_DIM = int(os.getenv("LOCAL_EMBEDDING_DIM", "256"))
+LOCAL_LATENCY_MS = float(os.getenv("LOCAL_LATENCY_MS", "0"))
+LOCAL_LATENCY_JITTER_MS = float(os.getenv("LOCAL_LATENCY_JITTER_MS", "0"))
+LOCAL_LLM_LATENCY_MS = float(os.getenv("LOCAL_LLM_LATENCY_MS", "0"))
+LOCAL_ERROR_RATE = float(os.getenv("LOCAL_ERROR_RATE", "0"))
+LOCAL_SEED = os.getenv("LOCAL_SEED")
+
+_WORD = re.compile(r"\w+")
+_MODEL_DIM = re.compile(r"-(\d+)$")
+
+
+class LocalRateLimitError(Exception):
+    """Simulated provider failure (looks like an HTTP 429 to retry logic)"""
+    status_code = 429
+
+
+class _Simulator:
+    """Latency and failure injection shared by the local clients"""
+
+    def __init__(self, latency_ms: float, jitter_ms: float, error_rate: float):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self._random = random.Random(int(LOCAL_SEED) if LOCAL_SEED else None)
+        self._lock = threading.Lock()
+
+    def request(self):
+        with self._lock:
+            delay = self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)
+            fail = self._random.random() < self.error_rate
+        if delay > 0:
+            time.sleep(delay / 1000)
+        if fail:
+            raise LocalRateLimitError("Simulated rate limit from the local provider")
+
+
+def local_dimension(model: str) -> int:
+    match = _MODEL_DIM.search(model or "")
+    return int(match.group(1)) if match else LOCAL_EMBEDDING_DIM
+
+
+class LocalEmbeddings(Embeddings):
+    def __init__(self, model: str = "local-hash", dimension: int = None,
+                 latency_ms: float = LOCAL_LATENCY_MS, jitter_ms: float = LOCAL_LATENCY_JITTER_MS,
+                 error_rate: float = LOCAL_ERROR_RATE):
+        self.model = model
+        self.dimension = dimension or local_dimension(model)
+        self._simulator = _Simulator(latency_ms, jitter_ms, error_rate)
+
+    def _vector(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in _WORD.findall(text.lower()):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dimension
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            # Empty or punctuation-only text: a fixed unit vector instead of zeros
+            vector[0], norm = 1.0, 1.0
+        return (vector / norm).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._simulator.request()
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self._simulator.request()
+        return self._vector(text)
+
+
+class _LocalCompletions:
+    def __init__(self, simulator: _Simulator):
+        self._simulator = simulator
+
+    def create(self, model: str, messages: list, temperature: float = None, **kwargs):
+        self._simulator.request()
+        system = next((m["content"] for m in messages if m["role"] == "system"), "")
+        question = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        context = system.split("Context:", 1)[-1].strip() if "Context:" in system else ""
+        excerpt = " ".join(context.split()[:40])
+        content = f"[local:{model}] Answer to: {question.strip()}"
+        if excerpt:
+            content += f"\nBased on: {excerpt}"
+        return SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(index=0, finish_reason="stop",
+                                     message=SimpleNamespace(role="assistant", content=content))],
+            usage=SimpleNamespace(
+                prompt_tokens=sum(len(m["content"].split()) for m in messages),
+                completion_tokens=len(content.split()),
+            ),
+        )
+
+
+class LocalChatClient:
+    """Canned chat completions with the openai.OpenAI call shape"""
+
+    def __init__(self, latency_ms: float = LOCAL_LLM_LATENCY_MS, error_rate: float = LOCAL_ERROR_RATE):
+        self.chat = SimpleNamespace(completions=_LocalCompletions(_Simulator(latency_ms, 0, error_rate)))
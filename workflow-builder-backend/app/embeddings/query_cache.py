@@ -0,0 +1,134 @@
+"""
+In-process LRU + TTL cache for query embeddings
+
+Sits in front of query embedding on the /llm/process hot path. Suggested
+questions are asked over and over; with this cache a repeated query skips
+the embedding round trip (and the thread hop to reach the persistent cache)
+entirely.
+
+Keys are (provider, model, dimension, normalized query): whitespace is collapsed and
+case folded, so "What is X?" and "what is  x?" share an entry. Concurrent
+requests for the same missing key share one embedding call (single flight)
+instead of each paying for it.
+
+The cache lives on the event loop: lookups, inserts and evictions happen
+between awaits, so no lock is needed.
+
+Configuration (environment):
+- QUERY_CACHE_SIZE: max cached queries, 0 disables the cache (default 1024)
+- QUERY_CACHE_TTL: seconds an entry stays valid (default 600)
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+
+import anyio
+import numpy as np
+
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "600"))
+
+# Saved-latency samples kept for the percentiles
+_SAMPLES = 4096
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.split()).casefold()
+
+
+class QueryEmbeddingCache:
+    def __init__(self, max_entries: int = QUERY_CACHE_SIZE, ttl: float = QUERY_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # key -> (vector, expires_at, seconds the embedding took)
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.expired = 0
+        self._saved = deque(maxlen=_SAMPLES)
+
+    async def embed_query(self, provider: str, model: str, query: str, embeddings,
+                          dimension: int = 0) -> list:
+        """Vector for query, from the cache or from embeddings.embed_query (run in a thread)"""
+        if self.max_entries <= 0:
+            return await anyio.to_thread.run_sync(embeddings.embed_query, query)
+
+        key = (provider.lower(), model, dimension, normalize_query(query))
+        entry = self._entries.get(key)
+        if entry is not None:
+            vector, expires_at, cost = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self._saved.append(cost)
+                return vector
+            del self._entries[key]
+            self.expired += 1
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            # Same query already being embedded: wait for that call
+            self.coalesced += 1
+            await asyncio.wait({inflight})
+            if inflight.cancelled():
+                # The request that started it went away; try again ourselves
+                return await self.embed_query(provider, model, query, embeddings, dimension)
+            vector, cost = inflight.result()
+            self.hits += 1
+            self._saved.append(cost)
+            return vector
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            started = time.perf_counter()
+            vector = await anyio.to_thread.run_sync(embeddings.embed_query, query)
+            cost = time.perf_counter() - started
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; don't log "exception never retrieved"
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+        future.set_result((vector, cost))
+        self._entries[key] = (vector, time.monotonic() + self.ttl, cost)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return vector
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        saved = np.array(self._saved) * 1000 if self._saved else None
+        return {
+            "enabled": self.max_entries > 0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "expired": self.expired,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "saved_latency_ms": {
+                "p50": round(float(np.percentile(saved, 50)), 2),
+                "p99": round(float(np.percentile(saved, 99)), 2),
+                "total": round(float(saved.sum()), 1),
+            } if saved is not None else None,
+        }
+
+
+query_cache = QueryEmbeddingCache()
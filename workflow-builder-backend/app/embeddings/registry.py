@@ -0,0 +1,267 @@
+"""
+Process-wide registry of embedding and LLM clients
+
+Clients are created lazily on first use and reused afterwards, one per
+(provider, model) for embeddings and one per provider for chat completions.
+OpenAI clients share one keep-alive httpx connection pool, so requests
+after the first skip the TCP and TLS handshake. Gemini clients manage their
+own transport and are reused as-is. The "local" provider (app/embeddings/local.py)
+is an offline stand-in for both. Embedding clients with a reduced output
+dimension (app/embeddings/dimensions.py) are separate entries.
+
+Connection reuse is measured with httpcore's trace hook: every request is
+counted, and so is every new TCP connection it had to open. 1 - opened /
+requests is the share of requests served on a warm connection.
+
+After a fork (RQ work horses), the child starts with an empty registry
+instead of inheriting the parent's sockets. Run the worker with
+`--worker-class rq.worker.SimpleWorker` to keep clients warm across jobs.
+
+Configuration (environment):
+- HTTP_MAX_CONNECTIONS: connections per pool (default 20)
+- HTTP_KEEPALIVE_CONNECTIONS: idle connections kept open (default 10)
+- HTTP_KEEPALIVE_EXPIRY: seconds an idle connection stays open (default 60)
+- HTTP_TIMEOUT: request timeout in seconds (default 60)
+"""
+
+import os
+import threading
+import time
+from typing import NamedTuple
+
+import httpx
+
+from app.embeddings.cache import cached
+from app.embeddings.dimensions import (
+    NATIVE_SIZES, TruncatedEmbeddings, check_dimension, resolve_dimension, supports_native_dimensions,
+)
+from app.embeddings.executor import ExecutorEmbeddings
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_KEEPALIVE_CONNECTIONS", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+
+
+class EmbeddingIdentity(NamedTuple):
+    """The vector space an embedding client produces; selects its Qdrant collection"""
+    provider: str
+    model: str
+    dimension: int  # 0 = the model's native size
+
+
+class PoolStats:
+    """Requests sent and TCP connections opened through one connection pool"""
+
+    def __init__(self):
+        self.requests = 0
+        self.connections_opened = 0
+        self._lock = threading.Lock()
+
+    def on_trace(self, event_name: str, info: dict):
+        if event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self.connections_opened += 1
+
+    async def on_trace_async(self, event_name: str, info: dict):
+        self.on_trace(event_name, info)
+
+    def on_request(self, request: httpx.Request):
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self.on_trace
+
+    async def on_request_async(self, request: httpx.Request):
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self.on_trace_async
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            requests, opened = self.requests, self.connections_opened
+        return {
+            "requests": requests,
+            "connections_opened": opened,
+            "reuse_ratio": round(1 - opened / requests, 4) if requests else 0.0,
+        }
+
+
+class ClientRegistry:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        """Forget every client (used in forked children; the parent's sockets are not touched)"""
+        self._embeddings = {}
+        self._llms = {}
+        self._http = {}
+        self._pool_stats = {}
+        self._created = {}
+        self._native_sizes = {}
+        self._pid = os.getpid()
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        )
+
+    def http_client(self, name: str) -> httpx.Client:
+        """Shared keep-alive httpx client for one upstream API"""
+        with self._lock:
+            if name not in self._http:
+                stats = self._pool_stats.setdefault(name, PoolStats())
+                self._http[name] = httpx.Client(
+                    limits=self._limits(),
+                    timeout=HTTP_TIMEOUT,
+                    event_hooks={"request": [stats.on_request]},
+                )
+            return self._http[name]
+
+    def async_http_client(self, name: str) -> httpx.AsyncClient:
+        """Shared keep-alive async httpx client for one upstream API"""
+        key = f"{name}:async"
+        with self._lock:
+            if key not in self._http:
+                stats = self._pool_stats.setdefault(key, PoolStats())
+                self._http[key] = httpx.AsyncClient(
+                    limits=self._limits(),
+                    timeout=HTTP_TIMEOUT,
+                    event_hooks={"request": [stats.on_request_async]},
+                )
+            return self._http[key]
+
+    def _create_embeddings(self, provider: str, model: str, dimension: int = 0):
+        native = dimension and supports_native_dimensions(provider, model)
+        if provider == "openai":
+            api_key = os.getenv("OPENAI_API_KEY")
+            if not api_key:
+                raise ValueError("OPENAI_API_KEY not set in environment")
+            from langchain_openai import OpenAIEmbeddings
+            client = OpenAIEmbeddings(
+                model=model,
+                api_key=api_key,
+                dimensions=dimension if native else None,
+                http_client=self.http_client("openai"),
+                http_async_client=self.async_http_client("openai"),
+            )
+
+        elif provider == "gemini":
+            api_key = os.getenv("GEMINI_API_KEY")
+            if not api_key:
+                raise ValueError("GEMINI_API_KEY not set in environment")
+            from langchain_google_genai import GoogleGenerativeAIEmbeddings
+            client = GoogleGenerativeAIEmbeddings(model=model, google_api_key=api_key)
+
+        elif provider == "local":
+            from app.embeddings.local import LocalEmbeddings
+            client = LocalEmbeddings(model=model, dimension=dimension or None)
+
+        else:
+            raise ValueError(f"Unsupported provider: {provider}")
+
+        if dimension and not native:
+            client = TruncatedEmbeddings(client, dimension)
+
+        # Cache misses go through the batched, rate-limited embedding executor
+        return cached(ExecutorEmbeddings(client, provider, model), provider, model, dimension)
+
+    def embeddings(self, provider: str, model: str, dimension: int = 0):
+        """Embedding client for (provider, model, dimension): cache → executor → provider"""
+        provider = provider.lower()
+        dimension = dimension or 0
+        key = (provider, model, dimension)
+        with self._lock:
+            if key not in self._embeddings:
+                size = f"{dimension} dims" if dimension else "native dims"
+                print(f"[CLIENTS] Creating {provider} embedding client for {model} ({size})")
+                client = self._create_embeddings(provider, model, dimension)
+                client.identity = EmbeddingIdentity(provider, model, dimension)
+                self._embeddings[key] = client
+                name = f"embeddings:{provider}:{model}" + (f":{dimension}" if dimension else "")
+                self._created[name] = time.time()
+            return self._embeddings[key]
+
+    def native_dimension(self, provider: str, model: str) -> int:
+        """Output size of a model without reduction: known sizes, else one probe per process"""
+        provider = provider.lower()
+        key = (provider, model)
+        if key in NATIVE_SIZES:
+            return NATIVE_SIZES[key]
+        if provider == "local":
+            from app.embeddings.local import local_dimension
+            return local_dimension(model)
+        with self._lock:
+            size = self._native_sizes.get(key)
+        if size is None:
+            # Served from the embedding cache after the first run
+            size = len(self.embeddings(provider, model).embed_query("dimension probe"))
+            with self._lock:
+                self._native_sizes[key] = size
+        return size
+
+    def resolve_dimension(self, provider: str, model: str, dimension: int = None) -> int:
+        """
+        Validated output size for a request (EMBEDDING_DIMENSION when not given).
+        Raises ValueError for sizes the model cannot produce. Blocking: may probe.
+        """
+        dimension = resolve_dimension(dimension)
+        if not dimension:
+            return dimension
+        try:
+            native = self.native_dimension(provider, model)
+        except ValueError:
+            raise
+        except Exception as e:
+            # Provider unreachable: the indexing job reports the error instead
+            print(f"[CLIENTS] Could not probe the size of {provider}/{model}: {type(e).__name__}: {e}")
+            return dimension
+        return check_dimension(dimension, native, model)
+
+    def llm(self, provider: str):
+        """Chat completion client: openai.OpenAI, google.genai.Client or the local stand-in"""
+        provider = provider.lower()
+        with self._lock:
+            if provider not in self._llms:
+                if provider == "openai":
+                    from openai import OpenAI
+                    self._llms[provider] = OpenAI(http_client=self.http_client("openai"))
+                elif provider == "gemini":
+                    from google import genai
+                    self._llms[provider] = genai.Client()
+                elif provider == "local":
+                    from app.embeddings.local import LocalChatClient
+                    self._llms[provider] = LocalChatClient()
+                else:
+                    raise ValueError(f"Unsupported LLM provider: {provider}")
+                print(f"[CLIENTS] Creating {provider} LLM client")
+                self._created[f"llm:{provider}"] = time.time()
+            return self._llms[provider]
+
+    def stats(self) -> dict:
+        with self._lock:
+            created = dict(self._created)
+            pools = {name: stats.snapshot() for name, stats in self._pool_stats.items()}
+        now = time.time()
+        return {
+            "pid": self._pid,
+            "live_clients": len(created),
+            "clients": [
+                {"client": name, "age_seconds": round(now - created_at, 1)}
+                for name, created_at in sorted(created.items())
+            ],
+            "http_pools": pools,
+        }
+
+    def _after_fork(self):
+        # The parent may have held the lock while forking
+        self._lock = threading.RLock()
+        self.reset()
+
+
+client_registry = ClientRegistry()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=client_registry._after_fork)
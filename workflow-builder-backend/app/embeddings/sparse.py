@@ -0,0 +1,88 @@
+"""
+Local BM25 sparse vectors for hybrid retrieval
+
+Dense embeddings blur exact identifiers: "ERR-4012" and "ERR-4021" land
+next to each other. A sparse vector keeps every term as its own dimension,
+so an exact match on a part number or error code scores high.
+
+Terms are lowercased words and identifiers; an identifier such as
+"ERR-4012" or "v2.3.1" is kept whole and also split into its parts. Each
+term maps to a dimension by a stable hash, so no vocabulary has to be built
+or shared between processes.
+
+Document vectors carry the BM25 term-frequency part,
+tf * (k1 + 1) / (tf + k1 * (1 - b + b * len / avg_len)); query vectors weigh
+every term 1. The IDF part is applied by Qdrant at search time (the sparse
+vector is configured with modifier=IDF), so it always reflects the current
+collection without re-encoding.
+
+Configuration (environment):
+- BM25_K1: term-frequency saturation (default 1.2)
+- BM25_B: document-length normalization (default 0.75)
+- BM25_AVG_DOC_LEN: average chunk length in terms (default 256)
+"""
+
+import hashlib
+import os
+import re
+from collections import Counter
+from typing import List
+
+from qdrant_client import models
+
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+BM25_AVG_DOC_LEN = float(os.getenv("BM25_AVG_DOC_LEN", "256"))
+
+# Name of the sparse vector in collections that support hybrid search
+SPARSE_VECTOR_NAME = "bm25"
+
+# Words and identifiers joined by - _ . / (e.g. "err-4012", "v2.3.1", "a/b")
+_TERM = re.compile(r"[^\W_]+(?:[-_./][^\W_]+)*")
+_PART = re.compile(r"[^\W_]+")
+
+
+def terms(text: str) -> List[str]:
+    found = []
+    for match in _TERM.finditer(text.lower()):
+        term = match.group(0)
+        found.append(term)
+        if not term.isalnum():
+            found.extend(_PART.findall(term))
+    return found
+
+
+def term_index(term: str) -> int:
+    """Stable dimension of a term (31-bit, fits Qdrant's u32 sparse indices)"""
+    digest = hashlib.blake2b(term.encode("utf-8"), digest_size=4).digest()
+    return int.from_bytes(digest, "little") & 0x7FFFFFFF
+
+
+class BM25Encoder:
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B, avg_len: float = BM25_AVG_DOC_LEN):
+        self.k1 = k1
+        self.b = b
+        self.avg_len = avg_len
+
+    @staticmethod
+    def _vector(weights: dict) -> models.SparseVector:
+        by_index = Counter()
+        for term, weight in weights.items():
+            # Hash collisions just add up
+            by_index[term_index(term)] += weight
+        indices = sorted(by_index)
+        return models.SparseVector(indices=indices, values=[float(by_index[i]) for i in indices])
+
+    def encode_document(self, text: str) -> models.SparseVector:
+        counts = Counter(terms(text))
+        norm = self.k1 * (1 - self.b + self.b * sum(counts.values()) / self.avg_len)
+        return self._vector({term: tf * (self.k1 + 1) / (tf + norm) for term, tf in counts.items()})
+
+    def encode_documents(self, texts: List[str]) -> List[models.SparseVector]:
+        return [self.encode_document(text) for text in texts]
+
+    def encode_query(self, text: str) -> models.SparseVector:
+        return self._vector({term: 1.0 for term in set(terms(text))})
+
+
+bm25_encoder = BM25Encoder()
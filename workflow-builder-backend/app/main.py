@@ -1,11 +1,37 @@
+from contextlib import asynccontextmanager
+import anyio
 from fastapi import FastAPI, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import upload
 from app.api.routes import process
 from app.api.routes import llm
 from app.api.routes import output
+from app.services.extraction_pool import extraction_pool
+from app.services.text_chunker import text_chunker
+from app.vector_store.backends import vector_reader
+from app.services.document_gc import gc_sweeper
+from app.embeddings.cache import embedding_cache
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Spawn and warm the extraction workers before the first upload arrives
+    await anyio.to_thread.run_sync(extraction_pool.start)
+    # Load the chunking tokenizer (token mode) before requests need the chunking key
+    await anyio.to_thread.run_sync(text_chunker.warm)
+    # One async Qdrant connection (gRPC) shared by all queries (no-op for the local backend)
+    await vector_reader.start()
+    # Periodic retention and orphan cleanup (GC_INTERVAL_SECONDS)
+    gc_sweeper.start()
+    yield
+    await gc_sweeper.stop()
+    await vector_reader.close()
+    extraction_pool.shutdown()
+    # Buffered embedding cache hits (EMBEDDING_CACHE_FLUSH_SECONDS)
+    embedding_cache.flush()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
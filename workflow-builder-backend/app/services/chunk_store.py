@@ -0,0 +1,288 @@
+"""
+Server-side chunk storage
+
+Chunks are written once at upload time and referenced by document_id
+afterwards. Indexing jobs, duplicate uploads and chunk previews read them
+from here instead of having the client send them back.
+
+File format (app/storage/chunks/<document_id>.chunks, little-endian):
+
+    [header 32 B][UTF-8 text of all chunks][pad to 8][index][metadata JSON]
+
+    header : magic "CHNK", version u16, reserved u16, count u32,
+             meta_len u32, index_offset u64, meta_offset u64
+    index  : count records of (offset u64, length u32, page i32,
+             chunk_index u32, reserved u32), offsets relative to the file
+    meta   : {"common": {...}, "page_labels": {page: label},
+              "overrides": {chunk_index: metadata}}
+
+Readers memory-map the file and view the index as a NumPy structured array,
+so opening a document does not parse or allocate per chunk; text is sliced
+from the map and decoded only when a chunk is actually used. Metadata that
+is identical for every chunk (source, total_pages, PDF info) is stored once;
+only page/page_label vary per chunk in the usual case.
+
+Legacy <document_id>.json files (a JSON array of {page_content, metadata})
+are still readable and can be converted with convert_legacy().
+"""
+
+import json
+import mmap
+import os
+import struct
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+
+CHUNKS_DIR = Path(__file__).resolve().parents[1] / "storage" / "chunks"
+CHUNKS_DIR.mkdir(parents=True, exist_ok=True)
+
+MAGIC = b"CHNK"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIIQQ")
+INDEX_DTYPE = np.dtype([
+    ("offset", "<u8"),
+    ("length", "<u4"),
+    ("page", "<i4"),
+    ("chunk_index", "<u4"),
+    ("reserved", "<u4"),
+])
+
+# Per-chunk metadata that lives in the index / page label table
+_PER_CHUNK_KEYS = ("page", "page_label")
+
+
+class ChunkWriter:
+    """
+    Append chunks batch by batch; the file only appears once close() succeeds.
+    Each writer has its own temp file, so two jobs writing the same document
+    don't interleave; the last one to close wins.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+        self.tmp_path = Path(tmp_path)
+        self.count = 0
+        self._f = os.fdopen(fd, "wb")
+        self._f.write(b"\0" * HEADER.size)
+        self._position = HEADER.size
+        self._records = []
+        self._common = None
+        self._page_labels = {}
+        self._overrides = {}
+
+    def write(self, chunks: list):
+        for chunk in chunks:
+            data = chunk.page_content.encode("utf-8")
+            self._f.write(data)
+
+            metadata = chunk.metadata or {}
+            page = metadata.get("page")
+            page = page if isinstance(page, int) else -1
+            if "page_label" in metadata:
+                self._page_labels[str(page)] = metadata["page_label"]
+
+            rest = {k: v for k, v in metadata.items() if k not in _PER_CHUNK_KEYS}
+            if self._common is None:
+                self._common = rest
+            elif rest != self._common:
+                self._overrides[str(self.count)] = rest
+
+            self._records.append((self._position, len(data), page, self.count, 0))
+            self._position += len(data)
+            self.count += 1
+
+    def close(self):
+        padding = -self._position % 8
+        self._f.write(b"\0" * padding)
+        index_offset = self._position + padding
+        self._f.write(np.array(self._records, dtype=INDEX_DTYPE).tobytes())
+
+        meta = json.dumps({
+            "common": self._common or {},
+            "page_labels": self._page_labels,
+            "overrides": self._overrides,
+        }).encode("utf-8")
+        meta_offset = index_offset + self.count * INDEX_DTYPE.itemsize
+        self._f.write(meta)
+
+        self._f.seek(0)
+        self._f.write(HEADER.pack(MAGIC, VERSION, 0, self.count, len(meta), index_offset, meta_offset))
+        self._f.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self._f.close()
+        self.tmp_path.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class ChunkFile:
+    """Read-only, memory-mapped view of one document's chunks"""
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, count, meta_len, index_offset, meta_offset = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            raise ValueError(f"Not a chunk file (version {VERSION}): {path}")
+
+        self.index = np.frombuffer(self._mm, dtype=INDEX_DTYPE, count=count, offset=index_offset)
+        meta = json.loads(self._mm[meta_offset:meta_offset + meta_len])
+        self._common = meta["common"]
+        self._page_labels = meta["page_labels"]
+        self._overrides = meta["overrides"]
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def text_bytes(self, i: int) -> memoryview:
+        """Zero-copy view of the UTF-8 text of chunk i"""
+        offset, length = int(self.index["offset"][i]), int(self.index["length"][i])
+        return memoryview(self._mm)[offset:offset + length]
+
+    def text(self, i: int) -> str:
+        offset, length = int(self.index["offset"][i]), int(self.index["length"][i])
+        return self._mm[offset:offset + length].decode("utf-8")
+
+    def _metadata(self, i: int, page: int) -> dict:
+        metadata = dict(self._overrides.get(str(i), self._common) if self._overrides else self._common)
+        if page >= 0:
+            metadata["page"] = page
+        label = self._page_labels.get(str(page))
+        if label is not None:
+            metadata["page_label"] = label
+        return metadata
+
+    def metadata(self, i: int) -> dict:
+        return self._metadata(i, int(self.index["page"][i]))
+
+    def document(self, i: int) -> Document:
+        return Document(page_content=self.text(i), metadata=self.metadata(i))
+
+    def documents(self, start: int = 0, stop: int = None) -> list:
+        start, stop, _ = slice(start, stop).indices(len(self))
+        records = self.index[start:stop]
+        mm = self._mm
+        return [
+            Document(
+                page_content=mm[offset:offset + length].decode("utf-8"),
+                metadata=self._metadata(i, page),
+            )
+            for i, offset, length, page in zip(
+                range(start, stop),
+                records["offset"].tolist(),
+                records["length"].tolist(),
+                records["page"].tolist(),
+            )
+        ]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.document(i)
+
+    def close(self):
+        # The NumPy view exports the map's buffer; drop it before closing
+        self.index = None
+        try:
+            self._mm.close()
+        except BufferError:
+            # A caller still holds a text_bytes() view; the map is released with it
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ChunkStore:
+    def __init__(self, root: Path = CHUNKS_DIR):
+        self.root = root
+
+    def path(self, document_id: str) -> Path:
+        return self.root / f"{document_id}.chunks"
+
+    def legacy_path(self, document_id: str) -> Path:
+        return self.root / f"{document_id}.json"
+
+    def exists(self, document_id: str) -> bool:
+        return self.path(document_id).exists() or self.legacy_path(document_id).exists()
+
+    def writer(self, document_id: str) -> ChunkWriter:
+        return ChunkWriter(self.path(document_id))
+
+    def save(self, document_id: str, chunks: list) -> int:
+        """Persist all chunks of a document, replacing any previous version"""
+        with self.writer(document_id) as writer:
+            writer.write(chunks)
+        self.legacy_path(document_id).unlink(missing_ok=True)
+        return writer.count
+
+    def open(self, document_id: str) -> ChunkFile:
+        """Memory-map a document's chunks, converting a legacy JSON file first"""
+        if not self.path(document_id).exists() and self.legacy_path(document_id).exists():
+            self.convert_legacy(document_id)
+        return ChunkFile(self.path(document_id))
+
+    def load(self, document_id: str) -> list:
+        """Load all chunks as Documents, or None if the document has none stored"""
+        if not self.exists(document_id):
+            return None
+        with self.open(document_id) as chunk_file:
+            return chunk_file.documents()
+
+    def count(self, document_id: str) -> int:
+        if not self.exists(document_id):
+            return 0
+        with self.open(document_id) as chunk_file:
+            return len(chunk_file)
+
+    def page(self, document_id: str, offset: int = 0, limit: int = 20):
+        """Return (total, chunks[offset:offset + limit]), or None if nothing is stored"""
+        if not self.exists(document_id):
+            return None
+        with self.open(document_id) as chunk_file:
+            return len(chunk_file), chunk_file.documents(offset, offset + limit)
+
+    def delete(self, document_id: str) -> bool:
+        deleted = False
+        for path in (self.path(document_id), self.legacy_path(document_id)):
+            if path.exists():
+                path.unlink()
+                deleted = True
+        return deleted
+
+    def document_ids(self) -> dict:
+        """{document_id: path} of every stored chunk file (binary or legacy JSON)"""
+        stored = {}
+        for pattern, suffix in (("*.chunks", ".chunks"), ("*.json", ".json")):
+            for path in self.root.glob(pattern):
+                stored.setdefault(path.name[:-len(suffix)], path)
+        return stored
+
+    def convert_legacy(self, document_id: str) -> int:
+        """Rewrite a legacy <document_id>.json chunk file in the binary format"""
+        with open(self.legacy_path(document_id), "r", encoding="utf-8") as f:
+            chunks = [
+                Document(page_content=c.get("page_content", ""), metadata=c.get("metadata", {}))
+                for c in json.load(f)
+            ]
+        return self.save(document_id, chunks)
+
+
+chunk_store = ChunkStore()
@@ -0,0 +1,228 @@
+"""
+Document deletion and garbage collection
+
+A document lives in four places: the uploaded PDF (data/uploads), its chunk
+file (app/storage/chunks), its metadata/index rows in PostgreSQL and its
+points in one or more Qdrant collections. delete_document() removes all of
+them. Vectors go first and the rows last, so an interrupted delete leaves
+vectors or files without a row, which the sweeper picks up. Indexing jobs
+check the document's record before writing vectors and index rows, and
+discard their work when it was deleted meanwhile (app/worker/index_document.py).
+
+The sweeper treats the metadata rows as the source of truth. Every pass:
+
+1. expires documents by the retention policy (DOCUMENT_RETENTION_DAYS for
+   all documents, UNINDEXED_RETENTION_HOURS for uploads never indexed)
+2. deletes index rows whose document has no metadata row, once not
+   updated for GC_ORPHAN_GRACE_HOURS (left by an indexing job that finished
+   after its document was deleted)
+3. deletes vectors whose document_id has neither a metadata nor an index
+   row, per collection, using a facet over the metadata.document_id payload
+   index instead of a scroll. Vectors of a document whose chunk file or
+   upload is younger than GC_ORPHAN_GRACE_HOURS are kept: its row may not be
+   written yet
+4. deletes chunk files and uploads that have no row and are older than
+   GC_ORPHAN_GRACE_HOURS (an upload's row is written after its file)
+
+Each kind is reclaimed GC_BATCH_SIZE documents at a time; the rest waits for
+the next pass. A pass is skipped entirely when the database is unavailable.
+Background sweeps only report (like POST /knowledge/gc without dry_run=false)
+unless GC_DELETE_ENABLED is set; the last report is kept in last_report.
+
+Configuration (environment):
+- GC_INTERVAL_SECONDS: seconds between background sweeps, 0 = off (default 3600)
+- GC_DELETE_ENABLED: let background sweeps delete, not just report (default false)
+- GC_BATCH_SIZE: documents reclaimed per pass and kind (default 100)
+- GC_ORPHAN_GRACE_HOURS: minimum age of an unreferenced file (default 24)
+- DOCUMENT_RETENTION_DAYS: delete documents not updated for this long,
+  0 = keep forever (default 0)
+- UNINDEXED_RETENTION_HOURS: delete uploads that were never indexed after
+  this long, 0 = keep (default 72)
+"""
+
+import asyncio
+import glob
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import anyio
+
+from app.services.chunk_store import chunk_store
+from app.services.file_loader import UPLOAD_DIR
+from app.vector_store.backends import vector_backend
+
+GC_INTERVAL_SECONDS = float(os.getenv("GC_INTERVAL_SECONDS", "3600"))
+GC_DELETE_ENABLED = os.getenv("GC_DELETE_ENABLED", "false").lower() == "true"
+GC_BATCH_SIZE = int(os.getenv("GC_BATCH_SIZE", "100"))
+GC_ORPHAN_GRACE_HOURS = float(os.getenv("GC_ORPHAN_GRACE_HOURS", "24"))
+DOCUMENT_RETENTION_DAYS = float(os.getenv("DOCUMENT_RETENTION_DAYS", "0"))
+UNINDEXED_RETENTION_HOURS = float(os.getenv("UNINDEXED_RETENTION_HOURS", "72"))
+
+
+def delete_document(document_id: str) -> dict:
+    """Remove a document's vectors, uploaded file, chunks and rows; returns what was found"""
+    from app.database import DocumentService
+
+    try:
+        # Tells readers the document is going away while the rest is deleted
+        DocumentService.update_document_status(document_id, "deleting")
+    except Exception as db_error:
+        print(f"[GC] Warning: Could not mark {document_id} as deleting: {str(db_error)}")
+
+    vectors = vector_backend.purge_documents([document_id])
+
+    upload = UPLOAD_DIR / document_id
+    file_deleted = upload.exists()
+    upload.unlink(missing_ok=True)
+
+    chunks_deleted = chunk_store.delete(document_id)
+    records_deleted = DocumentService.delete_document(document_id)
+
+    print(f"[GC] Deleted {document_id}: {vectors} vectors, file={file_deleted}, "
+          f"chunks={chunks_deleted}, records={records_deleted}")
+    return {
+        "document_id": document_id,
+        "vectors": vectors,
+        "file": file_deleted,
+        "chunks": chunks_deleted,
+        "records": records_deleted,
+    }
+
+
+def _older_than(path: Path, hours: float) -> bool:
+    try:
+        return time.time() - path.stat().st_mtime > hours * 3600
+    except FileNotFoundError:
+        return False
+
+
+def _recent(document_id: str, hours: float) -> bool:
+    """A chunk file or upload of the document was written within the grace window"""
+    chunks = chunk_store.path(document_id)
+    # <name>.*.tmp: chunk files of streaming ingestions still being written
+    paths = [chunks, chunk_store.legacy_path(document_id), UPLOAD_DIR / document_id,
+             *chunks.parent.glob(f"{glob.escape(chunks.name)}.*.tmp")]
+    return any(path.exists() and not _older_than(path, hours) for path in paths)
+
+
+class GarbageCollector:
+    def __init__(self, interval: float = GC_INTERVAL_SECONDS, batch_size: int = GC_BATCH_SIZE,
+                 delete_enabled: bool = GC_DELETE_ENABLED):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.delete_enabled = delete_enabled
+        self.last_report = None
+        self._task = None
+
+    def _expired(self) -> list:
+        from app.database import DocumentService
+
+        expired = []
+        now = datetime.utcnow()
+        if DOCUMENT_RETENTION_DAYS > 0:
+            expired += DocumentService.find_expired(
+                now - timedelta(days=DOCUMENT_RETENTION_DAYS), limit=self.batch_size
+            )
+        if UNINDEXED_RETENTION_HOURS > 0:
+            expired += DocumentService.find_expired(
+                now - timedelta(hours=UNINDEXED_RETENTION_HOURS),
+                statuses=["uploaded", "failed", "deleting"],
+                limit=self.batch_size,
+            )
+        return list(dict.fromkeys(expired))[:self.batch_size]
+
+    def sweep(self, dry_run: bool = False) -> dict:
+        """One pass over all stores; with dry_run, report what would be reclaimed"""
+        from app.database import DocumentService
+
+        started = time.perf_counter()
+        report = {"dry_run": dry_run, "expired": [], "orphan_indexes": [], "orphan_vectors": {},
+                  "orphan_chunks": [], "orphan_uploads": []}
+        try:
+            expired = self._expired()
+            known = DocumentService.list_document_ids()
+            indexed = DocumentService.list_indexed_document_ids()
+            orphan_indexes = DocumentService.find_orphan_indexes(
+                datetime.utcnow() - timedelta(hours=GC_ORPHAN_GRACE_HOURS), limit=self.batch_size
+            )
+        except Exception as db_error:
+            print(f"[GC] Database not available, skipping sweep: {str(db_error)}")
+            return {**report, "skipped": str(db_error)}
+
+        # 1. Retention
+        for document_id in expired:
+            report["expired"].append(document_id)
+            if not dry_run:
+                delete_document(document_id)
+        known -= set(expired)
+
+        # 2. Index rows without a metadata row
+        for document_id in orphan_indexes:
+            report["orphan_indexes"].append(document_id)
+            if not dry_run:
+                DocumentService.delete_document(document_id)
+                indexed.discard(document_id)
+
+        # 3. Vectors without a metadata or index row, past the grace window
+        for collection in vector_backend.list_collections():
+            name = collection["name"]
+            orphans = [doc_id for doc_id in vector_backend.stored_document_ids(name)
+                       if doc_id not in known and doc_id not in indexed
+                       and not _recent(doc_id, GC_ORPHAN_GRACE_HOURS)]
+            orphans = orphans[:self.batch_size]
+            if orphans:
+                points = vector_backend.purge_documents(orphans, [name]) if not dry_run else None
+                report["orphan_vectors"][name] = {"documents": len(orphans), "points": points}
+
+        # 4. Chunk files and uploads without a metadata row
+        for document_id, path in chunk_store.document_ids().items():
+            if len(report["orphan_chunks"]) >= self.batch_size:
+                break
+            if document_id not in known and _older_than(path, GC_ORPHAN_GRACE_HOURS):
+                report["orphan_chunks"].append(document_id)
+                if not dry_run:
+                    chunk_store.delete(document_id)
+
+        if UPLOAD_DIR.exists():
+            for path in UPLOAD_DIR.iterdir():
+                if len(report["orphan_uploads"]) >= self.batch_size:
+                    break
+                if path.is_file() and path.name not in known and _older_than(path, GC_ORPHAN_GRACE_HOURS):
+                    report["orphan_uploads"].append(path.name)
+                    if not dry_run:
+                        path.unlink(missing_ok=True)
+
+        report["seconds"] = round(time.perf_counter() - started, 3)
+        print(f"[GC] {'Dry run' if dry_run else 'Sweep'}: {len(report['expired'])} expired, "
+              f"{len(report['orphan_indexes'])} orphan index records, "
+              f"{sum(v['documents'] for v in report['orphan_vectors'].values())} documents of orphan vectors, "
+              f"{len(report['orphan_chunks'])} chunk files, {len(report['orphan_uploads'])} uploads")
+        self.last_report = report
+        return report
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await anyio.to_thread.run_sync(lambda: self.sweep(dry_run=not self.delete_enabled))
+            except Exception as e:
+                print(f"[GC] Sweep failed: {str(e)}")
+
+    def start(self):
+        """Run sweeps every `interval` seconds on the current event loop"""
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+gc_sweeper = GarbageCollector()
@@ -0,0 +1,236 @@
+"""
+Process pool for CPU-bound PDF extraction and chunking
+
+PyPDFLoader and the text splitter hold the GIL, so running them inside an
+async route freezes every other request on the uvicorn worker. Uploads submit
+their extraction to this pool and await the result instead.
+
+Configuration (environment):
+- EXTRACTION_WORKERS: number of worker processes (default 2)
+- EXTRACTION_TIMEOUT: seconds an upload waits for its task (default 300)
+- EXTRACTION_MAX_QUEUE: tasks allowed to wait for a free worker (default 8)
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "2"))
+EXTRACTION_TIMEOUT = float(os.getenv("EXTRACTION_TIMEOUT", "300"))
+EXTRACTION_MAX_QUEUE = int(os.getenv("EXTRACTION_MAX_QUEUE", "8"))
+
+
+class ExtractionQueueFullError(RuntimeError):
+    """Raised when the pool already has max_workers + max_queue tasks pending"""
+
+
+class ExtractionTimeoutError(TimeoutError):
+    """Raised when a task does not finish within its timeout"""
+
+
+# ===== WORKER-SIDE FUNCTIONS (run in the child processes) =====
+
+def _warm_up() -> int:
+    """Import the heavy parsing libraries once per worker process"""
+    import pypdf  # noqa: F401
+    import langchain_community.document_loaders  # noqa: F401
+    import app.services.text_extractor  # noqa: F401
+    from app.services.text_chunker import text_chunker
+    text_chunker.warm()
+    return os.getpid()
+
+
+def _timed_call(fn, args):
+    """Run fn(*args) and return (result, busy_seconds) for utilization metrics"""
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def extract_and_chunk(filename: str) -> list:
+    """Extract a stored PDF and split it into chunks (Document objects)"""
+    from app.services.text_extractor import text_extractor
+    from app.services.text_chunker import text_chunker
+
+    # Large documents are sharded by ExtractionPool.extract_document instead
+    docs = text_extractor.extract(filename, parallel=False)
+    return text_chunker.split_documents(docs)
+
+
+def extract_and_chunk_pages(filename: str, start: int, stop: int) -> list:
+    """Extract and chunk the page shard [start, stop) of a stored PDF"""
+    from app.services.text_extractor import text_extractor
+    from app.services.text_chunker import text_chunker
+
+    docs = text_extractor.extract_pages(filename, start, stop)
+    # Chunks never span pages, so sharding does not change them
+    return text_chunker.split_documents(docs)
+
+
+# ===== POOL =====
+
+class ExtractionPool:
+    """
+    Bounded ProcessPoolExecutor with per-task timeouts and utilization metrics
+
+    A timed-out task cannot be interrupted inside its worker process; it keeps
+    counting against the queue depth until it actually finishes, so a stuck
+    PDF cannot cause unbounded submissions.
+    """
+
+    def __init__(self, max_workers: int = EXTRACTION_WORKERS, timeout: float = EXTRACTION_TIMEOUT,
+                 max_queue: int = EXTRACTION_MAX_QUEUE):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_queue = max_queue
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._started_at = None
+        self._counters = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "timed_out": 0,
+            "rejected": 0,
+        }
+        self._busy_seconds = 0.0
+        self._wait_seconds = 0.0
+
+    def start(self, warm: bool = True):
+        """Create the worker processes; with warm=True also preload their imports"""
+        with self._lock:
+            if self._executor is not None:
+                return
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            self._started_at = time.monotonic()
+        print(f"[EXTRACT] Pool started with {self.max_workers} workers")
+        if warm:
+            # Submitting one task per worker at once makes the executor spawn them all
+            futures = [self._executor.submit(_warm_up) for _ in range(self.max_workers)]
+            pids = {f.result() for f in futures}
+            print(f"[EXTRACT] Warmed {len(pids)} worker processes")
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+            print("[EXTRACT] Pool shut down")
+
+    def _restart(self):
+        """Replace a broken pool (e.g. a worker was OOM-killed)"""
+        print("[EXTRACT] Worker process died, restarting pool")
+        self.shutdown()
+        self.start(warm=False)
+
+    def _on_done(self, future, submitted_at: float):
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                self._counters["failed"] += 1
+                return
+            _, busy = future.result()
+            self._counters["completed"] += 1
+            self._busy_seconds += busy
+            self._wait_seconds += max(0.0, time.monotonic() - submitted_at - busy)
+
+    async def run(self, fn, *args, timeout: float = None):
+        """
+        Run fn(*args) in a worker process and await its result.
+
+        Raises:
+            ExtractionQueueFullError: too many tasks are already pending
+            ExtractionTimeoutError: the task did not finish within timeout
+        """
+        if self._executor is None:
+            self.start(warm=False)
+
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self._counters["rejected"] += 1
+                raise ExtractionQueueFullError(
+                    f"Extraction queue is full ({self._pending} tasks pending)"
+                )
+            self._pending += 1
+            self._counters["submitted"] += 1
+
+        submitted_at = time.monotonic()
+        try:
+            future = self._executor.submit(_timed_call, fn, args)
+        except BrokenProcessPool:
+            with self._lock:
+                self._pending -= 1
+            self._restart()
+            raise
+        future.add_done_callback(lambda f: self._on_done(f, submitted_at))
+
+        try:
+            result, _ = await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(future)),
+                timeout=timeout or self.timeout,
+            )
+            return result
+        except asyncio.TimeoutError:
+            # Only succeeds if the task has not reached a worker yet
+            future.cancel()
+            with self._lock:
+                self._counters["timed_out"] += 1
+            raise ExtractionTimeoutError(f"Extraction timed out after {timeout or self.timeout}s")
+        except BrokenProcessPool:
+            self._restart()
+            raise
+
+    async def extract_document(self, filename: str) -> list:
+        """
+        Extract and chunk a stored PDF on the pool.
+
+        Documents with at least PARALLEL_EXTRACTION_MIN_PAGES pages are split
+        into one page shard per worker; the shards' chunks are merged back in
+        page order.
+        """
+        from app.services.text_extractor import (
+            text_extractor,
+            shard_ranges,
+            PARALLEL_EXTRACTION_MIN_PAGES,
+        )
+
+        total_pages = await asyncio.to_thread(text_extractor.page_count, filename)
+        if self.max_workers < 2 or total_pages < PARALLEL_EXTRACTION_MIN_PAGES:
+            return await self.run(extract_and_chunk, filename)
+
+        ranges = shard_ranges(total_pages, self.max_workers)
+        print(f"[EXTRACT] {filename}: {total_pages} pages in {len(ranges)} shards")
+        shards = await asyncio.gather(*(
+            self.run(extract_and_chunk_pages, filename, start, stop)
+            for start, stop in ranges
+        ))
+        return [chunk for shard in shards for chunk in shard]
+
+    def stats(self) -> dict:
+        """Utilization metrics for sizing the pool"""
+        with self._lock:
+            uptime = time.monotonic() - self._started_at if self._started_at else 0.0
+            completed = self._counters["completed"]
+            in_flight = min(self._pending, self.max_workers)
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self._executor is not None,
+                "in_flight": in_flight,
+                "queued": self._pending - in_flight,
+                **self._counters,
+                "busy_seconds": round(self._busy_seconds, 3),
+                "avg_task_seconds": round(self._busy_seconds / completed, 3) if completed else 0.0,
+                "avg_queue_wait_seconds": round(self._wait_seconds / completed, 3) if completed else 0.0,
+                "utilization": round(self._busy_seconds / (uptime * self.max_workers), 4) if uptime else 0.0,
+                "uptime_seconds": round(uptime, 1),
+            }
+
+
+extraction_pool = ExtractionPool()
@@ -1,21 +1,76 @@
 from fastapi import UploadFile
 from pathlib import Path
+import hashlib
+import os
 import uuid
 
+import anyio
+
 UPLOAD_DIR = Path("data/uploads")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
+# Uploads are streamed to disk in fixed-size pieces so a large PDF never sits
+# in memory as a single bytes object.
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))  # 1 MiB
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(200 * 1024 * 1024)))  # 200 MiB
+
+
+class FileTooLargeError(ValueError):
+    """Raised when an upload exceeds MAX_UPLOAD_BYTES"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        super().__init__(f"File exceeds maximum upload size of {limit} bytes")
+
+
 class FileLoader:
-    async def save(self, file: UploadFile) -> str:
+    def __init__(self, chunk_size: int = UPLOAD_CHUNK_SIZE, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+
+    async def save(self, file: UploadFile) -> dict:
+        """
+        Stream an upload to UPLOAD_DIR.
+
+        Reads the UploadFile in chunk_size pieces, writes them with
+        non-blocking file I/O and hashes them on the way through.
+
+        Returns:
+            {"file_id": "<uuid>.pdf", "sha256": "<hex digest>", "size": <bytes>}
+
+        Raises:
+            FileTooLargeError: as soon as more than max_bytes have been read.
+            The partially written file is removed.
+        """
         print("Saving file:", "Triggered")
+
+        # Reject early when the client announced the size up front
+        if file.size is not None and file.size > self.max_bytes:
+            raise FileTooLargeError(self.max_bytes)
+
         ext = Path(file.filename).suffix
         file_id = f"{uuid.uuid4()}{ext}"
         file_path = UPLOAD_DIR / file_id
 
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        digest = hashlib.sha256()
+        size = 0
+
+        try:
+            async with await anyio.open_file(file_path, "wb") as f:
+                while True:
+                    chunk = await file.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise FileTooLargeError(self.max_bytes)
+                    digest.update(chunk)
+                    await f.write(chunk)
+        except BaseException:
+            file_path.unlink(missing_ok=True)
+            raise
 
-        return file_id
+        print(f"Saved file: {file_id} ({size} bytes)")
+        return {"file_id": file_id, "sha256": digest.hexdigest(), "size": size}
 
 file_loader = FileLoader()
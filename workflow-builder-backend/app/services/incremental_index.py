@@ -0,0 +1,121 @@
+"""
+Incremental re-indexing via per-chunk content hashes
+
+Every stored chunk point carries metadata.content_hash (see
+ChunkIdentity), so a new version of a document can be diffed against the
+vectors already in the collection instead of being embedded from scratch:
+
+- reused:  a stored point has the same text; its vector is kept and only its
+           metadata (document_id, chunk_index, page, ...) is rewritten if it
+           changed
+- added:   no stored point has this text; it is embedded and upserted
+- deleted: stored points whose text no longer occurs are removed
+
+The stored points considered are the document's own (a re-run) plus,
+optionally, those of a previous version of the document, whose vectors are
+taken over by the new version.
+"""
+
+import time
+from collections import defaultdict
+from typing import Any, List, NamedTuple
+
+from langchain_core.documents import Document
+
+from app.vector_store.backends import vector_backend
+from app.vector_store.base import METADATA_KEY
+from app.vector_store.qdrant import ChunkIdentity
+
+
+class ReindexPlan(NamedTuple):
+    reused: int           # chunks whose stored vector is kept
+    updates: dict         # point_id -> new metadata, for reused points that moved
+    add_ids: list         # point ids of chunks that must be embedded
+    add_documents: list   # the corresponding tagged chunks
+    delete_ids: list      # stored points that no chunk matches anymore
+
+
+def plan_reindex(ids: List[str], documents: List[Document], existing: list,
+                 metadata_key: str = "metadata") -> ReindexPlan:
+    """
+    Match the tagged chunks of the new version against stored points.
+
+    Args:
+        ids, documents: output of ChunkIdentity.tag() for the new version
+        existing: stored records (id + metadata payload) of the stored versions
+    """
+    stored = {str(record.id): (record.payload or {}).get(metadata_key) or {} for record in existing}
+    by_hash = defaultdict(list)
+    for point_id, metadata in stored.items():
+        by_hash[metadata.get("content_hash")].append(point_id)
+
+    matches, claimed = {}, set()
+    # Same id first (unchanged chunk of the same document), then any point with the same text
+    for i, point_id in enumerate(ids):
+        if point_id in stored:
+            matches[i] = point_id
+            claimed.add(point_id)
+    for i, doc in enumerate(documents):
+        if i in matches:
+            continue
+        candidates = by_hash.get(doc.metadata["content_hash"])
+        while candidates:
+            point_id = candidates.pop()
+            if point_id not in claimed:
+                matches[i] = point_id
+                claimed.add(point_id)
+                break
+
+    updates, add_ids, add_documents = {}, [], []
+    for i, (point_id, doc) in enumerate(zip(ids, documents)):
+        match = matches.get(i)
+        if match is None:
+            add_ids.append(point_id)
+            add_documents.append(doc)
+        elif stored[match] != doc.metadata:
+            updates[match] = doc.metadata
+
+    return ReindexPlan(
+        reused=len(matches),
+        updates=updates,
+        add_ids=add_ids,
+        add_documents=add_documents,
+        delete_ids=[point_id for point_id in stored if point_id not in claimed],
+    )
+
+
+def reindex_incremental(document_id: str, documents: List[Document], embedding: Any,
+                        previous_document_id: str = None, on_progress=None) -> dict:
+    """
+    Bring the document's points in line with its chunks, embedding only new text.
+
+    New points are upserted before stale ones are deleted, so the document
+    stays searchable throughout.
+    """
+    started = time.perf_counter()
+    ids, tagged = ChunkIdentity(document_id).tag(documents)
+
+    scope = [document_id]
+    if previous_document_id and previous_document_id != document_id:
+        scope.append(previous_document_id)
+    existing = vector_backend.scroll_chunks(scope, embedding)
+    plan = plan_reindex(ids, tagged, existing, METADATA_KEY)
+    print(f"[REINDEX] {document_id}: {plan.reused} reused, {len(plan.add_ids)} to embed, "
+          f"{len(plan.delete_ids)} to delete ({len(existing)} stored points)")
+
+    # One call, so the embedding executor can batch and parallelize all new text
+    vectors = embedding.embed_documents([doc.page_content for doc in plan.add_documents])
+    upsert = vector_backend.upsert_parallel(plan.add_documents, vectors, embedding, ids=plan.add_ids,
+                                            on_progress=on_progress)
+
+    vector_backend.set_chunk_metadata(plan.updates, embedding)
+    vector_backend.delete_points(plan.delete_ids, embedding)
+
+    return {
+        "reused": plan.reused,
+        "added": len(plan.add_ids),
+        "deleted": len(plan.delete_ids),
+        "metadata_updated": len(plan.updates),
+        "upsert": upsert,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
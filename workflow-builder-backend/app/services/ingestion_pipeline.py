@@ -0,0 +1,165 @@
+"""
+Streaming ingestion pipeline: page → chunk → embed → upsert
+
+Instead of materializing every page, every chunk and every vector of a
+document, the stages are connected by bounded queues:
+
+    [parse + chunk + batch] ─queue─▶ [embed] ─queue─▶ [upsert]
+
+Each stage runs in its own thread. A full queue blocks the stage in front of
+it (backpressure), so peak memory is roughly
+
+    batch_size × (2 × queue_depth + 3) chunks
+
+independent of the document size. Batches are upserted as soon as they are
+embedded, so the first vectors are searchable while later pages are still
+being parsed.
+
+Configuration (environment):
+- INGEST_BATCH_SIZE: chunks per embedding/upsert batch (default 64)
+- INGEST_QUEUE_DEPTH: batches buffered between two stages (default 2)
+"""
+
+import os
+import queue
+import threading
+import time
+
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+INGEST_QUEUE_DEPTH = int(os.getenv("INGEST_QUEUE_DEPTH", "2"))
+
+_DONE = object()
+
+
+def iter_chunks(pages, splitter):
+    """Split pages one at a time; chunks never span pages anyway"""
+    for page in pages:
+        yield from splitter.split_documents([page])
+
+
+def iter_batches(items, batch_size: int):
+    """Group an iterable into lists of at most batch_size items"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class PipelineAborted(Exception):
+    """Internal signal: another stage failed, stop this one"""
+
+
+class IngestionPipeline:
+    def __init__(self, batch_size: int = INGEST_BATCH_SIZE, queue_depth: int = INGEST_QUEUE_DEPTH):
+        self.batch_size = batch_size
+        self.queue_depth = queue_depth
+
+    def run(self, pages, splitter, embed, upsert, on_progress=None) -> dict:
+        """
+        Stream pages through chunking, embedding and upserting.
+
+        Args:
+            pages: iterable of page Documents (e.g. text_extractor.iter_pages)
+            splitter: object with split_documents(list) -> list of chunks
+            embed: callable(list[str]) -> list of vectors
+            upsert: callable(list[Document], list[vector]) -> None
+            on_progress: optional callable(stats dict), called after each upsert
+
+        Returns:
+            stats dict with pages, chunks, batches, vectors and timings
+        """
+        embed_queue = queue.Queue(maxsize=self.queue_depth)
+        upsert_queue = queue.Queue(maxsize=self.queue_depth)
+        stop = threading.Event()
+        errors = []
+        started = time.perf_counter()
+        stats = {
+            "pages": 0,
+            "chunks": 0,
+            "batches": 0,
+            "vectors": 0,
+            "first_vector_seconds": None,
+        }
+
+        def put(q, item):
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+            raise PipelineAborted()
+
+        def get(q):
+            while not stop.is_set():
+                try:
+                    return q.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            raise PipelineAborted()
+
+        def counted_pages():
+            for page in pages:
+                stats["pages"] += 1
+                yield page
+
+        def stage(fn):
+            def target():
+                try:
+                    fn()
+                except PipelineAborted:
+                    pass
+                except BaseException as e:
+                    errors.append(e)
+                    stop.set()
+            return threading.Thread(target=target, daemon=True)
+
+        def produce():
+            for batch in iter_batches(iter_chunks(counted_pages(), splitter), self.batch_size):
+                stats["chunks"] += len(batch)
+                put(embed_queue, batch)
+            put(embed_queue, _DONE)
+
+        def embed_batches():
+            while True:
+                batch = get(embed_queue)
+                if batch is _DONE:
+                    put(upsert_queue, _DONE)
+                    return
+                vectors = embed([doc.page_content for doc in batch])
+                put(upsert_queue, (batch, vectors))
+
+        def upsert_batches():
+            while True:
+                item = get(upsert_queue)
+                if item is _DONE:
+                    return
+                batch, vectors = item
+                upsert(batch, vectors)
+                stats["batches"] += 1
+                stats["vectors"] += len(batch)
+                if stats["first_vector_seconds"] is None:
+                    stats["first_vector_seconds"] = round(time.perf_counter() - started, 3)
+                if on_progress:
+                    on_progress(dict(stats))
+
+        threads = [stage(produce), stage(embed_batches), stage(upsert_batches)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            raise errors[0]
+
+        elapsed = time.perf_counter() - started
+        stats["seconds"] = round(elapsed, 3)
+        stats["chunks_per_sec"] = round(stats["vectors"] / elapsed, 1) if elapsed else 0.0
+        return stats
+
+
+ingestion_pipeline = IngestionPipeline()
@@ -1,15 +1,207 @@
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+"""
+Offset-based text chunker
+
+Chunks are computed as character spans over each page's text instead of by
+repeatedly splitting and re-joining substrings. A window of chunk_size
+characters is placed at the current position and cut at the last paragraph
+break, line break or space inside it (in that order of preference); the next
+window starts chunk_overlap characters before the cut, moved forward to a
+word boundary. Only (start, end, page) records are produced; strings are
+built when Documents are actually requested.
+
+With unit="tokens" the same procedure runs over the token offsets of the
+configured embedding model, so every chunk costs at most chunk_size tokens
+to embed. The overlap is additionally capped so that re-embedded tokens stay
+below max_overlap_ratio of the tokens that are new in each chunk.
+
+Configuration (environment):
+- CHUNK_UNIT: "chars" or "tokens" (default "chars")
+- CHUNK_SIZE: maximum chars/tokens per chunk (default 1000)
+- CHUNK_OVERLAP: chars/tokens shared by consecutive chunks (default 200)
+- CHUNK_TOKENIZER_MODEL: model whose tokenizer measures tokens
+  (default EMBEDDING_MODEL, else text-embedding-3-small)
+- CHUNK_MAX_OVERLAP_RATIO: upper bound on overlap tokens / new tokens per
+  chunk in token mode (default 0.15)
+"""
+
+import bisect
+import os
+import re
+from typing import NamedTuple
+from langchain_core.documents import Document
+
+CHUNK_UNIT = os.getenv("CHUNK_UNIT", "chars")
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+CHUNK_TOKENIZER_MODEL = os.getenv(
+    "CHUNK_TOKENIZER_MODEL", os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+)
+CHUNK_MAX_OVERLAP_RATIO = float(os.getenv("CHUNK_MAX_OVERLAP_RATIO", "0.15"))
+
+_NON_SPACE = re.compile(r"\S")
+_SPACE = re.compile(r"\s")
+
+
+class ChunkSpan(NamedTuple):
+    start: int  # inclusive character offset into the page text
+    end: int    # exclusive character offset
+    page: int   # index of the page in the input list
+
 
 class TextChunker:
     def __init__(
         self,
-        chunk_size: int = 500,
-        chunk_overlap: int = 100
+        chunk_size: int = CHUNK_SIZE,
+        chunk_overlap: int = CHUNK_OVERLAP,
+        separators: tuple = ("\n\n", "\n", " "),
+        unit: str = CHUNK_UNIT,
+        tokenizer_model: str = CHUNK_TOKENIZER_MODEL,
+        max_overlap_ratio: float = CHUNK_MAX_OVERLAP_RATIO,
     ):
-        self.splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap
-        )
+        if chunk_overlap >= chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) must be smaller than chunk_size ({chunk_size})")
+        if unit not in ("chars", "tokens"):
+            raise ValueError(f"Unsupported chunk unit: {unit}")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators
+        self.unit = unit
+        self.tokenizer_model = tokenizer_model
+        self.max_overlap_ratio = max_overlap_ratio
+        # Don't cut at a separator that would leave a chunk under a quarter full
+        self.min_fill = chunk_size // 4
+
+    @property
+    def key(self) -> str:
+        """
+        Identifies the chunking parameters (part of the upload deduplication key).
+        Token mode may load the tokenizer: evaluate it off the event loop.
+        """
+        if self.unit == "tokens":
+            # The encoding actually in use: the approximate fallback chunks differently
+            from app.services.tokenizer import get_tokenizer
+            encoding = get_tokenizer(self.tokenizer_model).name
+            return (f"tokens:{self.tokenizer_model}:{encoding}:{self.chunk_size}:{self.chunk_overlap}"
+                    f":{self.max_overlap_ratio}")
+        return f"offsets:{self.chunk_size}:{self.chunk_overlap}"
+
+    def warm(self):
+        """Load the tokenizer up front (token mode), e.g. in a fresh worker process"""
+        if self.unit == "tokens":
+            from app.services.tokenizer import get_tokenizer
+            get_tokenizer(self.tokenizer_model)
+
+    def _cut(self, text: str, pos: int, limit: int, lo: int = None) -> int:
+        """End offset for the window [pos, limit): at the best separator, else limit"""
+        lo = pos + self.min_fill if lo is None else lo
+        for sep in self.separators:
+            i = text.rfind(sep, lo, limit)
+            if i != -1:
+                return i
+        return limit
+
+    def iter_spans(self, text: str, page: int = 0):
+        """Yield ChunkSpans covering one text"""
+        if self.unit == "tokens":
+            yield from self._iter_token_spans(text, page)
+        else:
+            yield from self._iter_char_spans(text, page)
+
+    def _iter_token_spans(self, text: str, page: int):
+        """
+        Token-mode spans: windows of at most chunk_size tokens, cut at a
+        separator where possible. The overlap is min(chunk_overlap,
+        max_overlap_ratio / (1 + max_overlap_ratio) x tokens in the chunk),
+        i.e. overlap tokens / new tokens never exceeds max_overlap_ratio.
+        """
+        from app.services.tokenizer import get_tokenizer
+
+        tokenizer = get_tokenizer(self.tokenizer_model)
+        tokens = tokenizer.encode(text, disallowed_special=())
+        n_tokens = len(tokens)
+        if not n_tokens:
+            return
+        # offsets[k] = character offset where token k starts
+        decoded, offsets = tokenizer.decode_with_offsets(tokens)
+        if decoded != text:
+            # Not a clean round trip (e.g. lone surrogates); fall back to characters
+            yield from self._iter_char_spans(text, page)
+            return
+
+        n = len(text)
+        overlap_share = self.max_overlap_ratio / (1 + self.max_overlap_ratio)
+        i = 0
+        while i < n_tokens:
+            j = min(i + self.chunk_size, n_tokens)
+            start = offsets[i]
+            if j < n_tokens:
+                # Cut at a separator inside the token window, then snap to a token start
+                limit = offsets[j]
+                cut = self._cut(text, start, limit, lo=offsets[min(i + self.min_fill, j)])
+                j = max(bisect.bisect_left(offsets, cut, i + 1, j), i + 1)
+            end = offsets[j] if j < n_tokens else n
+
+            stop = end
+            while stop > start and text[stop - 1].isspace():
+                stop -= 1
+            while start < stop and text[start].isspace():
+                start += 1
+            if stop > start:
+                yield ChunkSpan(start, stop, page)
+
+            if j >= n_tokens:
+                break
+            overlap = min(self.chunk_overlap, int((j - i) * overlap_share))
+            i = max(j - overlap, i + 1)
+
+    def _iter_char_spans(self, text: str, page: int):
+        n = len(text)
+        match = _NON_SPACE.search(text)
+        pos = match.start() if match else n
+
+        while pos < n:
+            limit = pos + self.chunk_size
+            end = n if limit >= n else self._cut(text, pos, limit)
+
+            stop = end
+            while stop > pos and text[stop - 1].isspace():
+                stop -= 1
+            if stop > pos:
+                yield ChunkSpan(pos, stop, page)
+
+            if end >= n:
+                break
+
+            # Step back by the overlap (at most half this chunk, so we always advance)
+            next_pos = end - min(self.chunk_overlap, (end - pos) // 2)
+            if next_pos > 0 and not text[next_pos - 1].isspace():
+                # Start the overlap at a word boundary rather than mid-word
+                match = _SPACE.search(text, next_pos, end)
+                if match:
+                    next_pos = match.end()
+            match = _NON_SPACE.search(text, next_pos)
+            if not match:
+                break
+            pos = max(match.start(), pos + 1)
+
+    def spans(self, docs: list) -> list:
+        """ChunkSpans for a list of page Documents"""
+        return [
+            span
+            for page, doc in enumerate(docs)
+            for span in self.iter_spans(doc.page_content, page)
+        ]
+
+    def iter_documents(self, docs):
+        """Lazily yield chunk Documents; each keeps its page's metadata"""
+        for page, doc in enumerate(docs):
+            text = doc.page_content
+            for start, end, _ in self.iter_spans(text, page):
+                yield Document(page_content=text[start:end], metadata=dict(doc.metadata))
+
+    def split_documents(self, documents) -> list:
+        """Drop-in replacement for RecursiveCharacterTextSplitter.split_documents"""
+        return list(self.iter_documents(documents))
 
     def chunk(self, docs):
         """
@@ -17,8 +209,8 @@ class TextChunker:
         docs: List of Document objects from PyPDFLoader
         """
         print("Chunking documents...")
-        chunks = self.splitter.split_documents(documents=docs)
+        chunks = self.split_documents(docs)
         print("Number of text chunks created:", len(chunks))
         return chunks
 
-text_chunker = TextChunker(chunk_size=1000, chunk_overlap=200)
\ No newline at end of file
+text_chunker = TextChunker()
@@ -1,27 +1,119 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
 
 # 🔥 FIX: go up TWO levels (services → app → project root)
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
 UPLOADS_DIR = PROJECT_ROOT / "data" / "uploads"
 
+# Documents with at least this many pages are extracted in page shards on several cores
+PARALLEL_EXTRACTION_MIN_PAGES = int(os.getenv("PARALLEL_EXTRACTION_MIN_PAGES", "200"))
+PARALLEL_EXTRACTION_WORKERS = int(os.getenv("PARALLEL_EXTRACTION_WORKERS", str(os.cpu_count() or 2)))
+
 print("Uploads Directory:", UPLOADS_DIR)
 
 
+def shard_ranges(total_pages: int, shards: int) -> list:
+    """Split [0, total_pages) into at most `shards` contiguous (start, stop) ranges"""
+    shards = max(1, min(shards, total_pages))
+    size, extra = divmod(total_pages, shards)
+    ranges = []
+    start = 0
+    for i in range(shards):
+        stop = start + size + (1 if i < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def _document_metadata(reader, source: str) -> dict:
+    """Document-level metadata in the same shape PyPDFLoader produces"""
+    metadata = {"producer": "PyPDF", "creator": "PyPDF", "creationdate": ""}
+    for key, value in (reader.metadata or {}).items():
+        metadata[str(key).lstrip("/").lower()] = str(value)
+    metadata["source"] = source
+    metadata["total_pages"] = len(reader.pages)
+    return metadata
+
+
 class TextExtractor:
-    def extract(self, filename: str):
+    def _path(self, filename: str) -> Path:
         pdf_path = UPLOADS_DIR / filename
-        print("Extracting text from PDF:", pdf_path)
-        
         if not pdf_path.exists():
             raise FileNotFoundError(f"PDF not found: {pdf_path}")
+        return pdf_path
+
+    def page_count(self, filename: str) -> int:
+        """Number of pages, read from the page tree without extracting any text"""
+        from pypdf import PdfReader
+        return len(PdfReader(str(self._path(filename))).pages)
+
+    def extract_pages(self, filename: str, start: int, stop: int) -> list:
+        """
+        Extract pages [start, stop) as one Document per page.
+
+        Metadata matches PyPDFLoader (source, page, page_label, total_pages,
+        PDF info fields) so chunks keep their citations.
+        """
+        return list(self.iter_pages(filename, start, stop))
 
-        loader = PyPDFLoader(str(pdf_path))
-        docs = loader.load()
+    def iter_pages(self, filename: str, start: int = 0, stop: int = None):
+        """Yield one Document per page, parsing lazily so only one page is held at a time"""
+        from pypdf import PdfReader
+
+        pdf_path = self._path(filename)
+        reader = PdfReader(str(pdf_path))
+        doc_metadata = _document_metadata(reader, str(pdf_path))
+        page_labels = reader.page_labels
+        total_pages = len(reader.pages)
+
+        for page_number in range(start, total_pages if stop is None else min(stop, total_pages)):
+            text = reader.pages[page_number].extract_text() or ""
+            yield Document(
+                page_content=text.strip(),
+                metadata={**doc_metadata, "page": page_number, "page_label": page_labels[page_number]},
+            )
+
+    def extract(self, filename: str, parallel: bool = None):
+        """
+        Extract every page of a stored PDF.
+
+        parallel=None switches to page-sharded extraction automatically for
+        documents with at least PARALLEL_EXTRACTION_MIN_PAGES pages.
+        """
+        pdf_path = self._path(filename)
+        print("Extracting text from PDF:", pdf_path)
+
+        if parallel is None:
+            parallel = (
+                PARALLEL_EXTRACTION_WORKERS > 1
+                and self.page_count(filename) >= PARALLEL_EXTRACTION_MIN_PAGES
+            )
+
+        if parallel:
+            docs = self.extract_parallel(filename)
+        else:
+            loader = PyPDFLoader(str(pdf_path))
+            docs = loader.load()
 
         print("Number of pages extracted:", len(docs))
         return docs
 
+    def extract_parallel(self, filename: str, workers: int = PARALLEL_EXTRACTION_WORKERS) -> list:
+        """Extract page shards on `workers` processes and merge them in page order"""
+        ranges = shard_ranges(self.page_count(filename), workers)
+        print(f"Extracting {len(ranges)} page shards in parallel")
+        with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+            shards = executor.map(
+                self.extract_pages,
+                [filename] * len(ranges),
+                [start for start, _ in ranges],
+                [stop for _, stop in ranges],
+            )
+            # map() yields in submission order, which is page order
+            return [doc for shard in shards for doc in shard]
+
 
 text_extractor = TextExtractor()
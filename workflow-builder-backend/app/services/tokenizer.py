@@ -0,0 +1,118 @@
+"""
+Tokenizers for embedding models
+
+Loading a BPE encoding takes tens of milliseconds (and a download the first
+time), so each model's tokenizer is created once per process and cached.
+
+OpenAI embedding models use their own tiktoken encoding. Providers without a
+local tokenizer (e.g. Gemini) fall back to cl100k_base, which is close enough
+to budget chunk sizes. When no BPE file can be loaded (offline, nothing in
+TIKTOKEN_CACHE_DIR), an approximate word/punctuation tokenizer is used so
+offline runs still work. The fallback is not cached: loading is retried after
+TOKENIZER_RETRY_SECONDS, so a transient failure (network, cache dir) doesn't
+pin a process to approximate token counts. Chunking keys record the encoding
+actually used (TextChunker.key).
+
+Configuration (environment):
+- TOKENIZER_RETRY_SECONDS: wait before retrying a failed BPE load (default 300)
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+import tiktoken
+
+FALLBACK_ENCODING = "cl100k_base"
+TOKENIZER_RETRY_SECONDS = float(os.getenv("TOKENIZER_RETRY_SECONDS", "300"))
+
+# Token ids are 63-bit hashes of the piece
+_ID_MASK = (1 << 63) - 1
+
+
+class ApproxEncoding:
+    """
+    Offline stand-in for tiktoken.Encoding: words, punctuation runs and
+    whitespace runs are tokens. Roughly 1.3x fewer tokens than cl100k on
+    English prose, which is fine for budgeting.
+    """
+
+    name = "approx"
+    _PIECE = re.compile(r"\s*\w+|\s*[^\w\s]+|\s+")
+
+    def __init__(self):
+        # Pieces of the last encoded text per thread, for decode_with_offsets;
+        # ids themselves are hashes, so no vocabulary grows with the input
+        self._local = threading.local()
+
+    @staticmethod
+    def _id(piece: str) -> int:
+        digest = hashlib.blake2b(piece.encode("utf-8", "surrogatepass"), digest_size=8).digest()
+        return int.from_bytes(digest, "little") & _ID_MASK
+
+    def encode(self, text: str, disallowed_special=()) -> list:
+        pieces = {}
+        tokens = []
+        for m in self._PIECE.finditer(text):
+            token = self._id(m.group())
+            pieces[token] = m.group()
+            tokens.append(token)
+        self._local.pieces = pieces
+        return tokens
+
+    def decode_with_offsets(self, tokens: list):
+        """Decode tokens of the last text encoded on this thread"""
+        pieces = getattr(self._local, "pieces", {})
+        offsets, position = [], 0
+        for token in tokens:
+            offsets.append(position)
+            position += len(pieces[token])
+        return "".join(pieces[token] for token in tokens), offsets
+
+
+_approx = ApproxEncoding()
+_tokenizers = {}
+# {model: time of the last failed load}
+_failed = {}
+_tokenizers_lock = threading.Lock()
+
+
+def _load(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        print(f"[TOKENIZER] No tokenizer for {model}, using {FALLBACK_ENCODING}")
+        return tiktoken.get_encoding(FALLBACK_ENCODING)
+
+
+def get_tokenizer(model: str):
+    """tiktoken encoding for an embedding model, loaded once per model"""
+    tokenizer = _tokenizers.get(model)
+    if tokenizer is not None:
+        return tokenizer
+    with _tokenizers_lock:
+        tokenizer = _tokenizers.get(model)
+        if tokenizer is not None:
+            return tokenizer
+        if time.monotonic() - _failed.get(model, -TOKENIZER_RETRY_SECONDS) < TOKENIZER_RETRY_SECONDS:
+            return _approx
+        try:
+            tokenizer = _load(model)
+        except Exception as e:
+            _failed[model] = time.monotonic()
+            print(f"[TOKENIZER] Could not load a BPE encoding for {model} ({type(e).__name__}), "
+                  f"using the approximate tokenizer, retrying in {TOKENIZER_RETRY_SECONDS:.0f}s")
+            return _approx
+        _failed.pop(model, None)
+        _tokenizers[model] = tokenizer
+        return tokenizer
+
+
+def encode(text: str, model: str) -> list:
+    """Token ids of text; special-token strings in documents are encoded as plain text"""
+    return get_tokenizer(model).encode(text, disallowed_special=())
+
+
+def count_tokens(text: str, model: str) -> int:
+    return len(encode(text, model))
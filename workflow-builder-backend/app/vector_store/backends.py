@@ -0,0 +1,34 @@
+"""
+Vector backend selection
+
+VECTOR_BACKEND picks the implementation of the interfaces in
+app/vector_store/base.py for the whole process (API and workers must agree):
+
+- "qdrant": a Qdrant server (QDRANT_URL), writes over REST and searches over
+  the async gRPC client
+- "local": the embedded index in LOCAL_VECTOR_DIR (app/vector_store/local_index.py);
+  no extra service, exact search, dense-only retrieval
+
+Configuration (environment):
+- VECTOR_BACKEND: "qdrant" or "local" (default qdrant)
+"""
+
+import os
+
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant").lower()
+
+if VECTOR_BACKEND == "local":
+    from app.vector_store.local_index import local_index
+
+    vector_backend = local_index
+    vector_reader = local_index
+elif VECTOR_BACKEND == "qdrant":
+    from app.vector_store.qdrant import qdrant_manager
+    from app.vector_store.quadrant_reader import qdrant_reader
+
+    vector_backend = qdrant_manager
+    vector_reader = qdrant_reader
+else:
+    raise ValueError(f"Unknown VECTOR_BACKEND '{VECTOR_BACKEND}', expected 'qdrant' or 'local'")
+
+print(f"[VECTOR STORE] Backend: {VECTOR_BACKEND}")
@@ -0,0 +1,98 @@
+"""
+Vector backend interface
+
+Indexing jobs, re-indexing, deletion and garbage collection talk to a
+VectorBackend; the query path talks to a VectorReader. Two implementations:
+
+- Qdrant server: QdrantManager (app/vector_store/qdrant.py) and
+  AsyncQdrantReader (app/vector_store/quadrant_reader.py)
+- embedded: LocalVectorIndex (app/vector_store/local_index.py), both roles,
+  for single-node installs and tests without a Qdrant service
+
+app/vector_store/backends.py picks one (VECTOR_BACKEND). Both store a chunk
+as a point with a dense vector and the payload {"page_content": ...,
+"metadata": {...}} that langchain-qdrant uses, with metadata.document_id set
+by ChunkIdentity, and keep one collection per embedding space.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Any, List, NamedTuple
+
+from langchain_core.documents import Document
+
+CONTENT_KEY = "page_content"
+METADATA_KEY = "metadata"
+
+
+class ChunkRecord(NamedTuple):
+    """A stored point without its vector (the shape of a Qdrant Record)"""
+    id: str
+    payload: dict
+
+
+class VectorBackend(ABC):
+    """Writes and maintenance of chunk points, one collection per embedding space"""
+
+    @abstractmethod
+    def collection_name(self, embedding: Any) -> str:
+        """Collection of the embedding's vector space, created if missing"""
+
+    @abstractmethod
+    def upsert_embedded(self, documents: List[Document], vectors: List[List[float]], embedding: Any,
+                        ids: List[str] = None) -> int:
+        """Upsert documents whose vectors were already computed; searchable on return"""
+
+    @abstractmethod
+    def upsert_parallel(self, documents: List[Document], vectors: List[List[float]], embedding: Any,
+                        ids: List[str] = None, on_progress=None, **options) -> dict:
+        """
+        Bulk upsert; returns {points, batches, retries, seconds, points_per_sec}.
+        on_progress gets the same stats after each batch, plus the total points of the call.
+        """
+
+    @abstractmethod
+    def scroll_chunks(self, document_ids: List[str], embedding: Any) -> List[ChunkRecord]:
+        """All points of the given documents, with their metadata payload"""
+
+    @abstractmethod
+    def set_chunk_metadata(self, updates: dict, embedding: Any) -> int:
+        """Replace the metadata payload of existing points: {point_id: metadata}"""
+
+    @abstractmethod
+    def delete_points(self, ids: List[str], embedding: Any) -> int:
+        pass
+
+    @abstractmethod
+    def list_collections(self) -> list:
+        """[{name, points, size, sparse, indexed_fields}] of every collection"""
+
+    @abstractmethod
+    def stored_document_ids(self, collection_name: str, limit: int = 100_000) -> dict:
+        """{document_id: point count} in a collection"""
+
+    @abstractmethod
+    def purge_documents(self, document_ids: List[str], collection_names: List[str] = None) -> int:
+        """Delete every point of the given documents from all (or the given) collections"""
+
+    def delete_document_points(self, document_id: str, embedding: Any, keep_ids: List[str] = ()) -> int:
+        """Delete a document's points in the embedding's collection, except keep_ids"""
+        keep = set(keep_ids)
+        stale = [str(record.id) for record in self.scroll_chunks([document_id], embedding)
+                 if str(record.id) not in keep]
+        return self.delete_points(stale, embedding)
+
+
+class VectorReader(ABC):
+    """Searches of the query path"""
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    @abstractmethod
+    async def search(self, embedding, vector: List[float], k: int = 5, document_ids: List[str] = None,
+                     query_text: str = None, mode: str = None, mmr_fetch_k: int = 0,
+                     mmr_lambda: float = None) -> List[Document]:
+        """Top-k chunks for a query vector, optionally restricted to some documents"""
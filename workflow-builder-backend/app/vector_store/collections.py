@@ -0,0 +1,250 @@
+"""
+Collection registry: one Qdrant collection per embedding space
+
+Vectors of different models (or of one model at different sizes) cannot
+share a collection. Instead of recreating a single collection whenever the
+model changes, which wipes every other document's vectors, each
+(provider, model, dimension) gets its own collection, e.g.
+`rag_openai_text_embedding_3_large_512`.
+
+Collections are created on first use with explicit vector params, a BM25
+sparse vector next to the dense one (app/embeddings/sparse.py) and a
+keyword payload index on metadata.document_id, so searches scoped to one
+document only visit that document's points. Collections created before
+sparse vectors existed keep working dense-only (spec.sparse is False).
+
+Collections are never dropped or recreated implicitly. An existing
+collection whose vector size does not match raises CollectionMismatchError;
+deleting data is left to an operator (scripts/reset_qdrant.py).
+
+The embedding space is read from the embeddings object: clients handed out
+by the client registry carry an `identity` (provider, model, dimension).
+For native-size clients the vector size is probed once per process.
+
+Resolved collections are cached per embedding space, so the query and
+indexing hot paths make no collection-info round trips. An entry is dropped
+by invalidate() (on a "collection not found" error) or by refresh(), a
+health check that re-reads the params of every cached collection and drops
+the ones that were deleted or whose vector params changed; the next
+resolve() then checks or recreates the collection as usual. A collection
+recreated with the same params stays cached and gets its payload index
+back. The API runs refresh() every COLLECTION_REFRESH_SECONDS.
+
+Configuration (environment):
+- QDRANT_URL: Qdrant server (default http://localhost:6333)
+- QDRANT_COLLECTION_PREFIX: prefix of collection names (default "rag")
+- COLLECTION_REFRESH_SECONDS: seconds between health checks of cached
+  collections in the API, 0 = off (default 60)
+"""
+
+import os
+import re
+import threading
+import time
+from typing import Any, NamedTuple
+
+from qdrant_client import QdrantClient, models
+
+from app.embeddings.sparse import SPARSE_VECTOR_NAME
+
+QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
+QDRANT_COLLECTION_PREFIX = os.getenv("QDRANT_COLLECTION_PREFIX", "rag")
+COLLECTION_REFRESH_SECONDS = float(os.getenv("COLLECTION_REFRESH_SECONDS", "60"))
+
+# Payload field every chunk point carries (see ChunkIdentity); searches filter on it
+DOCUMENT_ID_FIELD = "metadata.document_id"
+
+
+class CollectionMismatchError(Exception):
+    """An existing collection has vector params other than the embedding space needs"""
+    pass
+
+
+class CollectionSpec(NamedTuple):
+    name: str
+    provider: str
+    model: str
+    size: int
+    sparse: bool = False  # has the BM25 sparse vector (hybrid search)
+
+
+def _slug(value: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", value.lower()).strip("_")
+
+
+def is_missing_collection(error: Exception) -> bool:
+    """A request failed because its collection does not exist (REST 404 or gRPC NOT_FOUND)"""
+    if getattr(error, "status_code", None) == 404:
+        return True
+    code = getattr(error, "code", None)
+    if callable(code) and getattr(code(), "name", None) == "NOT_FOUND":
+        return True
+    message = str(error).lower()
+    return "collection" in message and ("not found" in message or "doesn't exist" in message)
+
+
+def embedding_identity(embedding: Any):
+    """(provider, model, dimension) of a client created by the client registry"""
+    identity = getattr(embedding, "identity", None)
+    if identity is None:
+        raise ValueError("Embeddings have no identity; create them with client_registry.embeddings()")
+    return identity
+
+
+class CollectionRegistry:
+    def __init__(self, url: str = QDRANT_URL, prefix: str = QDRANT_COLLECTION_PREFIX,
+                 client: QdrantClient = None):
+        self.url = url
+        self.prefix = prefix
+        self._client = client
+        self._specs = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "refreshes": 0, "last_refresh": None}
+
+    @property
+    def client(self) -> QdrantClient:
+        if self._client is None:
+            self._client = QdrantClient(url=self.url)
+        return self._client
+
+    def collection_name(self, provider: str, model: str, size: int) -> str:
+        return f"{self.prefix}_{_slug(provider)}_{_slug(model)}_{size}"
+
+    def cached(self, embedding: Any):
+        """Spec resolved earlier in this process, or None (no network access)"""
+        return self._specs.get(embedding_identity(embedding))
+
+    def resolve(self, embedding: Any) -> CollectionSpec:
+        """Collection for the embedding's vector space, created if missing"""
+        identity = embedding_identity(embedding)
+        with self._lock:
+            spec = self._specs.get(identity)
+            if spec is not None:
+                self._stats["hits"] += 1
+                return spec
+
+            self._stats["misses"] += 1
+            # Native size: one probe (served from the embedding cache after the first run)
+            size = identity.dimension or len(embedding.embed_query("dimension probe"))
+            spec = CollectionSpec(
+                name=self.collection_name(identity.provider, identity.model, size),
+                provider=identity.provider,
+                model=identity.model,
+                size=size,
+            )
+            spec = self._ensure(spec)
+            self._specs[identity] = spec
+            return spec
+
+    def invalidate(self, name: str = None) -> int:
+        """Forget cached collections (all, or those named `name`); returns how many"""
+        with self._lock:
+            stale = [identity for identity, spec in self._specs.items() if name is None or spec.name == name]
+            for identity in stale:
+                del self._specs[identity]
+            self._stats["invalidations"] += len(stale)
+        if stale:
+            print(f"[COLLECTIONS] Invalidated {name or 'all collections'} ({len(stale)} cached)")
+        return len(stale)
+
+    def refresh(self) -> dict:
+        """
+        Health check of the cached collections (one round trip each, off the hot path).
+
+        Entries whose collection is gone or has other vector params are
+        invalidated; the others stay cached (a missing payload index is
+        re-created). An unreachable server invalidates nothing.
+        """
+        with self._lock:
+            cached = list(self._specs.values())
+        report = {"checked": 0, "invalidated": [], "errors": {}}
+        for spec in {spec.name: spec for spec in cached}.values():
+            try:
+                info = self.client.get_collection(spec.name)
+            except Exception as e:
+                if is_missing_collection(e):
+                    report["invalidated"].append(spec.name)
+                    self.invalidate(spec.name)
+                else:
+                    report["errors"][spec.name] = str(e)
+                continue
+            report["checked"] += 1
+            current = spec._replace(
+                size=getattr(info.config.params.vectors, "size", None),
+                sparse=SPARSE_VECTOR_NAME in (info.config.params.sparse_vectors or {}),
+            )
+            if current != spec:
+                report["invalidated"].append(spec.name)
+                self.invalidate(spec.name)
+            else:
+                self._ensure_index(spec.name, info)
+
+        self._stats["refreshes"] += 1
+        self._stats["last_refresh"] = time.time()
+        return report
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._stats,
+                "cached": sorted({spec.name for spec in self._specs.values()}),
+            }
+
+    def _ensure(self, spec: CollectionSpec) -> CollectionSpec:
+        if not self.client.collection_exists(spec.name):
+            try:
+                self.client.create_collection(
+                    collection_name=spec.name,
+                    vectors_config=models.VectorParams(size=spec.size, distance=models.Distance.COSINE),
+                    # IDF is computed by Qdrant from the collection at query time
+                    sparse_vectors_config={
+                        SPARSE_VECTOR_NAME: models.SparseVectorParams(modifier=models.Modifier.IDF),
+                    },
+                )
+                print(f"[COLLECTIONS] Created {spec.name} ({spec.provider}/{spec.model}, {spec.size} dims)")
+            except Exception:
+                # Another process may have created it in the meantime
+                if not self.client.collection_exists(spec.name):
+                    raise
+
+        info = self.client.get_collection(spec.name)
+        size = getattr(info.config.params.vectors, "size", None)
+        if size != spec.size:
+            raise CollectionMismatchError(
+                f"Collection {spec.name} holds {size}-dimensional vectors, expected {spec.size}; "
+                f"it is left untouched"
+            )
+
+        self._ensure_index(spec.name, info)
+        return spec._replace(sparse=SPARSE_VECTOR_NAME in (info.config.params.sparse_vectors or {}))
+
+    def _ensure_index(self, name: str, info):
+        # Also added to collections created before the index existed, or recreated without it
+        if DOCUMENT_ID_FIELD not in (info.payload_schema or {}):
+            self.client.create_payload_index(
+                collection_name=name,
+                field_name=DOCUMENT_ID_FIELD,
+                # Tenant index: points are grouped by document, per-document search reads one group
+                field_schema=models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD, is_tenant=True),
+                wait=True,
+            )
+            print(f"[COLLECTIONS] Indexed {DOCUMENT_ID_FIELD} in {name}")
+
+    def list(self) -> list:
+        """Collections owned by the registry (name prefix), with point counts"""
+        collections = []
+        for collection in self.client.get_collections().collections:
+            if not collection.name.startswith(f"{self.prefix}_"):
+                continue
+            info = self.client.get_collection(collection.name)
+            collections.append({
+                "name": collection.name,
+                "points": info.points_count,
+                "size": getattr(info.config.params.vectors, "size", None),
+                "sparse": sorted(info.config.params.sparse_vectors or {}),
+                "indexed_fields": sorted(info.payload_schema or {}),
+            })
+        return collections
+
+
+collection_registry = CollectionRegistry()
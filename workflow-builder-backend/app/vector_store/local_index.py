@@ -0,0 +1,566 @@
+"""
+Embedded vector index (VECTOR_BACKEND=local)
+
+A backend without a Qdrant service, for small single-node installs and
+tests. Every collection is a directory under LOCAL_VECTOR_DIR, named like
+the Qdrant collection of the same embedding space, and every document in it
+is a segment of three files:
+
+    <document_id>.<generation>.f32        float32 matrix, one L2-normalized row per point
+    <document_id>.<generation>.payloads   append-only payload records (JSON lines)
+    <document_id>.json                    sidecar: generation, count, dimension, the
+                                          point ids in row order and the (offset,
+                                          length) of each row's payload record
+
+Readers memory-map the matrix and the payload file and only use the `count`
+rows and the payload bytes the sidecar announces; payloads are decoded only
+for the rows a search returns. Writers append vector rows and payload
+records first and then replace the small sidecar atomically, so a batch
+costs its own size plus the ids and offsets, not a rewrite of every stored
+text. A changed payload is appended as a new record; once dead records
+outweigh live ones (and COMPACT_MIN_BYTES), and on deletes, the remaining
+rows and records are copied into the next generation before the sidecar
+switches to it. An indexing worker and the API can share the directory, and
+an interrupted write leaves the previous sidecar in effect. Concurrent
+writes to the same document from two processes are not coordinated (the job
+queue runs one job per document).
+
+Open segments (their memory maps hold two file descriptors) are kept in an
+LRU of LOCAL_INDEX_OPEN_SEGMENTS; an evicted or dropped segment releases its
+maps, which close as soon as no running search still reads them. Listing
+and counting documents only read sidecars.
+
+Search is exact: one matrix-vector product per segment, top-k merged across
+segments. Scoped to a document, the default of /llm/process, it only reads
+that document's rows, which stays fast well past the chunk count of large
+PDFs. There is no sparse index, so hybrid requests get the dense search;
+MMR re-ranking works as with Qdrant.
+
+Configuration (environment):
+- LOCAL_VECTOR_DIR: root directory (default app/storage/vectors)
+- LOCAL_INDEX_OPEN_SEGMENTS: documents whose maps stay open (default 128)
+"""
+
+import json
+import mmap
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from pathlib import Path
+from typing import Any, List, NamedTuple
+
+import anyio
+import numpy as np
+from langchain_core.documents import Document
+
+from app.vector_store.base import CONTENT_KEY, METADATA_KEY, ChunkRecord, VectorBackend, VectorReader
+from app.vector_store.collections import (
+    CollectionMismatchError, CollectionRegistry, CollectionSpec, collection_registry, embedding_identity,
+)
+from app.vector_store.mmr import MMR_LAMBDA, mmr_select
+
+LOCAL_VECTOR_DIR = Path(os.getenv(
+    "LOCAL_VECTOR_DIR", str(Path(__file__).resolve().parents[1] / "storage" / "vectors")
+))
+LOCAL_INDEX_OPEN_SEGMENTS = int(os.getenv("LOCAL_INDEX_OPEN_SEGMENTS", "128"))
+
+COLLECTION_INFO = "collection.info"
+# Segment of points without metadata.document_id
+UNSCOPED = "_unscoped"
+# Dead payload bytes tolerated before a segment is compacted (if also more than the live ones)
+COMPACT_MIN_BYTES = 1 << 20
+
+
+def _normalized(vectors) -> np.ndarray:
+    matrix = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def _document_id(payload: dict) -> str:
+    return (payload.get(METADATA_KEY) or {}).get("document_id") or UNSCOPED
+
+
+def _record(payload: dict) -> bytes:
+    return json.dumps(payload).encode("utf-8") + b"\n"
+
+
+class SegmentView(NamedTuple):
+    """A committed version of a segment; stays readable after writers move on"""
+    state: dict
+    matrix: np.ndarray     # None for an empty segment
+    payload_map: Any       # mmap of the payload file, None if it is empty
+
+    def payload(self, row: int) -> dict:
+        offset, length = self.state["rows"][row]
+        return json.loads(self.payload_map[offset:offset + length])
+
+    def payloads(self, rows=None) -> List[dict]:
+        rows = range(self.state["count"]) if rows is None else rows
+        return [self.payload(row) for row in rows]
+
+
+_EMPTY = SegmentView(None, None, None)
+
+
+class Segment:
+    """The points of one document in one collection"""
+
+    def __init__(self, directory: Path, document_id: str, on_drop=None):
+        self.directory = directory
+        self.document_id = document_id
+        self.sidecar = directory / f"{document_id}.json"
+        self.on_drop = on_drop
+        # (sidecar stamp, view), replaced as a whole so threads never mix versions
+        self._loaded = (None, _EMPTY)
+
+    def release(self):
+        """Forget the cached view; its maps close once no reader holds them"""
+        self._loaded = (None, _EMPTY)
+
+    def vectors_path(self, generation: int) -> Path:
+        return self.directory / f"{self.document_id}.{generation}.f32"
+
+    def payloads_path(self, generation: int) -> Path:
+        return self.directory / f"{self.document_id}.{generation}.payloads"
+
+    def load(self) -> SegmentView:
+        """The segment as last committed; state is None for a missing segment"""
+        for _ in range(3):
+            try:
+                stat = self.sidecar.stat()
+            except FileNotFoundError:
+                self._loaded = (None, _EMPTY)
+                return _EMPTY
+            stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            loaded = self._loaded
+            if loaded[0] == stamp:
+                return loaded[1]
+            try:
+                view = self._open(json.loads(self.sidecar.read_text()))
+            except (FileNotFoundError, json.JSONDecodeError):
+                # Replaced by a writer between stat and read; look again
+                continue
+            self._loaded = (stamp, view)
+            return view
+        raise RuntimeError(f"Segment {self.sidecar} keeps changing while being read")
+
+    def _open(self, state: dict) -> SegmentView:
+        matrix, payload_map = None, None
+        if state["count"]:
+            matrix = np.memmap(self.vectors_path(state["generation"]), dtype=np.float32, mode="r",
+                               shape=(state["count"], state["dimension"]))
+        if state["payload_bytes"]:
+            # Mapped, so the records stay readable after a compaction unlinks the file
+            with open(self.payloads_path(state["generation"]), "rb") as f:
+                payload_map = mmap.mmap(f.fileno(), state["payload_bytes"], access=mmap.ACCESS_READ)
+        return SegmentView(state, matrix, payload_map)
+
+    def _commit(self, state: dict):
+        tmp = self.sidecar.with_name(f"{self.sidecar.name}.tmp")
+        tmp.write_text(json.dumps(state))
+        os.replace(tmp, self.sidecar)
+
+    def _append_payloads(self, state: dict, payloads: List[dict]) -> list:
+        """Append records after the committed bytes; returns their (offset, length)"""
+        rows = []
+        with open(self.payloads_path(state["generation"]), "ab") as f:
+            # Drop records of an append that never got committed
+            f.truncate(state["payload_bytes"])
+            position = state["payload_bytes"]
+            for payload in payloads:
+                record = _record(payload)
+                f.write(record)
+                rows.append([position, len(record)])
+                position += len(record)
+        state["payload_bytes"] = position
+        return rows
+
+    def _commit_or_compact(self, state: dict):
+        live = sum(length for _, length in state["rows"])
+        dead = state["payload_bytes"] - live
+        self._commit(state)
+        if dead > max(live, COMPACT_MIN_BYTES):
+            self._rewrite(self.load(), range(state["count"]))
+
+    def upsert(self, ids: List[str], payloads: List[dict], vectors: np.ndarray) -> int:
+        """Overwrite points with known ids in place, append the others"""
+        state = dict(self.load().state or {
+            "generation": 0, "count": 0, "dimension": int(vectors.shape[1]), "ids": [], "rows": [],
+            "payload_bytes": 0,
+        })
+        stored_ids, stored_rows = list(state["ids"]), list(state["rows"])
+        position = {point_id: row for row, point_id in enumerate(stored_ids)}
+
+        replaced, added = {}, {}
+        for i, point_id in enumerate(ids):
+            # A repeated id in one batch: the last one wins
+            (replaced if point_id in position else added)[point_id] = i
+
+        path = self.vectors_path(state["generation"])
+        if replaced:
+            matrix = np.memmap(path, dtype=np.float32, mode="r+", shape=(state["count"], state["dimension"]))
+            rows = [position[point_id] for point_id in replaced]
+            matrix[rows] = vectors[list(replaced.values())]
+            matrix.flush()
+            del matrix
+        if added:
+            with open(path, "ab") as f:
+                # Drop rows of an append that never got committed
+                f.truncate(state["count"] * state["dimension"] * 4)
+                f.write(np.ascontiguousarray(vectors[list(added.values())]).tobytes())
+            stored_ids.extend(added)
+
+        records = self._append_payloads(state, [payloads[i] for i in [*replaced.values(), *added.values()]])
+        for point_id, record in zip(replaced, records):
+            stored_rows[position[point_id]] = record
+        stored_rows.extend(records[len(replaced):])
+
+        self._commit_or_compact({**state, "count": len(stored_ids), "ids": stored_ids, "rows": stored_rows})
+        return len(replaced) + len(added)
+
+    def set_payloads(self, payloads: dict) -> int:
+        """Replace payloads of stored points: {point_id: payload}"""
+        state = self.load().state
+        if not state:
+            return 0
+        rows = [row for row, point_id in enumerate(state["ids"]) if point_id in payloads]
+        if not rows:
+            return 0
+        state = dict(state)
+        stored_rows = list(state["rows"])
+        records = self._append_payloads(state, [payloads[state["ids"][row]] for row in rows])
+        for row, record in zip(rows, records):
+            stored_rows[row] = record
+        self._commit_or_compact({**state, "rows": stored_rows})
+        return len(rows)
+
+    def _rewrite(self, view: SegmentView, keep) -> int:
+        """Copy the kept rows and their payload records into the next generation"""
+        state = view.state
+        keep = list(keep)
+        generation = state["generation"] + 1
+        np.ascontiguousarray(view.matrix[keep]).tofile(self.vectors_path(generation))
+        rows, position = [], 0
+        with open(self.payloads_path(generation), "wb") as f:
+            for row in keep:
+                offset, length = state["rows"][row]
+                f.write(view.payload_map[offset:offset + length])
+                rows.append([position, length])
+                position += length
+        self._commit({
+            **state,
+            "generation": generation,
+            "count": len(keep),
+            "ids": [state["ids"][row] for row in keep],
+            "rows": rows,
+            "payload_bytes": position,
+        })
+        self.vectors_path(state["generation"]).unlink(missing_ok=True)
+        self.payloads_path(state["generation"]).unlink(missing_ok=True)
+        return len(keep)
+
+    def remove(self, point_ids: set) -> int:
+        """Delete points; the remaining rows move to the next generation"""
+        view = self.load()
+        state = view.state
+        if not state:
+            return 0
+        keep = [row for row, point_id in enumerate(state["ids"]) if point_id not in point_ids]
+        removed = state["count"] - len(keep)
+        if not removed:
+            return 0
+        if not keep:
+            self.drop()
+            return removed
+        self._rewrite(view, keep)
+        return removed
+
+    def drop(self) -> int:
+        state = self.load().state
+        if not state:
+            return 0
+        # Sidecar first: without it the segment does not exist for readers
+        self.sidecar.unlink(missing_ok=True)
+        self.vectors_path(state["generation"]).unlink(missing_ok=True)
+        self.payloads_path(state["generation"]).unlink(missing_ok=True)
+        self.release()
+        if self.on_drop is not None:
+            self.on_drop(self)
+        return state["count"]
+
+
+class LocalVectorIndex(VectorBackend, VectorReader):
+    """Embedded VectorBackend and VectorReader on memory-mapped files"""
+
+    def __init__(self, root: Path = LOCAL_VECTOR_DIR, registry: CollectionRegistry = collection_registry):
+        self.root = Path(root)
+        # Only used for collection names, so both backends name collections alike
+        self.registry = registry
+        self._specs = {}
+        # LRU of segments with (possibly) open maps: {(collection, document_id): Segment}
+        self._segments = OrderedDict()
+        self._segments_lock = threading.Lock()  # LRU only, so searches never wait on writers
+        self._lock = threading.RLock()
+
+    # ── Collections ─────────────────────────────────────────────────
+
+    def collection(self, embedding: Any) -> CollectionSpec:
+        """Collection for the embedding's vector space, created if missing"""
+        identity = embedding_identity(embedding)
+        with self._lock:
+            spec = self._specs.get(identity)
+            if spec is None:
+                size = identity.dimension or len(embedding.embed_query("dimension probe"))
+                spec = CollectionSpec(
+                    name=self.registry.collection_name(identity.provider, identity.model, size),
+                    provider=identity.provider,
+                    model=identity.model,
+                    size=size,
+                )
+                self._ensure(spec)
+                self._specs[identity] = spec
+            return spec
+
+    def _ensure(self, spec: CollectionSpec):
+        info_path = self.root / spec.name / COLLECTION_INFO
+        if not info_path.exists():
+            info_path.parent.mkdir(parents=True, exist_ok=True)
+            info_path.write_text(json.dumps({"provider": spec.provider, "model": spec.model, "size": spec.size}))
+            print(f"[LOCAL INDEX] Created {spec.name} ({spec.provider}/{spec.model}, {spec.size} dims)")
+        size = json.loads(info_path.read_text())["size"]
+        if size != spec.size:
+            raise CollectionMismatchError(
+                f"Collection {spec.name} holds {size}-dimensional vectors, expected {spec.size}; "
+                f"it is left untouched"
+            )
+
+    def collection_name(self, embedding: Any) -> str:
+        return self.collection(embedding).name
+
+    def _segment(self, collection_name: str, document_id: str) -> Segment:
+        key = (collection_name, document_id)
+        with self._segments_lock:
+            segment = self._segments.get(key)
+            if segment is None:
+                segment = Segment(self.root / collection_name, document_id, on_drop=self._forget)
+                self._segments[key] = segment
+                while len(self._segments) > LOCAL_INDEX_OPEN_SEGMENTS:
+                    _, evicted = self._segments.popitem(last=False)
+                    evicted.release()
+            else:
+                self._segments.move_to_end(key)
+            return segment
+
+    def _forget(self, segment: Segment):
+        with self._segments_lock:
+            key = (segment.directory.name, segment.document_id)
+            if self._segments.get(key) is segment:
+                del self._segments[key]
+
+    def _document_ids_in(self, collection_name: str) -> List[str]:
+        directory = self.root / collection_name
+        if not directory.is_dir():
+            return []
+        return [path.name[:-len(".json")] for path in directory.glob("*.json")]
+
+    def _segments_in(self, collection_name: str):
+        """Every segment of a collection, one at a time (so evicted ones can close)"""
+        for document_id in self._document_ids_in(collection_name):
+            yield self._segment(collection_name, document_id)
+
+    def list_collections(self) -> list:
+        if not self.root.is_dir():
+            return []
+        collections = []
+        for info_path in sorted(self.root.glob(f"*/{COLLECTION_INFO}")):
+            name = info_path.parent.name
+            collections.append({
+                "name": name,
+                "points": sum(self.stored_document_ids(name).values()),
+                "size": json.loads(info_path.read_text())["size"],
+                "sparse": [],
+                "indexed_fields": [],
+            })
+        return collections
+
+    def stored_document_ids(self, collection_name: str, limit: int = 100_000) -> dict:
+        counts = {}
+        for document_id in self._document_ids_in(collection_name)[:limit]:
+            # Sidecar only: counting must not open every document's maps
+            try:
+                count = json.loads((self.root / collection_name / f"{document_id}.json").read_text())["count"]
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+            if count:
+                counts[document_id] = count
+        return counts
+
+    # ── Writes ──────────────────────────────────────────────────────
+
+    def upsert_embedded(self, documents: List[Document], vectors: List[List[float]], embedding: Any,
+                        ids: List[str] = None) -> int:
+        if not documents:
+            return 0
+
+        spec = self.collection(embedding)
+        matrix = _normalized(vectors)
+        if matrix.shape[1] != spec.size:
+            raise ValueError(f"Got {matrix.shape[1]}-dimensional vectors for {spec.name} ({spec.size} dims)")
+
+        ids = ids or [str(uuid.uuid4()) for _ in documents]
+        payloads = [{CONTENT_KEY: doc.page_content, METADATA_KEY: doc.metadata} for doc in documents]
+        rows_by_document = defaultdict(list)
+        for row, payload in enumerate(payloads):
+            rows_by_document[_document_id(payload)].append(row)
+
+        with self._lock:
+            for document_id, rows in rows_by_document.items():
+                self._segment(spec.name, document_id).upsert(
+                    [ids[row] for row in rows], [payloads[row] for row in rows], matrix[rows],
+                )
+        return len(documents)
+
+    def upsert_parallel(self, documents: List[Document], vectors: List[List[float]], embedding: Any,
+                        ids: List[str] = None, on_progress=None, batch_size: int = 1024, **options) -> dict:
+        """Same contract as QdrantManager.upsert_parallel; batches are written one after another"""
+        stats = {"points": 0, "batches": 0, "retries": 0, "seconds": 0.0, "points_per_sec": 0.0}
+        if not documents:
+            return stats
+
+        started = time.perf_counter()
+        ids = ids or [str(uuid.uuid4()) for _ in documents]
+        for offset in range(0, len(documents), batch_size):
+            end = offset + batch_size
+            stats["points"] += self.upsert_embedded(documents[offset:end], vectors[offset:end], embedding,
+                                                    ids=ids[offset:end])
+            stats["batches"] += 1
+            if on_progress is not None:
+                # total: points this call writes (only the new chunks in incremental mode)
+                on_progress({**stats, "total": len(documents)})
+
+        elapsed = time.perf_counter() - started
+        stats["seconds"] = round(elapsed, 3)
+        stats["points_per_sec"] = round(stats["points"] / elapsed, 1) if elapsed else 0.0
+        print(f"[LOCAL INDEX] Upserted {stats['points']} points in {stats['batches']} batches, "
+              f"{stats['points_per_sec']} points/sec")
+        return stats
+
+    def scroll_chunks(self, document_ids: List[str], embedding: Any) -> List[ChunkRecord]:
+        spec = self.collection(embedding)
+        records = []
+        for document_id in document_ids:
+            view = self._segment(spec.name, document_id).load()
+            if view.state:
+                records.extend(
+                    ChunkRecord(id=point_id, payload={METADATA_KEY: payload.get(METADATA_KEY)})
+                    for point_id, payload in zip(view.state["ids"], view.payloads())
+                )
+        return records
+
+    def set_chunk_metadata(self, updates: dict, embedding: Any) -> int:
+        """Points whose new metadata names another document move to that document's segment"""
+        if not updates:
+            return 0
+
+        spec = self.collection(embedding)
+        remaining = dict(updates)
+        with self._lock:
+            for segment in self._segments_in(spec.name):
+                view = segment.load()
+                if not view.state:
+                    continue
+                stay, move = {}, defaultdict(list)
+                for row, point_id in enumerate(view.state["ids"]):
+                    if point_id not in remaining:
+                        continue
+                    payload = {**view.payload(row), METADATA_KEY: remaining.pop(point_id)}
+                    target = _document_id(payload)
+                    if target == segment.document_id:
+                        stay[point_id] = payload
+                    else:
+                        move[target].append((point_id, payload, np.array(view.matrix[row])))
+
+                segment.set_payloads(stay)
+                for target, points in move.items():
+                    point_ids, payloads, vectors = zip(*points)
+                    self._segment(spec.name, target).upsert(list(point_ids), list(payloads), np.stack(vectors))
+                    segment.remove(set(point_ids))
+                if not remaining:
+                    break
+        return len(updates) - len(remaining)
+
+    def delete_points(self, ids: List[str], embedding: Any) -> int:
+        if not ids:
+            return 0
+
+        spec = self.collection(embedding)
+        wanted, deleted = set(ids), 0
+        with self._lock:
+            for segment in self._segments_in(spec.name):
+                deleted += segment.remove(wanted)
+                if deleted >= len(wanted):
+                    break
+        return deleted
+
+    def purge_documents(self, document_ids: List[str], collection_names: List[str] = None) -> int:
+        if not document_ids:
+            return 0
+
+        names = collection_names or [c["name"] for c in self.list_collections()]
+        deleted = 0
+        with self._lock:
+            for name in names:
+                for document_id in document_ids:
+                    if (self.root / name / f"{document_id}.json").exists():
+                        deleted += self._segment(name, document_id).drop()
+        return deleted
+
+    # ── Search ──────────────────────────────────────────────────────
+
+    def search_sync(self, embedding, vector: List[float], k: int = 5, document_ids: List[str] = None,
+                    mmr_fetch_k: int = 0, mmr_lambda: float = None) -> List[Document]:
+        spec = self.collection(embedding)
+        segments = ((self._segment(spec.name, document_id) for document_id in document_ids)
+                    if document_ids else self._segments_in(spec.name))
+        query = _normalized(vector)[0]
+        limit = max(k, mmr_fetch_k)
+
+        hits = []  # (score, view, row)
+        for segment in segments:
+            view = segment.load()
+            if view.matrix is None:
+                continue
+            scores = view.matrix @ query
+            rows = np.argpartition(-scores, limit - 1)[:limit] if len(scores) > limit else range(len(scores))
+            hits.extend((float(scores[row]), view, int(row)) for row in rows)
+            # Keep the running top `limit`, so only their segments' maps stay referenced
+            hits.sort(key=lambda hit: -hit[0])
+            del hits[limit:]
+
+        if mmr_fetch_k > k and len(hits) > k:
+            # Dense-only ranking: its scores are the cosines MMR would compute
+            picked = mmr_select(query, np.stack([view.matrix[row] for _, view, row in hits]), k,
+                                MMR_LAMBDA if mmr_lambda is None else mmr_lambda,
+                                relevance=[score for score, _, _ in hits])
+            hits = [hits[i] for i in picked]
+
+        # Only the returned rows' payloads are decoded
+        payloads = [view.payload(row) for _, view, row in hits[:k]]
+        return [
+            Document(page_content=payload.get(CONTENT_KEY, ""), metadata=payload.get(METADATA_KEY) or {})
+            for payload in payloads
+        ]
+
+    async def search(self, embedding, vector: List[float], k: int = 5, document_ids: List[str] = None,
+                     query_text: str = None, mode: str = None, mmr_fetch_k: int = 0,
+                     mmr_lambda: float = None) -> List[Document]:
+        """Dense search for every mode (no sparse index); runs in a worker thread"""
+        return await anyio.to_thread.run_sync(
+            lambda: self.search_sync(embedding, vector, k, document_ids, mmr_fetch_k, mmr_lambda)
+        )
+
+
+local_index = LocalVectorIndex()
@@ -1,31 +1,317 @@
 # app/vector_store/qdrant.py
+import hashlib
+import os
+import random
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from langchain_qdrant import QdrantVectorStore
 from langchain_core.documents import Document
+from qdrant_client import models
 from typing import List, Any
 
-class QdrantManager:
-    def __init__(self, url: str = "http://localhost:6333", collection_name: str = "rag_collection"):
-        self.url = url
-        self.collection_name = collection_name
-        self._store = None   
+from app.embeddings.sparse import SPARSE_VECTOR_NAME, bm25_encoder
+from app.vector_store.base import VectorBackend
+from app.vector_store.collections import (
+    DOCUMENT_ID_FIELD, CollectionRegistry, collection_registry, embedding_identity, is_missing_collection,
+)
+
+# Namespace for deterministic chunk point ids (uuid5)
+POINT_NAMESPACE = uuid.UUID("5b0d3f8e-7c1a-4e3b-9a57-2f6c1d0e4b8a")
+
+# Bulk upserts: points per request, requests in flight, retries per failed batch
+QDRANT_UPSERT_BATCH = int(os.getenv("QDRANT_UPSERT_BATCH", "256"))
+QDRANT_UPSERT_CONCURRENCY = int(os.getenv("QDRANT_UPSERT_CONCURRENCY", "4"))
+QDRANT_UPSERT_RETRIES = int(os.getenv("QDRANT_UPSERT_RETRIES", "3"))
+QDRANT_UPSERT_RETRY_BASE = float(os.getenv("QDRANT_UPSERT_RETRY_BASE", "0.5"))
+
+
+def content_hash(text: str) -> str:
+    """SHA-256 of a chunk's text, stored in its payload as metadata.content_hash"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def is_retryable_upsert(error: Exception) -> bool:
+    """Everything but a rejected request (4xx other than 408/429) is worth another try"""
+    status = getattr(error, "status_code", None)
+    return not (isinstance(status, int) and 400 <= status < 500 and status not in (408, 429))
+
+
+def document_filter(document_ids: List[str], metadata_key: str = "metadata") -> models.Filter:
+    """Points of the given documents (served by the metadata.document_id payload index)"""
+    return models.Filter(must=[
+        models.FieldCondition(
+            key=f"{metadata_key}.document_id",
+            match=models.MatchAny(any=list(document_ids)),
+        )
+    ])
+
+
+class ChunkIdentity:
+    """
+    Deterministic point ids for the chunks of one document.
+
+    The n-th chunk of a document with a given content hash always gets the
+    same id, so re-indexing identical chunks overwrites instead of duplicating.
+    Call tag() batch by batch in chunk order.
+    """
+
+    def __init__(self, document_id: str):
+        self.document_id = document_id
+        self.count = 0
+        self._seen = Counter()
+
+    def tag(self, documents: List[Document]):
+        """Return (point_ids, documents with document_id/chunk_index/content_hash metadata)"""
+        ids, tagged = [], []
+        for doc in documents:
+            digest = content_hash(doc.page_content)
+            occurrence = self._seen[digest]
+            self._seen[digest] += 1
+            ids.append(str(uuid.uuid5(POINT_NAMESPACE, f"{self.document_id}:{digest}:{occurrence}")))
+            tagged.append(Document(
+                page_content=doc.page_content,
+                metadata={
+                    **(doc.metadata or {}),
+                    "document_id": self.document_id,
+                    "chunk_index": self.count,
+                    "content_hash": digest,
+                },
+            ))
+            self.count += 1
+        return ids, tagged
+
+
+class QdrantManager(VectorBackend):
+    """Writes chunk points into the collection of each embedding's vector space"""
+
+    def __init__(self, registry: CollectionRegistry = collection_registry):
+        self.collections = registry
+        self._stores = {}
+
+    def collection_name(self, embedding: Any) -> str:
+        return self.collections.resolve(embedding).name
 
     def get_vector_store(self, embedding: Any) -> QdrantVectorStore:
-        """Returns existing collection or creates it if missing"""
-        if self._store is None:
-            try:
-                self._store = QdrantVectorStore.from_existing_collection(
-                    embedding=embedding,
-                    url=self.url,
-                    collection_name=self.collection_name,
-                )
-            except Exception:
-                # collection doesn't exist yet → create it
-                self._store = QdrantVectorStore(
-                    embedding=embedding,
-                    url=self.url,
-                    collection_name=self.collection_name,
+        """
+        Store on the embedding's collection (created with explicit vector params if missing).
+
+        Handles are cached per (collection, embedding model) together with the
+        collection spec they were built for; once the registry invalidates and
+        re-resolves the collection, the next call builds a fresh handle.
+        """
+        spec = self.collections.resolve(embedding)
+        key = (spec.name, embedding_identity(embedding))
+        cached = self._stores.get(key)
+        if cached is None or cached[0] != spec:
+            cached = self._stores[key] = (spec, QdrantVectorStore(
+                client=self.collections.client,
+                collection_name=spec.name,
+                embedding=embedding,
+                # The registry created or checked the collection for this vector size
+                validate_collection_config=False,
+            ))
+        return cached[1]
+
+    def upsert_embedded(
+        self,
+        documents: List[Document],
+        vectors: List[List[float]],
+        embedding: Any,
+        ids: List[str] = None,
+    ) -> int:
+        """Upsert documents whose vectors were already computed"""
+        if not documents:
+            return 0
+
+        vector_store = self.get_vector_store(embedding)
+        points = self._points(vector_store, documents, vectors, ids, self.collections.resolve(embedding).sparse)
+        vector_store.client.upsert(
+            collection_name=vector_store.collection_name,
+            points=points,
+            wait=True,  # searchable as soon as this returns
+        )
+        return len(points)
+
+    @staticmethod
+    def _points(vector_store: QdrantVectorStore, documents: List[Document],
+                vectors: List[List[float]], ids: List[str] = None, sparse: bool = False) -> list:
+        """Points with the dense vector and, if the collection has one, the BM25 sparse vector"""
+        ids = ids or [str(uuid.uuid4()) for _ in documents]
+        return [
+            models.PointStruct(
+                id=point_id,
+                vector={
+                    vector_store.vector_name: vector,
+                    **({SPARSE_VECTOR_NAME: bm25_encoder.encode_document(doc.page_content)} if sparse else {}),
+                },
+                payload={
+                    vector_store.content_payload_key: doc.page_content,
+                    vector_store.metadata_payload_key: doc.metadata,
+                },
+            )
+            for point_id, doc, vector in zip(ids, documents, vectors)
+        ]
+
+    def upsert_parallel(
+        self,
+        documents: List[Document],
+        vectors: List[List[float]],
+        embedding: Any,
+        ids: List[str] = None,
+        batch_size: int = QDRANT_UPSERT_BATCH,
+        concurrency: int = QDRANT_UPSERT_CONCURRENCY,
+        on_progress=None,
+    ) -> dict:
+        """
+        Upsert many embedded documents in fixed-size batches, several at a time.
+
+        Batches are sent with wait=False, so each request returns once Qdrant
+        has accepted it instead of after indexing. A failed batch is retried on
+        its own with backoff. When every batch is accepted, the last one is
+        sent with wait=True: Qdrant applies a shard's updates in order, so its
+        return is the consistency barrier after which all points are searchable.
+        """
+        stats = {"points": 0, "batches": 0, "retries": 0, "seconds": 0.0, "points_per_sec": 0.0}
+        if not documents:
+            return stats
+
+        started = time.perf_counter()
+        vector_store = self.get_vector_store(embedding)
+        points = self._points(vector_store, documents, vectors, ids, self.collections.resolve(embedding).sparse)
+        batches = [points[i:i + batch_size] for i in range(0, len(points), batch_size)]
+        *parallel, barrier = batches
+
+        def send(batch, wait: bool):
+            attempt = 0
+            while True:
+                try:
+                    vector_store.client.upsert(
+                        collection_name=vector_store.collection_name,
+                        points=batch,
+                        wait=wait,
+                    )
+                    break
+                except Exception as e:
+                    if is_missing_collection(e):
+                        # Deleted under us: the next job re-resolves (and recreates) it
+                        self.collections.invalidate(vector_store.collection_name)
+                    if attempt >= QDRANT_UPSERT_RETRIES or not is_retryable_upsert(e):
+                        raise
+                    attempt += 1
+                    delay = random.uniform(0, QDRANT_UPSERT_RETRY_BASE * 2 ** attempt)
+                    print(f"[QDRANT] Upsert batch failed ({type(e).__name__}), "
+                          f"retry {attempt}/{QDRANT_UPSERT_RETRIES} in {delay:.1f}s")
+                    time.sleep(delay)
+            return len(batch), attempt
+
+        def record(result):
+            count, retries = result
+            stats["points"] += count
+            stats["batches"] += 1
+            stats["retries"] += retries
+            if on_progress is not None:
+                # total: points this call writes (only the new chunks in incremental mode)
+                on_progress({**stats, "total": len(documents)})
+
+        if parallel:
+            with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+                # Up to `concurrency` requests in flight over the client's connection
+                # pool; results (and stats) are handled here, in the calling thread
+                for result in pool.map(lambda batch: send(batch, False), parallel):
+                    record(result)
+        record(send(barrier, True))
+
+        elapsed = time.perf_counter() - started
+        stats["seconds"] = round(elapsed, 3)
+        stats["points_per_sec"] = round(stats["points"] / elapsed, 1) if elapsed else 0.0
+        print(f"[QDRANT] Upserted {stats['points']} points in {stats['batches']} batches, "
+              f"{stats['points_per_sec']} points/sec ({stats['retries']} retries)")
+        return stats
+
+    def scroll_chunks(self, document_ids: List[str], embedding: Any, batch_size: int = 256) -> list:
+        """All points of the given documents, with their metadata payload (no vectors)"""
+        vector_store = self.get_vector_store(embedding)
+        metadata_key = vector_store.metadata_payload_key
+        scroll_filter = document_filter(document_ids, metadata_key)
+
+        records, offset = [], None
+        while True:
+            page, offset = vector_store.client.scroll(
+                collection_name=vector_store.collection_name,
+                scroll_filter=scroll_filter,
+                limit=batch_size,
+                offset=offset,
+                with_payload=[metadata_key],
+                with_vectors=False,
+            )
+            records.extend(page)
+            if offset is None:
+                return records
+
+    def set_chunk_metadata(self, updates: dict, embedding: Any) -> int:
+        """Replace the metadata payload of existing points: {point_id: metadata}"""
+        if not updates:
+            return 0
+
+        vector_store = self.get_vector_store(embedding)
+        vector_store.client.batch_update_points(
+            collection_name=vector_store.collection_name,
+            update_operations=[
+                models.SetPayloadOperation(set_payload=models.SetPayload(
+                    payload={vector_store.metadata_payload_key: metadata},
+                    points=[point_id],
+                ))
+                for point_id, metadata in updates.items()
+            ],
+            wait=True,
+        )
+        return len(updates)
+
+    def delete_points(self, ids: List[str], embedding: Any) -> int:
+        if not ids:
+            return 0
+
+        vector_store = self.get_vector_store(embedding)
+        vector_store.client.delete(
+            collection_name=vector_store.collection_name,
+            points_selector=models.PointIdsList(points=list(ids)),
+            wait=True,
+        )
+        return len(ids)
+
+    def list_collections(self) -> list:
+        return self.collections.list()
+
+    def stored_document_ids(self, collection_name: str, limit: int = 100_000) -> dict:
+        """{document_id: point count} in a collection (facet over the payload index)"""
+        response = self.collections.client.facet(
+            collection_name=collection_name,
+            key=DOCUMENT_ID_FIELD,
+            limit=limit,
+        )
+        return {hit.value: hit.count for hit in response.hits}
+
+    def purge_documents(self, document_ids: List[str], collection_names: List[str] = None) -> int:
+        """Delete every point of the given documents from all registry collections"""
+        if not document_ids:
+            return 0
+
+        client = self.collections.client
+        names = collection_names or [c["name"] for c in self.collections.list()]
+        selector = document_filter(document_ids)
+        deleted = 0
+        for name in names:
+            count = client.count(collection_name=name, count_filter=selector, exact=True).count
+            if count:
+                client.delete(
+                    collection_name=name,
+                    points_selector=models.FilterSelector(filter=selector),
+                    wait=True,
                 )
-        return self._store
+                deleted += count
+        return deleted
 
     def index_chunks_sync(
         self,
@@ -33,23 +319,13 @@ class QdrantManager:
         embedding: Any,
         document_id: str
     ) -> int:
+        """Embed raw text chunks of a document and upsert them through upsert_parallel"""
         if not chunks:
             return 0
 
-        docs = [
-            Document(
-                page_content=chunk,
-                metadata={
-                    "document_id": document_id,
-                    "chunk_index": i,
-                }
-            )
-            for i, chunk in enumerate(chunks)
-        ]
-
-        vector_store = self.get_vector_store(embedding)
-        vector_store.add_documents(docs)
-        return len(docs)
+        ids, docs = ChunkIdentity(document_id).tag([Document(page_content=chunk) for chunk in chunks])
+        vectors = embedding.embed_documents(chunks)
+        return self.upsert_parallel(docs, vectors, embedding, ids=ids)["points"]
 
 
-qdrant_manager = QdrantManager()
\ No newline at end of file
+qdrant_manager = QdrantManager()
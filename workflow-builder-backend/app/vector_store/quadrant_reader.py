@@ -1,44 +1,205 @@
+"""
+Qdrant access for the query path
+
+AsyncQdrantReader holds one long-lived AsyncQdrantClient (gRPC preferred),
+opened at app startup and closed at shutdown. Searches are awaited, so the
+event loop keeps serving other requests while Qdrant works. The collection
+of each embedding model is resolved once through the collection registry
+and cached; later queries go straight to the search call, with no
+collection-info round trip. While started, the reader also runs the
+registry's health check every COLLECTION_REFRESH_SECONDS, and a search that
+finds its collection gone invalidates it and is retried once.
+
+Searches are hybrid by default: the dense query and a BM25 sparse query
+(app/embeddings/sparse.py) each fetch HYBRID_PREFETCH_LIMIT candidates,
+and Qdrant merges both lists with reciprocal-rank fusion in the same call.
+Exact identifiers (error codes, part numbers) that the dense vector blurs
+still rank through the sparse list. Collections without the sparse vector,
+and mode="dense", use the dense search alone.
+
+With MMR (app/vector_store/mmr.py), the search fetches more candidates with
+their dense vectors and keeps k diverse ones instead of k near-duplicates.
+In hybrid mode the fused RRF scores are the relevance MMR balances against
+redundancy, so exact-match hits found by BM25 keep their rank.
+
+Writes (indexing jobs) keep using the synchronous client of QdrantManager.
+
+Configuration (environment):
+- QDRANT_URL: Qdrant server (default http://localhost:6333)
+- QDRANT_PREFER_GRPC: search over gRPC instead of REST (default true)
+- QDRANT_GRPC_PORT: gRPC port of the server (default 6334)
+- RETRIEVAL_MODE: "hybrid" or "dense" (default hybrid)
+- HYBRID_PREFETCH_LIMIT: candidates per search before fusion, at least k
+  (default 20)
+"""
+
+import asyncio
+import os
+from typing import List
+
+import anyio
+from langchain_core.documents import Document
 from langchain_qdrant import QdrantVectorStore
-from qdrant_client import QdrantClient
-from langchain_qdrant.qdrant import QdrantVectorStoreError
+from qdrant_client import AsyncQdrantClient, models
+
+from app.embeddings.sparse import SPARSE_VECTOR_NAME, bm25_encoder
+from app.vector_store.base import CONTENT_KEY, METADATA_KEY, VectorReader
+from app.vector_store.mmr import MMR_LAMBDA, mmr_select, rank_relevance
+from app.vector_store.collections import (
+    COLLECTION_REFRESH_SECONDS, QDRANT_URL, CollectionSpec, collection_registry, is_missing_collection,
+)
+from app.vector_store.qdrant import document_filter, qdrant_manager
+
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "true").lower() == "true"
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid").lower()
+HYBRID_PREFETCH_LIMIT = int(os.getenv("HYBRID_PREFETCH_LIMIT", "20"))
+
+RETRIEVAL_MODES = ("hybrid", "dense")
+
+DENSE_VECTOR_NAME = ""  # langchain-qdrant's unnamed dense vector
+
+
+def get_qdrant_reader(embedding_model) -> QdrantVectorStore:
+    """
+    Get the (synchronous) Qdrant vector store for an embedding model.
+
+    The collection is resolved through the collection registry: every
+    (provider, model, dimension) has its own collection, created empty if it
+    does not exist yet. Existing collections are never dropped here.
+    """
+    return qdrant_manager.get_vector_store(embedding_model)
+
 
-def get_qdrant_reader(embedding_model):
+def is_hybrid(mode: str = None, query_text: str = None, sparse: bool = True) -> bool:
+    """Whether a search runs fused dense + BM25 (else dense only)"""
+    mode = (mode or RETRIEVAL_MODE).lower()
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode '{mode}', expected one of {', '.join(RETRIEVAL_MODES)}")
+    return mode == "hybrid" and bool(query_text) and sparse
+
+
+def query_request(vector: List[float], k: int = 5, document_ids: List[str] = None,
+                  query_text: str = None, mode: str = None, sparse: bool = True,
+                  with_vectors: bool = False) -> dict:
     """
-    Get or create Qdrant vector store reader.
-    
-    If collection exists with different dimensions, automatically recreate it.
-    This ensures flexibility with different embedding models.
+    query_points() arguments for a search.
+
+    With mode "hybrid" (and query_text given), dense and BM25 results are
+    fused with RRF; otherwise, or if the collection has no sparse vector,
+    only the dense vector is searched. with_vectors returns each point's dense
+    vector (for re-ranking).
     """
-    try:
-        return QdrantVectorStore.from_existing_collection(
-            collection_name="rag_collection",
-            embedding=embedding_model,
-            url="http://localhost:6333",
-        )
-    
-    except QdrantVectorStoreError as e:
-        # If dimension mismatch, delete and recreate collection
-        if "dimensions" in str(e).lower():
-            print(f"[QDRANT] Collection dimension mismatch detected")
-            print(f"[QDRANT] Error: {str(e)}")
-            print(f"[QDRANT] Deleting old collection and creating new one...")
-            
-            
-            client = QdrantClient(url="http://localhost:6333")
+    query_filter = document_filter(document_ids, METADATA_KEY) if document_ids else None
+    fetched = {"limit": k, "with_payload": True, "with_vectors": [DENSE_VECTOR_NAME] if with_vectors else False}
+    if is_hybrid(mode, query_text, sparse):
+        prefetch_limit = max(HYBRID_PREFETCH_LIMIT, k)
+        return {
+            "prefetch": [
+                models.Prefetch(query=vector, filter=query_filter, limit=prefetch_limit),
+                models.Prefetch(query=bm25_encoder.encode_query(query_text), using=SPARSE_VECTOR_NAME,
+                                filter=query_filter, limit=prefetch_limit),
+            ],
+            "query": models.FusionQuery(fusion=models.Fusion.RRF),
+            **fetched,
+        }
+    return {"query": vector, "query_filter": query_filter, **fetched}
+
+
+def dense_vector(point) -> List[float]:
+    vector = point.vector
+    return vector.get(DENSE_VECTOR_NAME) if isinstance(vector, dict) else vector
+
+
+class AsyncQdrantReader(VectorReader):
+    def __init__(self, url: str = QDRANT_URL, prefer_grpc: bool = QDRANT_PREFER_GRPC,
+                 grpc_port: int = QDRANT_GRPC_PORT, refresh_interval: float = COLLECTION_REFRESH_SECONDS):
+        self.url = url
+        self.prefer_grpc = prefer_grpc
+        self.grpc_port = grpc_port
+        self.refresh_interval = refresh_interval
+        self.client = None
+        self._refresher = None
+
+    async def start(self):
+        if self.client is None:
+            self.client = AsyncQdrantClient(url=self.url, prefer_grpc=self.prefer_grpc, grpc_port=self.grpc_port)
+            transport = f"gRPC :{self.grpc_port}" if self.prefer_grpc else "REST"
+            print(f"[QDRANT] Async client for {self.url} ({transport})")
+        if self.refresh_interval > 0 and self._refresher is None:
+            self._refresher = asyncio.get_running_loop().create_task(self._refresh_loop())
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
             try:
-                client.delete_collection(collection_name="rag_collection")
-                print(f"[QDRANT]Old collection deleted")
-            except Exception as delete_error:
-                print(f"[QDRANT] Warning: Could not delete collection: {delete_error}")
-            
-            vector_store = QdrantVectorStore.from_documents(
-                documents=[],   
-                embedding=embedding_model,
-                url="http://localhost:6333",
-                collection_name="rag_collection",
-                force_recreate=True,
+                report = await anyio.to_thread.run_sync(collection_registry.refresh)
+                if report["invalidated"]:
+                    print(f"[QDRANT] Health check invalidated {', '.join(report['invalidated'])}")
+            except Exception as e:
+                print(f"[QDRANT] Collection health check failed: {str(e)}")
+
+    async def close(self):
+        if self._refresher is not None:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+    async def collection(self, embedding) -> CollectionSpec:
+        spec = collection_registry.cached(embedding)
+        if spec is None:
+            # First query for this model in the process: probe/create off the event loop
+            spec = await anyio.to_thread.run_sync(collection_registry.resolve, embedding)
+        return spec
+
+    async def search(self, embedding, vector: List[float], k: int = 5,
+                     document_ids: List[str] = None, query_text: str = None,
+                     mode: str = None, mmr_fetch_k: int = 0,
+                     mmr_lambda: float = None) -> List[Document]:
+        """
+        Top-k chunks for a query vector, optionally restricted to some documents.
+
+        With mmr_fetch_k > k, that many candidates are fetched and k of them
+        picked by maximal marginal relevance (relevance = the fused ranking in
+        hybrid mode, dense cosine otherwise).
+        """
+        await self.start()
+        rerank = mmr_fetch_k > k
+        for attempt in range(2):
+            spec = await self.collection(embedding)
+            try:
+                response = await self.client.query_points(
+                    collection_name=spec.name,
+                    **query_request(vector, mmr_fetch_k if rerank else k, document_ids, query_text, mode,
+                                    sparse=spec.sparse, with_vectors=rerank),
+                )
+                break
+            except Exception as e:
+                if attempt or not is_missing_collection(e):
+                    raise
+                # Deleted or recreated since it was cached: resolve it again
+                collection_registry.invalidate(spec.name)
+        points = response.points
+        if rerank and len(points) > k:
+            # A few matrix products over at most MMR_MAX_FETCH_K vectors (~ms): fine on the event loop
+            relevance = (rank_relevance([p.score for p in points])
+                         if is_hybrid(mode, query_text, spec.sparse) else None)
+            points = [points[i] for i in mmr_select(vector, [dense_vector(p) for p in points], k,
+                                                    MMR_LAMBDA if mmr_lambda is None else mmr_lambda,
+                                                    relevance=relevance)]
+        return [
+            Document(
+                page_content=(point.payload or {}).get(CONTENT_KEY, ""),
+                metadata=(point.payload or {}).get(METADATA_KEY) or {},
             )
-            print(f"[QDRANT]New collection created with current embedding model")
-            return vector_store
-        else:
-            raise
+            for point in points
+        ]
+
+
+qdrant_reader = AsyncQdrantReader()
@@ -5,88 +5,156 @@ os.environ["OBJC_DISABLE_INITIALIZE_FORK_SAFETY"] = "YES"
 
 import sys
 from dotenv import load_dotenv
-from langchain_core.documents import Document
 
-from app.vector_store.qdrant import qdrant_manager
-from langchain_openai import OpenAIEmbeddings
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_qdrant import QdrantVectorStore
+from app.vector_store.backends import vector_backend
+from app.vector_store.qdrant import ChunkIdentity
+from app.services.chunk_store import chunk_store
+from app.embeddings.executor import embedding_stats
+from app.embeddings.cache import embedding_cache
+from app.embeddings.registry import client_registry
 
 load_dotenv()
 
+
+def create_embedding(provider: str, model_name: str, dimension: int = 0):
+    """Embedding client for a provider/model/size (cache → executor → provider), shared per process"""
+    return client_registry.embeddings(provider, model_name, dimension)
+
+
+def record_failure(job_payload: dict, error: Exception) -> dict:
+    """Log a failed job, mark its index as failed and build the job result"""
+    import traceback
+    msg = f"Indexing failed: {str(error)}"
+    print(f"[WORKER]  ERROR: {msg}")
+    print(f"[WORKER] Traceback: {traceback.format_exc()}")
+    try:
+        from app.database import DocumentService
+        if document_state(job_payload.get("document_id")) in ("deleting", "missing"):
+            # Deleted while indexing: don't leave an index record behind
+            return {
+                "document_id": job_payload.get("document_id"),
+                "status": "failed",
+                "error": msg,
+                "chunks_indexed": 0,
+            }
+        DocumentService.upsert_index(
+            job_payload.get("document_id"),
+            job_payload.get("embedding_provider", "").lower(),
+            job_payload.get("embedding_model"),
+            "failed",
+            embedding_dimension=job_payload.get("embedding_dimension") or 0,
+        )
+    except Exception as db_error:
+        print(f"[WORKER]Warning: Could not record failed index: {str(db_error)}")
+    return {
+        "document_id": job_payload.get("document_id"),
+        "status": "failed",
+        "error": msg,
+        "chunks_indexed": 0,
+    }
+
+
+def document_state(document_id: str):
+    """Status of the document's record, "missing" without one, None if the database is unavailable"""
+    try:
+        from app.database import DocumentService
+        document = DocumentService.get_document(document_id)
+    except Exception as db_error:
+        print(f"[WORKER] ℹ️ Database not available, skipping deletion check: {str(db_error)}")
+        return None
+    return document.status if document is not None else "missing"
+
+
+def deleted_during_job(document_id: str, initial_state) -> bool:
+    """The document is being deleted, or its record disappeared since the job started"""
+    state = document_state(document_id)
+    return state == "deleting" or (state == "missing" and initial_state not in (None, "missing"))
+
+
+def discard_deleted(document_id: str, embedding_model=None) -> dict:
+    """Undo what a job wrote for a document deleted while it ran, and build the job result"""
+    points = 0
+    if embedding_model is not None:
+        points = vector_backend.delete_document_points(document_id, embedding_model)
+    print(f"[WORKER] Document {document_id} was deleted while indexing, discarded {points} points")
+    return {
+        "document_id": document_id,
+        "status": "deleted",
+        "chunks_indexed": 0,
+        "message": "Document was deleted while indexing",
+    }
+
+
 def process_rag(job_payload: dict):
     try:
         document_id    = job_payload["document_id"]
         provider       = job_payload["embedding_provider"].lower()
         model_name     = job_payload["embedding_model"]
-        chunks         = job_payload["chunks"]
-        if not chunks:
-            raise ValueError("No chunks provided")
+        dimension      = job_payload.get("embedding_dimension") or 0
+        mode           = job_payload.get("mode", "incremental")
+        previous_id    = job_payload.get("previous_document_id")
+        initial_state  = document_state(document_id)
+        if initial_state == "deleting":
+            return discard_deleted(document_id)
+        documents      = chunk_store.load(document_id)
+        if not documents:
+            raise ValueError(f"No chunks stored for document {document_id}")
 
         print(f"[WORKER] Starting indexing for document: {document_id}")
-        print(f"[WORKER] Provider: {provider}, Model: {model_name}")
-        print(f"[WORKER] Chunks: {len(chunks)}")
-        
-        # ── Convert dict chunks to LangChain Document objects ───────────
-        documents = []
-        for chunk in chunks:
-            if isinstance(chunk, dict):
-                # Create Document from dict
-                doc = Document(
-                    page_content=chunk.get("page_content", chunk.get("text", "")),
-                    metadata=chunk.get("metadata", {})
-                )
-                documents.append(doc)
-            else:
-                # Already a Document object
-                documents.append(chunk)
-        
-        print(f"[WORKER] Converted {len(documents)} chunks to Document objects")
+        print(f"[WORKER] Provider: {provider}, Model: {model_name}, Dimension: {dimension or 'native'}")
+        print(f"[WORKER] Chunks: {len(documents)}")
 
         # ── Create embedding function/object ────────────────────────
-        if provider == "openai":
-            api_key = os.getenv("OPENAI_API_KEY")
-            if not api_key:
-                raise ValueError("OPENAI_API_KEY not set in environment")
-            
-            print(f"[WORKER] Creating OpenAI embedding with key: {api_key[:20]}...")
-            embedding_model = OpenAIEmbeddings(model=model_name, api_key=api_key)
-
-        elif provider == "gemini":
-            api_key = os.getenv("GEMINI_API_KEY")
-            if not api_key:
-                raise ValueError("GEMINI_API_KEY not set in environment")
-                
-            print(f"[WORKER] Creating Gemini embedding with key: {api_key[:20]}...")
-            embedding_model = GoogleGenerativeAIEmbeddings(model=model_name, google_api_key=api_key)
+        embedding_model = create_embedding(provider, model_name, dimension)
+
+        from rq import get_current_job
+        job = get_current_job()
+
+        def on_progress(stats: dict):
+            # Upsert progress: points/batches written so far out of the points being upserted
+            if job is not None:
+                job.meta["progress"] = stats
+                job.save_meta()
 
+        if mode == "incremental":
+            # ── Embed only chunks whose text is not stored yet ──────────
+            from app.services.incremental_index import reindex_incremental
+            diff = reindex_incremental(document_id, documents, embedding_model, previous_id, on_progress)
         else:
-            raise ValueError(f"Unsupported provider: {provider}")
-
-        print(f"[WORKER] Indexing {len(chunks)} chunks using {provider}/{model_name}")
-
-        # ── Actually index ───────────────────────────────────────────
-        # Use force_recreate=True to handle dimension mismatches
-        # This ensures different embedding models can be used with same collection
-        qdrant = QdrantVectorStore.from_documents(
-            documents=documents,
-            embedding=embedding_model,
-            url="http://localhost:6333",
-            collection_name="rag_collection",
-            force_recreate=True,  # ← Recreate collection if dimensions change
-        )
+            print(f"[WORKER] Indexing {len(documents)} chunks using {provider}/{model_name}")
+            ids, tagged = ChunkIdentity(document_id).tag(documents)
+
+            # ── Actually index ───────────────────────────────────────────
+            # Re-embed every chunk, then replace only this document's points
+            # in the model's own collection; other documents are untouched
+            vectors = embedding_model.embed_documents([doc.page_content for doc in tagged])
+            upsert = vector_backend.upsert_parallel(tagged, vectors, embedding_model, ids=ids,
+                                                    on_progress=on_progress)
+            deleted = vector_backend.delete_document_points(document_id, embedding_model, keep_ids=ids)
+            diff = {"reused": 0, "added": len(documents), "deleted": deleted, "upsert": upsert}
 
 
         count = len(documents)
 
+        # A DELETE that ran meanwhile must not be undone by the writes below
+        if deleted_during_job(document_id, initial_state):
+            return discard_deleted(document_id, embedding_model)
+
         # ── Update document status in database ──────────────────────
         try:
             from app.database import DocumentService
             DocumentService.update_document_status(
                 document_id=document_id,
                 status="indexed",
-                chunks_count=count
+                chunks_count=count,
+                embedding_provider=provider,
+                embedding_model=model_name,
+                embedding_dimension=dimension,
             )
+            if mode == "incremental" and previous_id and previous_id != document_id:
+                # The previous version's points now belong to this document
+                DocumentService.upsert_index(previous_id, provider, model_name, "evicted")
+            DocumentService.upsert_index(document_id, provider, model_name, "indexed", count, dimension)
             print(f"[WORKER]Document status updated in DB: {document_id}")
         except Exception as db_error:
             print(f"[WORKER]Warning: Could not update document status: {str(db_error)}")
@@ -97,7 +165,111 @@ def process_rag(job_payload: dict):
             "chunks_indexed": count,
             "embedding_provider": provider,
             "embedding_model": model_name,
+            "embedding_dimension": dimension,
+            "status": "indexed",
+            "mode": mode,
+            "chunks_reused": diff["reused"],
+            "chunks_added": diff["added"],
+            "chunks_deleted": diff["deleted"],
+            "embedding": embedding_stats(embedding_model),
+            "upsert": diff["upsert"],
+            "message": f"Indexed {count} chunks successfully ({diff['added']} embedded)"
+        }
+
+        print(f"[WORKER]Success → {result}")
+        return result
+
+    except Exception as e:
+        return record_failure(job_payload, e)
+    finally:
+        # The work horse exits with the job: write its cache hits now
+        embedding_cache.flush()
+
+
+def ingest_document(job_payload: dict):
+    """
+    Stream a stored PDF straight into the vector store.
+
+    Pages are parsed, chunked, embedded and upserted batch by batch through
+    the ingestion pipeline, so memory depends on the batch size rather than
+    the document size and the first vectors are searchable early. Progress
+    is published in the RQ job meta.
+    """
+    try:
+        from rq import get_current_job
+        from app.services.text_extractor import text_extractor
+        from app.services.text_chunker import text_chunker
+        from app.services.ingestion_pipeline import ingestion_pipeline
+
+        document_id    = job_payload["document_id"]
+        provider       = job_payload["embedding_provider"].lower()
+        model_name     = job_payload["embedding_model"]
+        dimension      = job_payload.get("embedding_dimension") or 0
+
+        initial_state  = document_state(document_id)
+        if initial_state == "deleting":
+            return discard_deleted(document_id)
+
+        print(f"[WORKER] Starting streaming ingestion for document: {document_id}")
+        print(f"[WORKER] Provider: {provider}, Model: {model_name}, Dimension: {dimension or 'native'}")
+
+        embedding_model = create_embedding(provider, model_name, dimension)
+
+        job = get_current_job()
+
+        def on_progress(stats: dict):
+            if job is not None:
+                job.meta["progress"] = stats
+                job.save_meta()
+
+        identity = ChunkIdentity(document_id)
+
+        # Chunks are also persisted as they flow, for previews and duplicate uploads
+        with chunk_store.writer(document_id) as chunk_writer:
+            def upsert(batch, vectors):
+                ids, tagged = identity.tag(batch)
+                vector_backend.upsert_embedded(tagged, vectors, embedding_model, ids=ids)
+                chunk_writer.write(batch)
+
+            stats = ingestion_pipeline.run(
+                pages=text_extractor.iter_pages(document_id),
+                splitter=text_chunker,
+                embed=embedding_model.embed_documents,
+                upsert=upsert,
+                on_progress=on_progress,
+            )
+        count = stats["vectors"]
+
+        # A DELETE that ran meanwhile must not be undone by the writes below
+        if deleted_during_job(document_id, initial_state):
+            chunk_store.delete(document_id)
+            return discard_deleted(document_id, embedding_model)
+
+        # ── Update document status in database ──────────────────────
+        try:
+            from app.database import DocumentService
+            DocumentService.update_document_status(
+                document_id=document_id,
+                status="indexed",
+                chunks_count=count,
+                embedding_provider=provider,
+                embedding_model=model_name,
+                embedding_dimension=dimension,
+            )
+            DocumentService.upsert_index(document_id, provider, model_name, "indexed", count, dimension)
+            print(f"[WORKER]Document status updated in DB: {document_id}")
+        except Exception as db_error:
+            print(f"[WORKER]Warning: Could not update document status: {str(db_error)}")
+
+        result = {
+            "document_id": document_id,
+            "chunks_indexed": count,
+            "embedding_provider": provider,
+            "embedding_model": model_name,
+            "embedding_dimension": dimension,
             "status": "indexed",
+            "pipeline": stats,
+            "embedding": embedding_stats(embedding_model),
             "message": f"Indexed {count} chunks successfully"
         }
 
@@ -105,13 +277,7 @@ def process_rag(job_payload: dict):
         return result
 
     except Exception as e:
-        import traceback
-        msg = f"Indexing failed: {str(e)}"
-        print(f"[WORKER]  ERROR: {msg}")
-        print(f"[WORKER] Traceback: {traceback.format_exc()}")
-        return {
-            "document_id": job_payload.get("document_id"),
-            "status": "failed",
-            "error": msg,
-            "chunks_indexed": 0,
-        }
\ No newline at end of file
+        return record_failure(job_payload, e)
+    finally:
+        # The work horse exits with the job: write its cache hits now
+        embedding_cache.flush()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark Chunk Store Script
+
+Compares the memory-mapped binary chunk format in app/services/chunk_store.py
+against the previous JSON array format on a synthetic document.
+
+For each format it measures time and peak Python allocations (tracemalloc) for:
+1. Writing all chunks
+2. Opening the document and counting chunks
+3. Reading one preview page of 20 chunks
+4. Loading every chunk as a Document
+
+Usage:
+    python scripts/benchmark_chunk_store.py [chunks] [chunk_chars]
+
+Example:
+    python scripts/benchmark_chunk_store.py 10000 1000
+"""
+
+import json
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from langchain_core.documents import Document
+from app.services.chunk_store import ChunkStore
+
+
+def make_chunks(count: int, chars: int) -> list:
+    words = ["qdrant", "embedding", "chunk", "retrieval", "document", "vector", "página", "index"]
+    rng = random.Random(42)
+    common = {
+        "producer": "PyPDF",
+        "creator": "Microsoft Word",
+        "creationdate": "2024-12-09T00:00:00+00:00",
+        "source": "/data/uploads/manual.pdf",
+        "total_pages": count // 3,
+    }
+    chunks = []
+    for i in range(count):
+        text = " ".join(rng.choice(words) for _ in range(chars // 8))[:chars]
+        chunks.append(Document(
+            page_content=text,
+            metadata={**common, "page": i // 3, "page_label": str(i // 3 + 1)},
+        ))
+    return chunks
+
+
+def measure(fn):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+# ===== JSON (previous format) =====
+
+def json_write(path: Path, chunks: list):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump([{"page_content": c.page_content, "metadata": c.metadata} for c in chunks], f)
+
+
+def json_load(path: Path) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        return [Document(page_content=c["page_content"], metadata=c["metadata"]) for c in json.load(f)]
+
+
+def json_count(path: Path) -> int:
+    with open(path, "r", encoding="utf-8") as f:
+        return len(json.load(f))
+
+
+def json_page(path: Path, offset: int, limit: int) -> list:
+    return json_load(path)[offset:offset + limit]
+
+
+def run_benchmark(count: int, chars: int):
+    chunks = make_chunks(count, chars)
+    root = Path(tempfile.mkdtemp())
+    store = ChunkStore(root)
+    # Not "bench.json": the store treats that as its own legacy file
+    json_path = root / "bench-legacy.json"
+    offset = count // 2
+
+    rows = [
+        ("write", lambda: json_write(json_path, chunks), lambda: store.save("bench", chunks)),
+        ("open + count", lambda: json_count(json_path), lambda: store.count("bench")),
+        ("preview page (20)", lambda: json_page(json_path, offset, 20), lambda: store.page("bench", offset, 20)),
+        ("load all", lambda: json_load(json_path), lambda: store.load("bench")),
+    ]
+
+    print(f"\n{'='*72}")
+    print(f"  CHUNK STORE BENCHMARK: {count} chunks x {chars} chars")
+    print(f"{'='*72}")
+
+    print(f"\n {'operation':<20}{'json ms':>10}{'json peak':>12}{'binary ms':>12}{'binary peak':>13}{'speedup':>9}")
+    for name, json_fn, binary_fn in rows:
+        _, json_s, json_peak = measure(json_fn)
+        _, bin_s, bin_peak = measure(binary_fn)
+        print(f" {name:<20}{json_s * 1000:>10.1f}{json_peak / 1024:>10.0f}KB"
+              f"{bin_s * 1000:>12.1f}{bin_peak / 1024:>11.0f}KB{json_s / bin_s if bin_s else 0:>9.1f}x")
+
+    print(f"\n File size: JSON {json_path.stat().st_size} B, binary {store.path('bench').stat().st_size} B")
+    assert store.load("bench") == chunks, "binary round trip changed the chunks"
+    print(" Round trip: OK\n")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    chars = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    run_benchmark(count, chars)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark Chunker Script
+
+Compares the offset-based TextChunker (app/services/text_chunker.py) against
+LangChain's RecursiveCharacterTextSplitter on the pages of a PDF.
+
+For each chunker it reports time, throughput (MB of page text per second),
+peak Python allocations (tracemalloc), chunk count and mean chunk length.
+The offset chunker is measured twice: producing spans only, and building
+Documents like the splitter does.
+
+Usage:
+    python scripts/benchmark_chunker.py path/to/large.pdf [chunk_size] [chunk_overlap] [repeat]
+
+Example:
+    python scripts/benchmark_chunker.py manual.pdf 1000 200 5
+"""
+
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from app.services.text_chunker import TextChunker
+from app.services.text_extractor import text_extractor
+
+
+def measure(fn):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def run_benchmark(pdf_path: str, chunk_size: int, chunk_overlap: int, repeat: int):
+    # An absolute path overrides UPLOADS_DIR when joined
+    pages = text_extractor.extract_pages(str(Path(pdf_path).resolve()), 0, 10**9) * repeat
+    total_chars = sum(len(p.page_content) for p in pages)
+    megabytes = total_chars / 1e6
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    chunker = TextChunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+    rows = [
+        ("RecursiveCharacterTextSplitter", lambda: splitter.split_documents(pages), lambda r: [len(d.page_content) for d in r]),
+        ("TextChunker (spans)", lambda: chunker.spans(pages), lambda r: [s.end - s.start for s in r]),
+        ("TextChunker (documents)", lambda: chunker.split_documents(pages), lambda r: [len(d.page_content) for d in r]),
+    ]
+
+    print(f"\n{'='*86}")
+    print(f"  CHUNKER BENCHMARK: {len(pages)} pages, {total_chars} chars, size={chunk_size} overlap={chunk_overlap}")
+    print(f"{'='*86}")
+    print(f"\n {'chunker':<32}{'seconds':>9}{'MB/s':>9}{'peak MB':>10}{'chunks':>9}{'mean len':>10}{'embedded x':>12}")
+
+    for name, fn, lengths in rows:
+        result, seconds, peak = measure(fn)
+        sizes = lengths(result)
+        print(f" {name:<32}{seconds:>9.3f}{megabytes / seconds:>9.1f}{peak / 1e6:>10.1f}{len(sizes):>9}"
+              f"{sum(sizes) / max(len(sizes), 1):>10.0f}{sum(sizes) / total_chars:>12.2f}")
+
+    print("\n embedded x = characters sent to the embedding model / characters of page text\n")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    overlap = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    repeat = int(sys.argv[4]) if len(sys.argv) > 4 else 1
+    run_benchmark(sys.argv[1], size, overlap, repeat)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark Dimensions Script
+
+Recall vs latency of reduced embedding dimensions (app/embeddings/dimensions.py),
+to pick EMBEDDING_DIMENSION with data.
+
+The PDF's chunks and a set of questions taken from them are embedded at the
+model's native size; its exact top-k (cosine) is the ground truth. For every
+candidate size the chunks are embedded the way indexing would do it (native
+`dimensions` parameter, or truncation + renormalization of the native
+vectors), loaded into a Qdrant collection and searched. Reported per size:
+recall@k against the native top-k, search latency p50/p99 and vector memory.
+
+Qdrant runs in-process unless QDRANT_URL is set; use a real server for
+latencies that match production. Embeddings go through the client registry,
+so repeated runs are served from the embedding cache.
+
+Usage:
+    python scripts/benchmark_dimensions.py path/to/file.pdf [provider] [model] [dims] [queries] [k]
+
+Example:
+    QDRANT_URL=http://localhost:6333 \\
+        python scripts/benchmark_dimensions.py manual.pdf openai text-embedding-3-large 256,512,1024 200 5
+"""
+
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from qdrant_client import QdrantClient, models
+from app.embeddings.dimensions import supports_native_dimensions, truncate
+from app.embeddings.registry import client_registry
+from app.services.text_chunker import text_chunker
+from app.services.text_extractor import text_extractor
+
+COLLECTION = "benchmark_dimensions_{}"
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(np.array(samples) * 1000, q))
+
+
+def questions_from(chunks, count: int) -> list:
+    rng = random.Random(0)
+    questions = []
+    for _ in range(count):
+        words = rng.choice(chunks).page_content.split()
+        start = rng.randrange(max(len(words) - 8, 1))
+        questions.append(" ".join(words[start:start + 8]))
+    return questions
+
+
+def exact_top_k(doc_vectors, query_vectors, k: int) -> list:
+    docs = np.asarray(doc_vectors, dtype=np.float32)
+    docs /= np.linalg.norm(docs, axis=1, keepdims=True)
+    queries = np.asarray(query_vectors, dtype=np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    scores = queries @ docs.T
+    return [set(np.argsort(-row)[:k].tolist()) for row in scores]
+
+
+def embed_at(provider: str, model: str, dimension: int, texts: list, native_vectors: list) -> list:
+    """Vectors of the given size, produced the way indexing produces them"""
+    if supports_native_dimensions(provider, model):
+        return client_registry.embeddings(provider, model, dimension).embed_documents(texts)
+    return truncate(native_vectors, dimension)
+
+
+def search(client, name: str, doc_vectors, query_vectors, k: int):
+    client.create_collection(
+        name,
+        vectors_config=models.VectorParams(size=len(doc_vectors[0]), distance=models.Distance.COSINE),
+    )
+    client.upsert(name, points=[
+        models.PointStruct(id=i, vector=vector) for i, vector in enumerate(doc_vectors)
+    ])
+
+    results, latencies = [], []
+    for vector in query_vectors:
+        started = time.perf_counter()
+        hits = client.query_points(name, query=vector, limit=k).points
+        latencies.append(time.perf_counter() - started)
+        results.append({hit.id for hit in hits})
+    client.delete_collection(name)
+    return results, latencies
+
+
+def run_benchmark(pdf_path: str, provider: str, model: str, dims: list, queries: int, k: int):
+    # An absolute path overrides UPLOADS_DIR when joined
+    pages = text_extractor.extract(str(Path(pdf_path).resolve()))
+    chunks = text_chunker.split_documents(pages)
+    texts = [chunk.page_content for chunk in chunks]
+    questions = questions_from(chunks, queries)
+
+    native = client_registry.embeddings(provider, model)
+    native_docs = native.embed_documents(texts)
+    native_queries = native.embed_documents(questions)
+    truth = exact_top_k(native_docs, native_queries, k)
+    native_size = len(native_docs[0])
+
+    url = os.getenv("QDRANT_URL")
+    client = QdrantClient(url=url) if url else QdrantClient(":memory:")
+
+    print(f"\n{'='*72}")
+    print(f"  DIMENSION BENCHMARK: {provider}/{model}, {len(texts)} chunks, {queries} queries, k={k}")
+    print(f"{'='*72}")
+    print(f"\n Qdrant: {url or 'in-process'}")
+    print(f" Reduction: {'native parameter' if supports_native_dimensions(provider, model) else 'truncate + renormalize'}")
+    print(f"\n {'dims':>6}{'recall@k':>10}{'p50 ms':>9}{'p99 ms':>9}{'MB/1M vecs':>12}{'vs native':>11}")
+
+    for dimension in [native_size] + [d for d in dims if d < native_size]:
+        if dimension == native_size:
+            doc_vectors, query_vectors = native_docs, native_queries
+        else:
+            doc_vectors = embed_at(provider, model, dimension, texts, native_docs)
+            query_vectors = embed_at(provider, model, dimension, questions, native_queries)
+
+        found, latencies = search(client, COLLECTION.format(dimension), doc_vectors, query_vectors, k)
+        recall = np.mean([len(hit & want) / len(want) for hit, want in zip(found, truth)])
+        print(f" {dimension:>6}{recall:>10.3f}{percentile_ms(latencies, 50):>9.2f}"
+              f"{percentile_ms(latencies, 99):>9.2f}{dimension * 4 * 1e6 / 2**20:>12.0f}"
+              f"{dimension / native_size:>10.0%}")
+
+    skipped = [d for d in dims if d >= native_size]
+    if skipped:
+        print(f"\n Skipped {skipped}: not smaller than the native {native_size} dimensions")
+    print()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    provider_name = sys.argv[2] if len(sys.argv) > 2 else "local"
+    model_name = sys.argv[3] if len(sys.argv) > 3 else "local-hash-3072"
+    sizes = [int(d) for d in sys.argv[4].split(",")] if len(sys.argv) > 4 else [256, 512, 1024]
+    count = int(sys.argv[5]) if len(sys.argv) > 5 else 100
+    top_k = int(sys.argv[6]) if len(sys.argv) > 6 else 5
+    run_benchmark(sys.argv[1], provider_name, model_name, sizes, count, top_k)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark Filtered Search Script
+
+Search latency as a collection grows, for document-scoped searches (filter
+on metadata.document_id, backed by the payload index the collection registry
+creates) versus searches over the whole collection.
+
+The collection is filled with random unit vectors in steps up to each size,
+`chunks_per_document` points per document. After every step, once Qdrant has
+finished optimizing, it runs the same random queries twice: unfiltered and
+filtered to a random document. It also checks that filtered hits never
+leave their document.
+
+Needs a Qdrant server (QDRANT_URL, default http://localhost:6333): the
+in-process mode ignores payload indexes. The benchmark collection is deleted
+at the end. Set BENCH_NO_PAYLOAD_INDEX=1 to measure the filter without the
+index.
+
+Usage:
+    python scripts/benchmark_filtered_search.py [sizes] [dimension] [chunks_per_document] [queries]
+
+Example:
+    python scripts/benchmark_filtered_search.py 10000,100000,1000000,3000000 512 50 200
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from qdrant_client import QdrantClient, models
+from app.vector_store.collections import DOCUMENT_ID_FIELD, QDRANT_URL
+from app.vector_store.qdrant import document_filter
+
+COLLECTION = "benchmark_filtered_search"
+UPLOAD_BATCH = 2048
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(np.array(samples) * 1000, q))
+
+
+def random_vectors(rng, count: int, dimension: int) -> np.ndarray:
+    vectors = rng.standard_normal((count, dimension), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def wait_until_optimized(client: QdrantClient):
+    while client.get_collection(COLLECTION).status != models.CollectionStatus.GREEN:
+        time.sleep(0.5)
+
+
+def grow(client: QdrantClient, rng, start: int, end: int, dimension: int, chunks_per_document: int):
+    for offset in range(start, end, UPLOAD_BATCH):
+        ids = list(range(offset, min(offset + UPLOAD_BATCH, end)))
+        client.upsert(
+            COLLECTION,
+            points=models.Batch(
+                ids=ids,
+                vectors=random_vectors(rng, len(ids), dimension).tolist(),
+                payloads=[
+                    {"page_content": "", "metadata": {"document_id": f"doc-{i // chunks_per_document}"}}
+                    for i in ids
+                ],
+            ),
+            wait=True,
+        )
+
+
+def measure(client: QdrantClient, queries: np.ndarray, documents: list = None, k: int = 5):
+    latencies, leaked = [], 0
+    for i, vector in enumerate(queries):
+        query_filter = document_filter([documents[i]]) if documents else None
+        started = time.perf_counter()
+        hits = client.query_points(
+            COLLECTION, query=vector.tolist(), query_filter=query_filter, limit=k, with_payload=True,
+        ).points
+        latencies.append(time.perf_counter() - started)
+        if documents:
+            leaked += sum(hit.payload["metadata"]["document_id"] != documents[i] for hit in hits)
+    return latencies, leaked
+
+
+def run_benchmark(sizes: list, dimension: int, chunks_per_document: int, queries: int):
+    client = QdrantClient(url=QDRANT_URL)
+    rng = np.random.default_rng(0)
+    use_index = os.getenv("BENCH_NO_PAYLOAD_INDEX") != "1"
+
+    if client.collection_exists(COLLECTION):
+        client.delete_collection(COLLECTION)
+    client.create_collection(
+        COLLECTION,
+        vectors_config=models.VectorParams(size=dimension, distance=models.Distance.COSINE),
+    )
+    if use_index:
+        client.create_payload_index(
+            COLLECTION,
+            field_name=DOCUMENT_ID_FIELD,
+            field_schema=models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD, is_tenant=True),
+            wait=True,
+        )
+
+    print(f"\n{'='*78}")
+    print(f"  FILTERED SEARCH BENCHMARK: {dimension} dims, {chunks_per_document} chunks/document, {queries} queries")
+    print(f"{'='*78}")
+    print(f"\n Qdrant: {QDRANT_URL}, payload index: {'yes' if use_index else 'no'}")
+    print(f"\n {'points':>10}{'documents':>11}{'load s':>8}"
+          f"{'all p50':>9}{'all p99':>9}{'doc p50':>9}{'doc p99':>9}{'leaked':>8}")
+
+    try:
+        loaded = 0
+        for size in sorted(sizes):
+            started = time.perf_counter()
+            grow(client, rng, loaded, size, dimension, chunks_per_document)
+            wait_until_optimized(client)
+            load_seconds = time.perf_counter() - started
+            loaded = size
+
+            document_count = -(-size // chunks_per_document)
+            query_vectors = random_vectors(rng, queries, dimension)
+            documents = [f"doc-{d}" for d in rng.integers(0, document_count, queries)]
+
+            unfiltered, _ = measure(client, query_vectors)
+            filtered, leaked = measure(client, query_vectors, documents)
+            print(f" {size:>10}{document_count:>11}{load_seconds:>8.1f}"
+                  f"{percentile_ms(unfiltered, 50):>9.2f}{percentile_ms(unfiltered, 99):>9.2f}"
+                  f"{percentile_ms(filtered, 50):>9.2f}{percentile_ms(filtered, 99):>9.2f}{leaked:>8}")
+    finally:
+        client.delete_collection(COLLECTION)
+    print()
+
+
+if __name__ == "__main__":
+    point_counts = [int(n) for n in sys.argv[1].split(",")] if len(sys.argv) > 1 else [10_000, 100_000, 1_000_000]
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 512
+    per_document = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+    count = int(sys.argv[4]) if len(sys.argv) > 4 else 200
+    run_benchmark(point_counts, size, per_document, count)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Benchmark Local Index Script
+
+The embedded vector index (VECTOR_BACKEND=local) against Qdrant, to decide
+up to which size a single-node install can skip the Qdrant service.
+
+Both backends are filled through the same VectorBackend calls indexing jobs
+make, with random unit vectors, `chunks_per_document` points per document.
+At every size the same random queries run scoped to one document (the
+/llm/process default) and over the whole collection. Reported per backend:
+load time, search p50/p99 and recall@k against exact search. The local
+index is exact, so its recall shows the price Qdrant's HNSW pays, if any.
+
+Qdrant runs in-process unless QDRANT_URL is set; use a real server for a
+fair comparison. The local index is written to a temporary directory. Both
+are deleted at the end.
+
+Usage:
+    python scripts/benchmark_local_index.py [sizes] [dimension] [chunks_per_document] [queries] [k]
+
+Example:
+    QDRANT_URL=http://localhost:6333 \\
+        python scripts/benchmark_local_index.py 10000,100000,500000 512 200 200 5
+"""
+
+import os
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from langchain_core.documents import Document
+from qdrant_client import QdrantClient
+from app.embeddings.registry import EmbeddingIdentity
+from app.vector_store.collections import CollectionRegistry
+from app.vector_store.local_index import LocalVectorIndex
+from app.vector_store.qdrant import QdrantManager
+from app.vector_store.quadrant_reader import query_request
+
+UPLOAD_BATCH = 4096
+
+
+class RandomEmbedding:
+    """Stands in for a registry client: only the identity is used"""
+
+    def __init__(self, dimension: int):
+        self.identity = EmbeddingIdentity("bench", "random", dimension)
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(np.array(samples) * 1000, q))
+
+
+def random_vectors(rng, count: int, dimension: int) -> np.ndarray:
+    vectors = rng.standard_normal((count, dimension), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def grow(backends: dict, embedding, rng, start: int, end: int, dimension: int, chunks_per_document: int,
+         all_vectors: list, options: dict) -> dict:
+    seconds = {name: 0.0 for name in backends}
+    for offset in range(start, end, UPLOAD_BATCH):
+        count = min(UPLOAD_BATCH, end - offset)
+        vectors = random_vectors(rng, count, dimension)
+        all_vectors.append(vectors)
+        documents = [
+            Document(page_content="", metadata={"document_id": f"doc-{(offset + i) // chunks_per_document}",
+                                                "chunk_index": offset + i})
+            for i in range(count)
+        ]
+        ids = [str(uuid.UUID(int=offset + i)) for i in range(count)]
+        for name, backend in backends.items():
+            started = time.perf_counter()
+            backend.upsert_parallel(documents, vectors.tolist(), embedding, ids=ids, **options)
+            seconds[name] += time.perf_counter() - started
+    return seconds
+
+
+def exact_top_k(vectors: np.ndarray, rows: np.ndarray, query: np.ndarray, k: int) -> set:
+    scores = vectors[rows] @ query
+    return set(rows[np.argsort(-scores)[:k]].tolist())
+
+
+def run_benchmark(sizes: list, dimension: int, chunks_per_document: int, queries: int, k: int):
+    rng = np.random.default_rng(0)
+    embedding = RandomEmbedding(dimension)
+    url = os.getenv("QDRANT_URL")
+    client = QdrantClient(url=url) if url else QdrantClient(":memory:")
+    qdrant = QdrantManager(CollectionRegistry(prefix="bench_local_index", client=client))
+
+    with tempfile.TemporaryDirectory() as root:
+        local = LocalVectorIndex(root)
+        backends = {"qdrant": qdrant, "local": local}
+        collection = qdrant.collection_name(embedding)
+
+        print(f"\n{'='*92}")
+        print(f"  LOCAL INDEX vs QDRANT: {dimension} dims, {chunks_per_document} chunks/document, "
+              f"{queries} queries, k={k}")
+        print(f"{'='*92}")
+        print(f"\n Qdrant: {url or 'in-process'}, local index: {root}")
+        print(f"\n {'points':>9} {'backend':<8}{'load s':>8}{'doc p50':>9}{'doc p99':>9}{'doc rec':>9}"
+              f"{'all p50':>9}{'all p99':>9}{'all rec':>9}{'disk MB':>9}")
+
+        try:
+            loaded, all_vectors = 0, []
+            for size in sorted(sizes):
+                # The in-process Qdrant client is not thread-safe: one batch at a time
+                load_seconds = grow(backends, embedding, rng, loaded, size, dimension, chunks_per_document,
+                                    all_vectors, {} if url else {"concurrency": 1})
+                loaded = size
+                vectors = np.concatenate(all_vectors)
+                document_count = -(-size // chunks_per_document)
+                query_vectors = random_vectors(rng, queries, dimension)
+                documents = rng.integers(0, document_count, queries)
+                every_row = np.arange(size)
+
+                for name in backends:
+                    results = {}
+                    for scoped in (True, False):
+                        latencies, recall = [], []
+                        for query, document in zip(query_vectors, documents):
+                            document_ids = [f"doc-{document}"] if scoped else None
+                            started = time.perf_counter()
+                            if name == "local":
+                                hits = local.search_sync(embedding, query.tolist(), k, document_ids)
+                            else:
+                                hits = client.query_points(
+                                    collection_name=collection,
+                                    **query_request(query.tolist(), k, document_ids, mode="dense"),
+                                ).points
+                                hits = [Document(page_content="", metadata=hit.payload["metadata"]) for hit in hits]
+                            latencies.append(time.perf_counter() - started)
+
+                            rows = (np.arange(document * chunks_per_document,
+                                              min((document + 1) * chunks_per_document, size))
+                                    if scoped else every_row)
+                            truth = exact_top_k(vectors, rows, query, k)
+                            recall.append(len({hit.metadata["chunk_index"] for hit in hits} & truth) / len(truth))
+                        results[scoped] = (percentile_ms(latencies, 50), percentile_ms(latencies, 99),
+                                           float(np.mean(recall)))
+
+                    disk = (sum(f.stat().st_size for f in Path(root).rglob("*") if f.is_file()) / 2**20
+                            if name == "local" else float("nan"))
+                    print(f" {size:>9} {name:<8}{load_seconds[name]:>8.1f}"
+                          f"{results[True][0]:>9.2f}{results[True][1]:>9.2f}{results[True][2]:>9.3f}"
+                          f"{results[False][0]:>9.2f}{results[False][1]:>9.2f}{results[False][2]:>9.3f}"
+                          f"{disk:>9.1f}")
+        finally:
+            client.delete_collection(collection)
+    print()
+
+
+if __name__ == "__main__":
+    point_counts = [int(n) for n in sys.argv[1].split(",")] if len(sys.argv) > 1 else [10_000, 50_000]
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 512
+    per_document = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    count = int(sys.argv[4]) if len(sys.argv) > 4 else 100
+    top_k = int(sys.argv[5]) if len(sys.argv) > 5 else 5
+    run_benchmark(point_counts, size, per_document, count, top_k)
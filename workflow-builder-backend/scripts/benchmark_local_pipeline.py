@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark Local Pipeline Script
+
+Measures upload, index and query throughput end to end with the offline
+"local" embedding/LLM provider (app/embeddings/local.py) and an in-process
+Qdrant, so it runs without network access, API keys or running services.
+
+Stages:
+  upload: extract and chunk the PDF (pages/sec)
+  index:  stream chunks through the ingestion pipeline with the local
+          embedding client (via the registry, i.e. executor and cache) into
+          an in-memory Qdrant collection (chunks/sec)
+  query:  embed a query, search the collection and call the local LLM, for
+          questions taken from the document (queries/sec, p50/p99 latency)
+
+Simulated provider latency and errors come from LOCAL_LATENCY_MS,
+LOCAL_LLM_LATENCY_MS and LOCAL_ERROR_RATE; set EMBEDDING_CACHE_MAX_MB=0 to
+measure without the persistent embedding cache.
+
+Usage:
+    python scripts/benchmark_local_pipeline.py path/to/file.pdf [queries] [model]
+
+Example:
+    LOCAL_LATENCY_MS=40 LOCAL_ERROR_RATE=0.02 \\
+        python scripts/benchmark_local_pipeline.py manual.pdf 200 local-hash-384
+"""
+
+import random
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from qdrant_client import QdrantClient, models
+from app.embeddings.registry import client_registry
+from app.embeddings.executor import embedding_stats
+from app.embeddings.local import LocalRateLimitError
+from app.services.ingestion_pipeline import ingestion_pipeline
+from app.services.text_chunker import text_chunker
+from app.services.text_extractor import text_extractor
+
+COLLECTION = "benchmark_local"
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(np.array(samples) * 1000, q))
+
+
+def run_benchmark(pdf_path: str, queries: int, model: str):
+    pdf_path = str(Path(pdf_path).resolve())
+    embeddings = client_registry.embeddings("local", model)
+    llm = client_registry.llm("local")
+    client = QdrantClient(":memory:")
+    dimension = len(embeddings.embed_query("dimension probe"))
+    client.create_collection(
+        COLLECTION,
+        vectors_config=models.VectorParams(size=dimension, distance=models.Distance.COSINE),
+    )
+
+    print(f"\n{'='*60}")
+    print(f"  LOCAL PIPELINE BENCHMARK")
+    print(f"{'='*60}")
+    print(f"\n File: {pdf_path}")
+    print(f" Model: local/{model} ({dimension} dims)")
+
+    # ── Upload: extract + chunk ───────────────────────────────────────────
+    started = time.perf_counter()
+    # An absolute path overrides UPLOADS_DIR when joined
+    pages = text_extractor.extract(pdf_path)
+    chunks = text_chunker.split_documents(pages)
+    upload_seconds = time.perf_counter() - started
+    print(f"\n upload: {len(pages)} pages, {len(chunks)} chunks in {upload_seconds:.2f}s "
+          f"({len(pages) / upload_seconds:.1f} pages/sec)")
+
+    # ── Index: chunk → embed → upsert ────────────────────────────────────
+    def upsert(batch, vectors):
+        client.upsert(COLLECTION, points=[
+            models.PointStruct(
+                id=str(uuid.uuid4()),
+                vector=vector,
+                payload={"page_content": doc.page_content, "metadata": doc.metadata},
+            )
+            for doc, vector in zip(batch, vectors)
+        ])
+
+    stats = ingestion_pipeline.run(
+        pages=iter(pages),
+        splitter=text_chunker,
+        embed=embeddings.embed_documents,
+        upsert=upsert,
+    )
+    executor = embedding_stats(embeddings)
+    print(f" index:  {stats['vectors']} chunks in {stats['seconds']:.2f}s "
+          f"({stats['chunks_per_sec']} chunks/sec, first vector after {stats['first_vector_seconds']}s, "
+          f"{executor.get('retries', 0)} retries)")
+
+    # ── Query: embed → search → LLM ──────────────────────────────────────
+    rng = random.Random(0)
+    questions = []
+    for _ in range(queries):
+        words = rng.choice(chunks).page_content.split()
+        start = rng.randrange(max(len(words) - 8, 1))
+        questions.append("What does the document say about " + " ".join(words[start:start + 8]) + "?")
+
+    latencies, found, failed = [], 0, 0
+    started = time.perf_counter()
+    for question in questions:
+        t = time.perf_counter()
+        try:
+            vector = embeddings.embed_query(question)
+            hits = client.query_points(COLLECTION, query=vector, limit=5, with_payload=True).points
+            context = "\n\n".join(hit.payload["page_content"] for hit in hits)
+            llm.chat.completions.create(
+                model="local-chat",
+                messages=[
+                    {"role": "system", "content": f"Answer from the context.\nContext:\n{context}"},
+                    {"role": "user", "content": question},
+                ],
+            )
+        except LocalRateLimitError:
+            # The API would return an error for this request
+            failed += 1
+            continue
+        latencies.append(time.perf_counter() - t)
+        found += bool(hits)
+    query_seconds = time.perf_counter() - started
+    print(f" query:  {queries} queries in {query_seconds:.2f}s ({queries / query_seconds:.1f} queries/sec, "
+          f"p50 {percentile_ms(latencies, 50):.1f} ms, p99 {percentile_ms(latencies, 99):.1f} ms, "
+          f"{found} with results, {failed} failed)")
+    print()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    model_name = sys.argv[3] if len(sys.argv) > 3 else "local-hash"
+    run_benchmark(sys.argv[1], count, model_name)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark MMR Script
+
+Cost and effect of the MMR re-ranking stage (app/vector_store/mmr.py) for
+different candidate counts.
+
+Candidates are clusters of near-duplicate unit vectors, like the
+overlapping chunks of one passage. For every N the script measures:
+
+- fetch: query_points for N candidates with their vectors vs k without
+  (in-process Qdrant unless QDRANT_URL is set)
+- mmr: mmr_select() over the N candidates, p50/p99
+- redundancy: mean pairwise cosine similarity of the k results, plain
+  top-k vs MMR, and the number of distinct clusters they cover
+
+Usage:
+    python scripts/benchmark_mmr.py [candidates] [dimension] [k] [lambda] [repeats]
+
+Example:
+    python scripts/benchmark_mmr.py 50,100,200 1536 5 0.5 200
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from qdrant_client import QdrantClient, models
+from app.vector_store.mmr import mmr_select
+
+COLLECTION = "benchmark_mmr"
+CLUSTER_SIZE = 5
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(np.array(samples) * 1000, q))
+
+
+def unit(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+
+def clustered_candidates(rng, query: np.ndarray, count: int, dimension: int) -> np.ndarray:
+    """Clusters of CLUSTER_SIZE near-duplicates, all somewhat close to the query"""
+    centers = unit(query + 0.8 * unit(rng.standard_normal((-(-count // CLUSTER_SIZE), dimension))))
+    noise = 0.05 * unit(rng.standard_normal((len(centers) * CLUSTER_SIZE, dimension)))
+    return unit(np.repeat(centers, CLUSTER_SIZE, axis=0) + noise)[:count].astype(np.float32)
+
+
+def redundancy(vectors: np.ndarray) -> float:
+    similarity = vectors @ vectors.T
+    return float(similarity[np.triu_indices(len(vectors), 1)].mean())
+
+
+def fetch_latency(client: QdrantClient, query: np.ndarray, limit: int, with_vectors: bool, repeats: int) -> list:
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        client.query_points(COLLECTION, query=query.tolist(), limit=limit, with_payload=True,
+                            with_vectors=with_vectors)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def run_benchmark(counts: list, dimension: int, k: int, lambda_mult: float, repeats: int):
+    rng = np.random.default_rng(0)
+    query = unit(rng.standard_normal(dimension)).astype(np.float32)
+    url = os.getenv("QDRANT_URL")
+    client = QdrantClient(url=url) if url else QdrantClient(":memory:")
+
+    print(f"\n{'='*92}")
+    print(f"  MMR BENCHMARK: {dimension} dims, k={k}, lambda={lambda_mult}, {repeats} repeats")
+    print(f"{'='*92}")
+    print(f"\n Qdrant: {url or 'in-process'}, candidates in clusters of {CLUSTER_SIZE} near-duplicates")
+    print(f"\n {'N':>5}{'fetch k ms':>12}{'fetch N ms':>12}{'mmr p50':>10}{'mmr p99':>10}"
+          f"{'top-k sim':>11}{'mmr sim':>9}{'top-k clusters':>16}{'mmr clusters':>14}")
+
+    for count in counts:
+        candidates = clustered_candidates(rng, query, count, dimension)
+        if client.collection_exists(COLLECTION):
+            client.delete_collection(COLLECTION)
+        client.create_collection(
+            COLLECTION, vectors_config=models.VectorParams(size=dimension, distance=models.Distance.COSINE),
+        )
+        client.upsert(COLLECTION, points=models.Batch(
+            ids=list(range(count)), vectors=candidates.tolist(),
+            payloads=[{"page_content": "x" * 1000} for _ in range(count)],
+        ))
+        plain_k = fetch_latency(client, query, k, False, repeats)
+        with_n = fetch_latency(client, query, count, True, repeats)
+
+        latencies = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            picked = mmr_select(query, candidates, k, lambda_mult)
+            latencies.append(time.perf_counter() - started)
+
+        top_k = np.argsort(-(candidates @ query))[:k]
+        print(f" {count:>5}{percentile_ms(plain_k, 50):>12.2f}{percentile_ms(with_n, 50):>12.2f}"
+              f"{percentile_ms(latencies, 50):>10.3f}{percentile_ms(latencies, 99):>10.3f}"
+              f"{redundancy(candidates[top_k]):>11.3f}{redundancy(candidates[picked]):>9.3f}"
+              f"{len({i // CLUSTER_SIZE for i in top_k}):>16}{len({i // CLUSTER_SIZE for i in picked}):>14}")
+
+    client.delete_collection(COLLECTION)
+    print()
+
+
+if __name__ == "__main__":
+    candidate_counts = [int(n) for n in sys.argv[1].split(",")] if len(sys.argv) > 1 else [50, 100, 200]
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 1536
+    top_k = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    lam = float(sys.argv[4]) if len(sys.argv) > 4 else 0.5
+    count = int(sys.argv[5]) if len(sys.argv) > 5 else 200
+    run_benchmark(candidate_counts, size, top_k, lam, count)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Eval Retrieval Script
+
+Dense vs hybrid (dense + BM25, RRF-fused) retrieval on a small eval set
+generated from a PDF, to check that hybrid search helps exact-match queries
+without hurting natural-language ones.
+
+The PDF is chunked and indexed the way process_document does it (same
+chunker, point ids and parallel upsert, so chunks carry both the dense and
+the sparse vector). Two kinds of queries are taken from the chunks, each
+with its source chunk as the single relevant answer:
+
+- identifier: a token with digits or joined parts (e.g. "ERR-4012", "v2.3",
+  "section_7") that occurs in one chunk only, with its two preceding words
+- natural: an 8-word span of the chunk
+
+Both modes run the same search requests the API runs (query_request in
+app/vector_store/quadrant_reader.py). Reported per mode and query kind:
+recall@k, MRR and search latency p50/p99.
+
+Qdrant runs in-process unless QDRANT_URL is set; use a real server for
+latencies that match production. The eval collection is deleted at the end.
+
+Usage:
+    python scripts/eval_retrieval.py path/to/file.pdf [provider] [model] [queries] [k]
+
+Example:
+    QDRANT_URL=http://localhost:6333 \\
+        python scripts/eval_retrieval.py manual.pdf openai text-embedding-3-small 100 5
+"""
+
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from qdrant_client import QdrantClient
+from app.embeddings.registry import client_registry
+from app.embeddings.sparse import terms
+from app.services.text_chunker import text_chunker
+from app.services.text_extractor import text_extractor
+from app.vector_store.collections import CollectionRegistry
+from app.vector_store.qdrant import ChunkIdentity, QdrantManager
+from app.vector_store.quadrant_reader import RETRIEVAL_MODES, query_request
+
+DOCUMENT_ID = "eval-retrieval"
+IDENTIFIER = re.compile(r"^(?=.*\d)\w+$|^\w+(?:[-_./]\w+)+$")
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(np.array(samples) * 1000, q))
+
+
+def identifier_queries(texts: list, count: int, rng) -> list:
+    """(query, chunk index) for identifiers that occur in a single chunk"""
+    chunks_with = Counter(term for text in texts for term in set(terms(text)))
+    candidates = []
+    for index, text in enumerate(texts):
+        words = text.split()
+        for position, word in enumerate(words):
+            token = word.strip(".,;:()[]\"'")
+            if IDENTIFIER.match(token) and chunks_with[token.lower()] == 1:
+                candidates.append((" ".join(words[max(position - 2, 0):position] + [token]), index))
+    rng.shuffle(candidates)
+    return candidates[:count]
+
+
+def natural_queries(texts: list, count: int, rng) -> list:
+    queries = []
+    for _ in range(count):
+        index = rng.randrange(len(texts))
+        words = texts[index].split()
+        start = rng.randrange(max(len(words) - 8, 1))
+        queries.append((" ".join(words[start:start + 8]), index))
+    return queries
+
+
+def evaluate(client, collection: str, embedding, queries: list, mode: str, k: int) -> dict:
+    vectors = embedding.embed_documents([query for query, _ in queries])
+    hits, reciprocal_ranks, latencies = 0, [], []
+    for (query, expected), vector in zip(queries, vectors):
+        started = time.perf_counter()
+        points = client.query_points(
+            collection_name=collection,
+            **query_request(vector, k, [DOCUMENT_ID], query_text=query, mode=mode),
+        ).points
+        latencies.append(time.perf_counter() - started)
+
+        ranked = [point.payload["metadata"]["chunk_index"] for point in points]
+        if expected in ranked:
+            hits += 1
+            reciprocal_ranks.append(1 / (ranked.index(expected) + 1))
+        else:
+            reciprocal_ranks.append(0.0)
+    return {
+        "recall": hits / len(queries),
+        "mrr": float(np.mean(reciprocal_ranks)),
+        "p50": percentile_ms(latencies, 50),
+        "p99": percentile_ms(latencies, 99),
+    }
+
+
+def run_eval(pdf_path: str, provider: str, model: str, queries: int, k: int):
+    # An absolute path overrides UPLOADS_DIR when joined
+    pages = text_extractor.extract(str(Path(pdf_path).resolve()))
+    chunks = text_chunker.split_documents(pages)
+    ids, documents = ChunkIdentity(DOCUMENT_ID).tag(chunks)
+    texts = [doc.page_content for doc in documents]
+
+    rng = random.Random(0)
+    query_sets = {
+        "identifier": identifier_queries(texts, queries, rng),
+        "natural": natural_queries(texts, queries, rng),
+    }
+
+    url = os.getenv("QDRANT_URL")
+    client = QdrantClient(url=url) if url else QdrantClient(":memory:")
+    manager = QdrantManager(CollectionRegistry(prefix="eval_retrieval", client=client))
+
+    embedding = client_registry.embeddings(provider, model)
+    vectors = embedding.embed_documents(texts)
+    collection = manager.collection_name(embedding)
+    # The in-process Qdrant client is not thread-safe: one batch at a time
+    upsert = manager.upsert_parallel(documents, vectors, embedding, ids=ids, **({} if url else {"concurrency": 1}))
+
+    print(f"\n{'='*66}")
+    print(f"  RETRIEVAL EVAL: {provider}/{model}, {len(texts)} chunks, k={k}")
+    print(f"{'='*66}")
+    print(f"\n Qdrant: {url or 'in-process'}, indexed {upsert['points']} points in {upsert['seconds']:.2f}s")
+    print(f"\n {'queries':<12}{'count':>6}{'mode':>8}{'recall@k':>10}{'MRR':>8}{'p50 ms':>9}{'p99 ms':>9}")
+
+    try:
+        for kind, kind_queries in query_sets.items():
+            if not kind_queries:
+                print(f" {kind:<12}{0:>6}  (none found in this document)")
+                continue
+            for mode in RETRIEVAL_MODES[::-1]:
+                result = evaluate(client, collection, embedding, kind_queries, mode, k)
+                print(f" {kind:<12}{len(kind_queries):>6}{mode:>8}{result['recall']:>10.3f}"
+                      f"{result['mrr']:>8.3f}{result['p50']:>9.2f}{result['p99']:>9.2f}")
+    finally:
+        client.delete_collection(collection)
+    print()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    provider_name = sys.argv[2] if len(sys.argv) > 2 else "local"
+    model_name = sys.argv[3] if len(sys.argv) > 3 else "local-hash-3072"
+    count = int(sys.argv[4]) if len(sys.argv) > 4 else 100
+    top_k = int(sys.argv[5]) if len(sys.argv) > 5 else 5
+    run_eval(sys.argv[1], provider_name, model_name, count, top_k)
@@ -2,12 +2,21 @@
 """
 Reset Qdrant Collection Script
 
-This script deletes the existing 'rag_collection' from Qdrant.
-Use this when:
-1. You need to change embedding models
-2. Collection has mixed dimension vectors
+This script deletes a Qdrant collection, by default the legacy single
+'rag_collection'. Indexed vectors now live in one collection per
+(provider, model, dimension), e.g. rag_openai_text_embedding_3_small_1536
+(GET /knowledge/collections lists them); the application never drops
+collections itself, so use this when:
+1. The legacy 'rag_collection' is no longer needed
+2. An embedding model is retired
 3. You want a fresh start
-4. Starting over with new embeddings
+
+A running API notices the deletion at its next collection health check
+(COLLECTION_REFRESH_SECONDS); POST /knowledge/collections/refresh applies it
+immediately.
+
+Usage:
+    python scripts/reset_qdrant.py [url] [collection_name]
 
 WARNING: This will DELETE ALL indexed documents in Qdrant!
 """
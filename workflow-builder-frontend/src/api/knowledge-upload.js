@@ -9,7 +9,7 @@ export const uploadKnowledgeFile = async (file) => {
         const response = await fileUploadApi.post('/knowledge/upload', formData);
         
         console.log("[ UPLOAD] Upload successful:", response.data);
-        return response.data; // { document_id, chunks_count, chunks }
+        return response.data; // { document_id, sha256, duplicate, status, chunks_count }
     } catch (error) {
         console.error("[ UPLOAD] Error uploading knowledge file:", error);
         throw error;
@@ -17,13 +17,12 @@ export const uploadKnowledgeFile = async (file) => {
 };
 
  
-export const updateModelEmbedding = async (embeddingModel, documentId, embeddingProvider, chunks) => {
+export const updateModelEmbedding = async (embeddingModel, documentId, embeddingProvider) => {
     try {
         const requestBody = {
             embedding_provider: embeddingProvider,
             embedding_model: embeddingModel,
-            document_id: documentId,
-            chunks: chunks
+            document_id: documentId
         };
 
         console.log("[ PROCESS] Enqueueing document for embedding:", documentId);
@@ -32,7 +31,7 @@ export const updateModelEmbedding = async (embeddingModel, documentId, embedding
         const response = await publicApi.post(`/knowledge/process/${documentId}`, requestBody);
         
         console.log("[ PROCESS] Job enqueued:", response.data);
-        return response.data; // { job_id, status: "queued", document_id }
+        return response.data; // { job_id, status: "queued" | "indexed", document_id, result? }
     } catch (error) {
         console.error("[PROCESS] Error enqueueing document:", error);
         throw error;
@@ -40,6 +39,20 @@ export const updateModelEmbedding = async (embeddingModel, documentId, embedding
 };
 
  
+// Chunks stay on the server; fetch a page of them for previews
+export const getDocumentChunks = async (documentId, offset = 0, limit = 20) => {
+    try {
+        const response = await publicApi.get(`/knowledge/${documentId}/chunks`, {
+            params: { offset, limit }
+        });
+        return response.data; // { document_id, total, offset, limit, chunks }
+    } catch (error) {
+        console.error("[CHUNKS] Error fetching document chunks:", error);
+        throw error;
+    }
+};
+
+ 
 export const getKnowledgeResult = async (jobId, maxRetries = 30, pollInterval = 2000) => {
     let retries = 0;
     
@@ -8,7 +8,6 @@ import { useStore } from '../store';
 const KnowledgeBaseNode = ({ id, data }) => {
 
   const [documentUploadId, setDocumentUploadId] = useState('')
-  const [chunks, setChunks] = useState(data?.chunks || []);
   const [isProcessing, setIsProcessing] = useState(false);
   const [processStatus, setProcessStatus] = useState('');
   const label = data?.label || 'Knowledge Base';
@@ -31,9 +30,10 @@ const KnowledgeBaseNode = ({ id, data }) => {
         setDocumentUploadId(res.document_id);
         await updateNodeField(id, 'documentId', res.document_id);
         await updateNodeField(id, 'chunksCount', res.chunks_count);
-        setChunks(res.chunks);
 
-        setProcessStatus(`Document uploaded! (${res.chunks_count} chunks)`);
+        setProcessStatus(res.duplicate
+          ? `Document already uploaded! (${res.chunks_count} chunks)`
+          : `Document uploaded! (${res.chunks_count} chunks)`);
         setTimeout(() => setProcessStatus(''), 3000);
       } catch (error) {
         console.error("Upload handler error:", error);
@@ -73,7 +73,7 @@ const KnowledgeBaseNode = ({ id, data }) => {
       await updateNodeField(id, 'embeddingProvider', embedding_provider);
 
       // ===== STEP 1: Enqueue Job =====
-      const enqueueRes = await updateModelEmbedding(selectedModel, documentUploadId, embedding_provider, chunks);
+      const enqueueRes = await updateModelEmbedding(selectedModel, documentUploadId, embedding_provider);
       console.log("Job enqueued:", enqueueRes);
 
       const jobId = enqueueRes.job_id;
@@ -81,7 +81,10 @@ const KnowledgeBaseNode = ({ id, data }) => {
 
       // ===== STEP 2: Poll for Results =====
       try {
-        const result = await getKnowledgeResult(jobId);
+        // Already indexed with this model: the backend returns the result without a job
+        const result = enqueueRes.status === 'indexed'
+          ? enqueueRes.result
+          : await getKnowledgeResult(jobId);
 
         //JOB FINISHED - WE GOT THE RESULT!
         console.log("[SUCCESS] Indexing complete! Result:", result);